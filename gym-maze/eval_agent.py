@@ -1,20 +1,34 @@
 """
 Module to empirically evaluate an agent on multiple maps
+Episodes (maze, item layout) are sharded across a process pool, run with
+python eval_agent.py --workers 8 --results-dir results/eval
+(rerunning with the same --results-dir skips the episodes already recorded)
+--maze-dir is either a packed corpus (gym_maze.envs.maze_corpus) or a directory of
+maze_{maze_id}_{layout_id}.p pickle files
 """
+import argparse
+import random
 import time
 import pickle
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+
 import numpy as np
 from tqdm import tqdm
 from solution import AlgorithmicAgent
-from gym_maze.envs.maze_manager import MazeManager
+from gym_maze.envs.maze_corpus import MazeCorpus
+from gym_maze.envs.maze_manager import MazeManager, RiddleContainer
+from results_store import RECORD_DTYPE, ResultsStore
 
 from riddle_solvers import cipher_solver, captcha_solver, pcap_solver, server_solver
 
 
 AGENT_ID = "9"
+MAZE_PATH = "{}/maze_{}_{}.p"
 
 
-def create_maze(maze_path: str) -> MazeManager:
+def create_maze(maze_path: str, headless: bool = False) -> MazeManager:
     """
     Create a maze manager from a saved maze (pickle file)
 
@@ -24,22 +38,95 @@ def create_maze(maze_path: str) -> MazeManager:
         Path to the maze file containing a dict
         maze_path['maze'] is a numpy array of shape (10, 10)
         maze_path['rescue items'] is a dict with the recuse items
+    headless: bool
+        Whether to use the headless environment (no pygame)
 
     Returns
     -------
     MazeManager
     """
-    saved_maze = pickle.load(open(maze_path, "rb"))
+    saved_maze = load_saved_maze(maze_path)
+    return create_manager(saved_maze["maze"], saved_maze["rescue_items"], headless)
+
+
+def create_manager(
+    maze_cells: np.ndarray,
+    rescue_items: Dict,
+    headless: bool = False,
+) -> MazeManager:
+    """
+    Create a maze manager from a maze and its rescue items
 
-    manager = MazeManager()
-    manager.rescue_items_dict = saved_maze["rescue_items"]
-    manager.init_maze(AGENT_ID, maze_cells=saved_maze["maze"])
+    Parameters
+    ----------
+    maze_cells: np.ndarray
+        The maze, array of shape (10, 10)
+    rescue_items: Dict
+        Riddle type of every rescue item position
+    headless: bool
+        Whether to use the headless environment (no pygame)
+
+    Returns
+    -------
+    MazeManager
+    """
+    manager = MazeManager(headless=headless)
+    manager.rescue_items_dict = dict(rescue_items)
+    manager.init_maze(AGENT_ID, maze_cells=maze_cells)
     return manager
 
 
-def eval_espisode(maze_path: str) -> int:
+@lru_cache(maxsize=None)
+def open_corpus(path: str) -> Optional[MazeCorpus]:
     """
-    Evaluate an agent on a single episode
+    Open a packed maze corpus (memory-mapped), once per process
+
+    Parameters
+    ----------
+    path : str
+        Path to the corpus directory
+
+    Returns
+    -------
+    Optional[MazeCorpus]
+        The corpus, or None if the directory is not a corpus
+    """
+    if not MazeCorpus.is_corpus(path):
+        return None
+    return MazeCorpus(path)
+
+
+def load_episode(
+    maze_dir: str, maze_id: int, layout_id: int
+) -> Tuple[np.ndarray, Dict]:
+    """
+    Load the maze and rescue items of an episode from a corpus or pickle files
+
+    Parameters
+    ----------
+    maze_dir : str
+        Packed corpus, or directory containing the maze pickle files
+    maze_id : int
+        Index of the maze
+    layout_id : int
+        Index of the item layout
+
+    Returns
+    -------
+    Tuple[np.ndarray, Dict]
+        The maze cells and the riddle type of every rescue item position
+    """
+    corpus = open_corpus(maze_dir)
+    if corpus is not None:
+        return corpus.get_episode(maze_id, layout_id)
+    saved_maze = load_saved_maze(MAZE_PATH.format(maze_dir, maze_id, layout_id))
+    return saved_maze["maze"], saved_maze["rescue_items"]
+
+
+@lru_cache(maxsize=256)
+def load_saved_maze(maze_path: str) -> dict:
+    """
+    Load a saved maze (pickle file), cached so a process reads each file once
 
     Parameters
     ----------
@@ -48,19 +135,29 @@ def eval_espisode(maze_path: str) -> int:
 
     Returns
     -------
-    int
-        Number of steps taken by the agent
+    dict
+        The saved maze, should not be modified
     """
-    agent = AlgorithmicAgent(visualize=False)
-    riddle_solvers = {
-        "cipher": cipher_solver,
-        "captcha": captcha_solver,
-        "pcap": pcap_solver,
-        "server": server_solver,
-    }
+    with open(maze_path, "rb") as maze_file:
+        return pickle.load(maze_file)
 
-    manager = create_maze(maze_path)
 
+def run_episode(manager: MazeManager, agent: AlgorithmicAgent) -> int:
+    """
+    Run an agent on a maze until it decides to stop
+
+    Parameters
+    ----------
+    manager : MazeManager
+        The maze manager, with a maze initialized for AGENT_ID
+    agent : AlgorithmicAgent
+        The agent to evaluate
+
+    Returns
+    -------
+    int
+        Number of steps taken by the agent
+    """
     obv = manager.reset(AGENT_ID)
 
     while True:
@@ -83,14 +180,306 @@ def eval_espisode(maze_path: str) -> int:
     return agent.count
 
 
+def eval_espisode(maze_path: str) -> int:
+    """
+    Evaluate an agent on a single episode
+
+    Parameters
+    ----------
+    maze_path : str
+        Path to the maze file
+
+    Returns
+    -------
+    int
+        Number of steps taken by the agent
+    """
+    agent = AlgorithmicAgent(visualize=False)
+    riddle_solvers = {
+        "cipher": cipher_solver,
+        "captcha": captcha_solver,
+        "pcap": pcap_solver,
+        "server": server_solver,
+    }
+
+    manager = create_maze(maze_path)
+    return run_episode(manager, agent)
+
+
+def seed_episode(seed: int, maze_id: int, layout_id: int) -> None:
+    """
+    Seed the random generators for an episode, so results do not depend on which
+    worker runs it or in which order
+
+    Parameters
+    ----------
+    seed : int
+        Seed of the whole evaluation
+    maze_id : int
+        Index of the maze
+    layout_id : int
+        Index of the item layout
+    """
+    state = np.random.SeedSequence([seed, maze_id, layout_id]).generate_state(1)
+    random.seed(int(state[0]))
+    np.random.seed(int(state[0]))
+
+
+def init_worker() -> None:
+    """
+    Load the riddles once in a worker process (they are then shared by all
+    episodes)
+    """
+    RiddleContainer.get_shared()
+
+
+def eval_chunk(
+    maze_id: int,
+    layout_ids: List[int],
+    maze_dir: str,
+    seed: int,
+    agent_kwargs: Dict,
+) -> List[tuple]:
+    """
+    Evaluate the agent on several item layouts of the same maze (runs in a worker)
+
+    Parameters
+    ----------
+    maze_id : int
+        Index of the maze
+    layout_ids : List[int]
+        Indices of the item layouts
+    maze_dir : str
+        Packed corpus, or directory containing the maze pickle files
+    seed : int
+        Seed of the whole evaluation
+    agent_kwargs : Dict
+        Keyword arguments of the AlgorithmicAgent
+
+    Returns
+    -------
+    List[tuple]
+        Record of every episode (in results_store.RECORD_DTYPE order): maze id,
+        layout id, steps, rescued items, planning time, number of replans and path
+        cache hits and misses
+    """
+    results = []
+    for layout_id in layout_ids:
+        seed_episode(seed, maze_id, layout_id)
+        maze_cells, rescue_items = load_episode(maze_dir, maze_id, layout_id)
+        manager = create_manager(maze_cells, rescue_items, headless=True)
+        agent = AlgorithmicAgent(visualize=False, **agent_kwargs)
+        steps = run_episode(manager, agent)
+        rescued_items = manager.maze_map[AGENT_ID].maze_view.rescued_items
+        cache_stats = agent.graph.get_cache_stats()
+        results.append(
+            (
+                maze_id,
+                layout_id,
+                steps,
+                rescued_items,
+                agent.planning_time,
+                agent.replans,
+                cache_stats["hits"],
+                cache_stats["misses"],
+            )
+        )
+    return results
+
+
+def eval_parallel(
+    n_mazes: int = 100,
+    n_layouts: int = 50,
+    maze_dir: str = "../mazes",
+    workers: Optional[int] = None,
+    chunk_size: int = 10,
+    seed: int = 0,
+    agent_kwargs: Optional[Dict] = None,
+    store: Optional[ResultsStore] = None,
+) -> np.ndarray:
+    """
+    Evaluate the agent on all (maze, item layout) pairs with a process pool
+    Each task is a chunk of layouts of a single maze. With a store, episodes it
+    already contains are skipped and new records are saved as they complete
+
+    Parameters
+    ----------
+    n_mazes : int
+        Number of mazes
+    n_layouts : int
+        Number of item layouts per maze
+    maze_dir : str
+        Packed corpus, or directory containing the maze pickle files
+    workers : Optional[int]
+        Number of worker processes (defaults to the number of CPUs)
+    chunk_size : int
+        Number of episodes per task
+    seed : int
+        Seed of the whole evaluation
+    agent_kwargs : Optional[Dict]
+        Keyword arguments of the AlgorithmicAgent
+    store : Optional[ResultsStore]
+        Where to save the records
+
+    Returns
+    -------
+    np.ndarray
+        Structured array (results_store.RECORD_DTYPE) with the record of every
+        episode (including the ones loaded from the store), sorted by maze then
+        layout
+    """
+    agent_kwargs = agent_kwargs or {}
+    chunks = []
+    for maze_id in range(n_mazes):
+        layout_ids = [
+            layout_id
+            for layout_id in range(n_layouts)
+            if store is None or not store.is_completed(maze_id, layout_id)
+        ]
+        for start in range(0, len(layout_ids), chunk_size):
+            chunks.append((maze_id, layout_ids[start : start + chunk_size]))
+
+    results = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker) as pool:
+            futures = [
+                pool.submit(
+                    eval_chunk, maze_id, layout_ids, maze_dir, seed, agent_kwargs
+                )
+                for maze_id, layout_ids in chunks
+            ]
+            total = sum(len(layout_ids) for _, layout_ids in chunks)
+            with tqdm(total=total) as progress:
+                for future in as_completed(futures):
+                    chunk_results = future.result()
+                    if store is not None:
+                        store.extend(chunk_results)
+                    results.extend(chunk_results)
+                    progress.update(len(chunk_results))
+    finally:
+        # Keep the finished episodes even if a worker failed or the run was
+        # interrupted, so it can be resumed
+        if store is not None:
+            store.flush()
+
+    if store is not None:
+        return store.load()
+    results.sort()
+    return np.array(results, dtype=RECORD_DTYPE)
+
+
+def summarize_results(results: np.ndarray, n_worst: int = 5) -> Dict:
+    """
+    Aggregate the number of steps of all episodes
+
+    Parameters
+    ----------
+    results : np.ndarray
+        Structured array (results_store.RECORD_DTYPE) of the episodes
+    n_worst : int
+        Number of mazes to report in the worst cases
+
+    Returns
+    -------
+    Dict
+        mean, std, min, max and percentiles of the number of steps, the n_worst
+        mazes with the largest number of steps as (maze id, layout id, steps), the
+        mean planning time and number of replans per episode, and the total path
+        cache hits and misses with the hit rate
+    """
+    steps = results["steps"]
+    maze_ids = results["maze_id"]
+    percentiles = [5, 25, 50, 75, 95]
+
+    # worst layout of every maze
+    order = np.lexsort((-steps, maze_ids))
+    is_first = np.ones(len(order), dtype=bool)
+    is_first[1:] = maze_ids[order[1:]] != maze_ids[order[:-1]]
+    worst_per_maze = results[order[is_first]]
+    worst_per_maze = worst_per_maze[
+        np.argsort(-worst_per_maze["steps"], kind="stable")
+    ][:n_worst]
+    cache_hits = int(np.sum(results["cache_hits"]))
+    cache_misses = int(np.sum(results["cache_misses"]))
+
+    return {
+        "episodes": len(steps),
+        "mean": float(np.mean(steps)),
+        "std": float(np.std(steps)),
+        "min": int(np.min(steps)),
+        "max": int(np.max(steps)),
+        "percentiles": dict(
+            zip(percentiles, np.percentile(steps, percentiles).tolist())
+        ),
+        "worst_mazes": list(
+            zip(
+                worst_per_maze["maze_id"].tolist(),
+                worst_per_maze["layout_id"].tolist(),
+                worst_per_maze["steps"].tolist(),
+            )
+        ),
+        "mean_planning_time": float(np.mean(results["planning_time"])),
+        "mean_replans": float(np.mean(results["replans"])),
+        "cache_hits": cache_hits,
+        "cache_misses": cache_misses,
+        "cache_hit_rate": cache_hits / max(cache_hits + cache_misses, 1),
+    }
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--mazes", type=int, default=100)
+    parser.add_argument("--layouts", type=int, default=50)
+    parser.add_argument("--maze-dir", default="../mazes")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-size", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--grid-graph", action="store_true")
+    parser.add_argument("--incremental", action="store_true")
+    parser.add_argument("--order-mode", default="permutations")
+    parser.add_argument("--candidate-mode", default="first")
+    parser.add_argument(
+        "--cache-paths", action=argparse.BooleanOptionalAction, default=True
+    )
+    parser.add_argument("--results-dir", default=None)
+    args = parser.parse_args()
+    store = ResultsStore(args.results_dir) if args.results_dir else None
+
     tic = time.time()
-    vals = []
-    for j in tqdm(range(100)):
-        for i in range(50):
-            out = eval_espisode("../mazes/maze_{}_{}.p".format(str(j), str(i)))
-            vals.append(out)
-    mean = np.mean(vals)
-    std = np.std(vals)
+    try:
+        vals = eval_parallel(
+            n_mazes=args.mazes,
+            n_layouts=args.layouts,
+            maze_dir=args.maze_dir,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            seed=args.seed,
+            agent_kwargs={
+                "grid_graph": args.grid_graph,
+                "incremental": args.incremental,
+                "order_mode": args.order_mode,
+                "candidate_mode": args.candidate_mode,
+                "cache_paths": args.cache_paths,
+            },
+            store=store,
+        )
+    finally:
+        if store is not None:
+            store.flush()
+    summary = summarize_results(vals)
+    print("Evaluated {} episodes in {:.1f}s".format(len(vals), time.time() - tic))
+    print("steps: {:.2f} +- {:.2f}".format(summary["mean"], summary["std"]))
+    print("min/max: {} / {}".format(summary["min"], summary["max"]))
+    print("percentiles:", summary["percentiles"])
+    print("worst mazes (maze, layout, steps):", summary["worst_mazes"])
+    print(
+        "planning: {:.4f}s and {:.1f} replans per episode".format(
+            summary["mean_planning_time"], summary["mean_replans"]
+        )
+    )
+    print(
+        "path cache: {} hits, {} misses ({:.1%} hits)".format(
+            summary["cache_hits"], summary["cache_misses"], summary["cache_hit_rate"]
+        )
+    )
     # np.save("eval_edge_unknown_09_nearest_branch.npy", vals)
-    # print(mean - 2 * std, mean, mean + 2 * std)
@@ -1,12 +1,15 @@
 """
 Module to empirically evaluate an agent on multiple maps
 """
+import hashlib
+import os
 import time
 import pickle
 import numpy as np
 from tqdm import tqdm
 from solution import AlgorithmicAgent
 from gym_maze.envs.maze_manager import MazeManager
+from results_store import ResultsStore
 
 from riddle_solvers import cipher_solver, captcha_solver, pcap_solver, server_solver
 
@@ -37,7 +40,7 @@ def create_maze(maze_path: str) -> MazeManager:
     return manager
 
 
-def eval_espisode(manager: MazeManager()) -> int:
+def eval_espisode(manager: MazeManager(), agent: AlgorithmicAgent = None) -> int:
     """
     Evaluate an agent on a single episode
 
@@ -45,13 +48,16 @@ def eval_espisode(manager: MazeManager()) -> int:
     ----------
     manager: MazeManager
         The maze manager
+    agent: AlgorithmicAgent
+        The agent to evaluate (a new one with visualization by default)
 
     Returns
     -------
     int
         Number of steps taken by the agent
     """
-    agent = AlgorithmicAgent(visualize=True)
+    if agent is None:
+        agent = AlgorithmicAgent(visualize=True)
     riddle_solvers = {
         "cipher": cipher_solver,
         "captcha": captcha_solver,
@@ -82,6 +88,26 @@ def eval_espisode(manager: MazeManager()) -> int:
     return agent.count
 
 
+def get_maze_key(maze_cells: np.ndarray) -> str:
+    """
+    Short digest of a maze, used to keep the results of different mazes apart
+
+    Parameters
+    ----------
+    maze_cells: np.ndarray
+        The cells of the maze
+
+    Returns
+    -------
+    str
+        Hexadecimal digest of the shape and cells of the maze
+    """
+    maze_cells = np.ascontiguousarray(maze_cells, dtype=np.int64)
+    digest = hashlib.sha1(str(maze_cells.shape).encode())
+    digest.update(maze_cells.tobytes())
+    return digest.hexdigest()[:12]
+
+
 if __name__ == "__main__":
     tic = time.time()
     vals = []
@@ -137,13 +163,35 @@ if __name__ == "__main__":
     ]
     maze = np.array(maze)
     rescue_items = pickle.load(open("maze_gen_rescue_items.p", "rb"))
-    for i in tqdm(range(500)):
-        manager = MazeManager()
-        manager.rescue_items_dict = rescue_items[i]
-        manager.init_maze(AGENT_ID, maze_cells=bad_maze_3)
-        out = eval_espisode(manager)
-        vals.append(out)
-        # print(out)
+    maze_cells = bad_maze_3
+    # rerunning skips the layouts already saved in the store, every maze has its
+    # own store so that changing the maze above does not mix results
+    store_dir = os.path.join("results", "manual_maze", get_maze_key(maze_cells))
+    with ResultsStore(store_dir, chunk_size=10) as store:
+        for i in tqdm(range(500)):
+            if store.is_completed(0, i):
+                continue
+            manager = MazeManager()
+            manager.rescue_items_dict = rescue_items[i]
+            manager.init_maze(AGENT_ID, maze_cells=maze_cells)
+            agent = AlgorithmicAgent(visualize=True)
+            out = eval_espisode(manager, agent)
+            rescued_items = manager.maze_map[AGENT_ID].maze_view.rescued_items
+            cache_stats = agent.graph.get_cache_stats()
+            store.append(
+                (
+                    0,
+                    i,
+                    out,
+                    rescued_items,
+                    agent.planning_time,
+                    agent.replans,
+                    cache_stats["hits"],
+                    cache_stats["misses"],
+                )
+            )
+            # print(out)
+        vals = store.load()["steps"]
     np.save("maze_79.npy", vals)
     # np.save("evaluating_worst_5_mazes.npy", vals)
     # print(mean - 2 * std, mean, mean + 2 * std)
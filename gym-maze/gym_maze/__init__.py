@@ -26,6 +26,12 @@ register(
     max_episode_steps=10000,
 )
 
+register(
+    id='maze-sample-10x10-headless-v0',
+    entry_point='gym_maze.envs:HeadlessMazeEnv',
+    max_episode_steps=10000,
+)
+
 register(
     id='maze-random-10x10-v0',
     entry_point='gym_maze.envs:MazeEnvRandom10x10',
@@ -3,16 +3,19 @@ from pymongo import MongoClient
 import numpy as np
 import json
 from flask_cors import CORS, cross_origin
-from collections import deque
 
 from datetime import datetime
 import sys
 from bson import json_util
 
 sys.path.insert(1, '/path/to/application/app/folder')
-from envs import maze_manager
+from envs import maze_manager, maze_validation
+from authorised_agents import AuthorisedAgents
+from step_log import StepLog, StepLogWriter, decode_steps
+from sessions import SessionManager
 
 import time
+import uuid
 import atexit
 from apscheduler.schedulers.background import BackgroundScheduler
 
@@ -65,8 +68,7 @@ HACKATHON_PHASE = 0
 
 class Agent:
     def __init__(self, id, connected, currentPosition, currentRiddle, solvedRiddles, mazeId,
-                 score, teamName, connectionTime=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                 stepsRemaining=MAX_STEPS):
+                 score, teamName, session):
         self.id = id
         self.connected = connected
         self.currentPosition = currentPosition
@@ -76,9 +78,13 @@ class Agent:
         self.mazeId = mazeId
         self.score = score
         self.teamName = teamName
-        self.connectionTime = connectionTime
-        self.lastStepTimeStamp = connectionTime
-        self.stepsRemaining = stepsRemaining
+        # timing and steps of the game, kept up to date by sessionManager
+        self.session = session
+        self.connectionTime = session.connection_time
+
+    @property
+    def stepsRemaining(self):
+        return self.session.steps_remaining
 
     def getAgentJson(self):
         return {
@@ -96,6 +102,7 @@ class Agent:
 
 agents = dict()
 agentsSteps = dict()
+sessionManager = SessionManager(MAX_STEPS, MAX_NO_OF_SECS_BETWEEN_ACTIONS, MAX_NO_OF_SECS_OF_GAME)
 agentRiddles = dict()
 agentRiddleStartTimes = dict()
 agentRiddleSolveTimes = dict()
@@ -117,119 +124,100 @@ adminPasswords = {
     "ADMIN123"
 }
 
+# ids of the Users collection, checked on every request without a database query
+AUTHORISED_AGENTS_TTL = 60
+authorisedAgents = AuthorisedAgents(ttl=AUTHORISED_AGENTS_TTL)
+
+
+def loadAuthorisedAgents():
+    return [user["_id"] for user in db.Users.find({}, {"_id": 1})]
+
+
+def refreshAuthorisedAgents():
+    authorisedAgents.reload(loadAuthorisedAgents)
+
+
+refreshAuthorisedAgents()
+
+
+# steps of every game are written by batches (StepLogs collection) while it runs
+def writeStepBatch(sessionId, batchIndex, steps):
+    db.StepLogs.insert_one({"sessionId": sessionId, "batch": batchIndex, "steps": steps})
 
-def get_move(cell, r, c, rows_length, cols_length):
-    next_state = None
-    if cell == 1 and r - 1 >= 0:
-        next_state = r - 1, c
-    elif cell == 2 and c + 1 < cols_length:
-        next_state = r, c + 1
-    elif cell == 4 and r + 1 < rows_length:
-        next_state = r + 1, c
-    elif cell == 8 and c - 1 >= 0:
-        next_state = r, c - 1
-    return next_state
-
-
-def get_possible_children(r, c, rows_length, cols_length):
-    children = []
-    if r - 1 >= 0:
-        children.append((r - 1, c))
-    if c - 1 >= 0:
-        children.append((r, c - 1))
-    if c + 1 < cols_length:
-        children.append((r, c + 1))
-    if r + 1 < rows_length:
-        children.append((r + 1, c))
-    return children
-
-
-def get_possible_moves(maze, r, c):
-    rows_length, cols_length = maze.shape
-    next_states = set()
-    cell = maze[r][c]
-    next_state = get_move(cell, r, c, rows_length, cols_length)
-    if next_state is not None:
-        next_states.add(next_state)
-    possible_children = get_possible_children(r, c, rows_length, cols_length)
-    for child in possible_children:
-        child_r, child_c = child
-        cell = maze[child_r][child_c]
-        next_state = get_move(cell, child_r, child_c, rows_length, cols_length)
-        if next_state is None:
-            continue
-        r_new, c_new = next_state
-        if r_new == r and c_new == c:
-            next_states.add(child)
-    return next_states
-
-
-def maze_has_blockers(maze):
-    maze = maze.T
-    queue = deque()
-    queue.append((0, 0))
-    optimizedQueue = set()  # for faster search
-    explored = set()
-    while len(queue) > 0:
-        currentState = queue.popleft()
-        explored.add(currentState)
-        r, c = currentState
-        children = get_possible_moves(maze, r, c)
-        for child in children:
-            if child not in optimizedQueue and child not in explored:
-                queue.append(child)
-                optimizedQueue.add(child)
-    return len(explored) != np.prod(maze.shape)
+
+def deleteStepBatches(sessionId):
+    db.StepLogs.delete_many({"sessionId": sessionId})
+
+
+# an attempt with a batch that could not be written has "incomplete": True
+def markStepsIncomplete(sessionId):
+    db.Attempts.update_one({"stepLog": sessionId}, {"$set": {"incomplete": True}})
+
+
+def loadSteps(attempt):
+    if "stepLog" not in attempt:
+        return attempt["actions"]
+    batches = db.StepLogs.find({"sessionId": attempt["stepLog"]}).sort("batch", 1)
+    return decode_steps([batch["steps"] for batch in batches], attempt["itemPositions"])
+
+
+db.StepLogs.create_index([("sessionId", 1), ("batch", 1)])
+stepLogWriter = StepLogWriter(
+    writeStepBatch, delete=deleteStepBatches, on_failure=markStepsIncomplete
+)
 
 
 def validate_maze(maze):
-    # Check if the maze is a 2D numpy array
-    if not isinstance(maze, np.ndarray) or maze.ndim != 2:
-        return False, "Please submit a valid 10x10 numpy array"
-
-    # Check if the maze is 10x10
-    if maze.shape[0] != 10 or maze.shape[1] != 10:
-        return False, "Please submit a valid 10x10 numpy array"
-
-    # Check if each entry in the array is 1, 2, 4 or 8
-    if not np.all(np.isin(maze, [1, 2, 4, 8])):
-        return False, "Please submit a valid 10x10 numpy array which only contains the values 1,2,4 or 8"
-    if maze_has_blockers(maze):
-        return False, "Please submit a valid maze which has a solution and has no blockers"
-    # If all checks pass, the maze is valid
-    return True, "Maze submitted successfully"
+    report = maze_validation.check_maze(maze, maze_size=(10, 10))
+    return report.is_valid, report.message
+
+# sessions ended by a request, saved on a scheduler thread (finishSession)
+endingSessions = dict()
+
 
 def checkTimeout(agentId):
-    # check timestamps
-    agent = agents[agentId]
-    currentTime = datetime.now()
-    agentTime = datetime.strptime(agent.lastStepTimeStamp, "%Y-%m-%d %H:%M:%S")
-    totalTime = datetime.strptime(agent.connectionTime, "%Y-%m-%d %H:%M:%S")
-    actionTimeDifference = currentTime - agentTime
-    gameTimeDifference = currentTime - totalTime
-    save = False
-    if MAX_STEPS - agent.stepsRemaining > SAVING_THRESHOLD:
-        save = True
-    if actionTimeDifference.total_seconds() > MAX_NO_OF_SECS_BETWEEN_ACTIONS or gameTimeDifference.total_seconds() > MAX_NO_OF_SECS_OF_GAME:
-        if save:
-            saveSimulationHistory(agentId)
-        else:
-            del agents[agentId]
-            del agentsSteps[agentId]
+    # counts the step, False if the session is over (time limits or no steps left)
+    if sessionManager.use_step(agentId):
+        return True
+    # ended here, unless the expiry job already did. The history is saved off the
+    # request thread, like for the sessions ended by the expiry job
+    session = sessionManager.end(agentId)
+    if session is not None:
+        endingSessions[agentId] = session
+        scheduler.add_job(func=finishSession, args=(agentId,))
+    return False
+
+
+def finishSession(agentId):
+    # /init may have saved it first (claimSession)
+    session = endingSessions.pop(agentId, None)
+    if session is not None:
+        endSession(session)
+
+
+def claimSession(agentId):
+    # the running session of the agent, or the one a request ended and that is not
+    # saved yet. None if there is none or it is already being saved
+    session = sessionManager.end(agentId)
+    if session is None:
+        session = endingSessions.pop(agentId, None)
+    return session
+
+
+def endSession(session):
+    # session ended in sessionManager, saved if enough steps were played
+    agent = agents.get(session.agent_id)
+    if agent is None or agent.session is not session:
+        return  # the agent already started a new game
+    if MAX_STEPS - session.steps_remaining > SAVING_THRESHOLD:
+        saveSimulationHistory(session.agent_id)
+    else:
+        dropSession(session.agent_id)
 
-        return False
-    # check remaining steps
-    if agent.stepsRemaining <= 0:
-        if save:
-            saveSimulationHistory(agentId)
-        else:
-            del agents[agentId]
-            del agentsSteps[agentId]
 
-        return False
-    agent.lastStepTimeStamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    agent.stepsRemaining -= 1
-    return True
+def dropSession(agentId):
+    del agents[agentId]
+    del agentsSteps[agentId]
 
 
 # -------------END CLASSES--------------------
@@ -242,7 +230,7 @@ def status():
 @app.route('/submitMaze', methods=['POST'])
 def submitMaze():
     agentId = request.get_json()['agentId']
-    if db.Users.find_one({"_id": agentId}) == None:
+    if agentId not in authorisedAgents:
         return "agentId is either wrong, or not initialized!", 400
     else:
         submittedMaze = request.get_json()['submittedMaze']
@@ -266,11 +254,12 @@ def init():
         agentId = request.get_json()['agentId']
     except:
         return "Wrong request", 400
-    allowedAgent = db.Users.find_one({"_id": agentId})
-    if allowedAgent != None:
+    if agentId in authorisedAgents:
         if agentId in agents:
-            if MAX_STEPS - agents[agentId].stepsRemaining > SAVING_THRESHOLD:
-                saveSimulationHistory(agentId)
+            # saved here so that it is counted in the attempts below
+            session = claimSession(agentId)
+            if session is not None:
+                endSession(session)
         # check attempts
         mazeNumber = HACKATHON_PHASE
         attempts = db.Attempts.find({"agentId": agentId, "maze": str(mazeNumber)})
@@ -315,9 +304,9 @@ def init():
         newAgent = Agent(
             id=agentId, connected=True, currentPosition=state["position"],
             currentRiddle=0, solvedRiddles=[], mazeId=mazeNumber,
-            score=0, teamName="", connectionTime=datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            score=0, teamName="", session=sessionManager.start(agentId)
         )
-        agentsSteps[agentId] = []
+        agentsSteps[agentId] = StepLog(uuid.uuid4().hex, stepLogWriter.put)
         agents[agentId] = newAgent
         # Send state
         return {'position': state["position"],
@@ -326,15 +315,18 @@ def init():
     else:
         return "Connection refused because agentId is wrong, please double check and try again!", 401
 
-allowedAgent = db.Users.find()
+
 @app.route('/move', methods=['POST'])
 def move():
     agentId = request.get_json()['agentId']
-    #allowedAgent = db.Users.find_one({"_id": agentId})
-    if agentId in allowedAgent :
+    if agentId not in authorisedAgents:
         return "agentId is either wrong, or not initialized!", 400
     else:
-        if agentId in agents:
+        # taken before stepping, the expiry job may end the game while this request
+        # runs (its history is then saved without this step)
+        agent = getAgent(agentId)
+        steps = agentsSteps.get(agentId)
+        if agent is not None and steps is not None:
             if checkTimeout(agentId):
                 action = request.get_json()['action']
 
@@ -349,15 +341,12 @@ def move():
                         "riddleQuestion": info["riddle_question"],
                     }
                     if info['riddle_type'] and info['riddle_question']:
-                        agents[agentId].riddlesTime[info['riddle_type']] = time.time()
-                    dbAction = {
-                        str(len(agentsSteps[agentId])): [obv[0].tolist(), allowedActions.index(action), str(mazeManager.get_rescue_items_status(agentId))]
-                    }
-                    agentsSteps[agentId].append(dbAction)
+                        agent.riddlesTime[info['riddle_type']] = time.time()
+                    steps.append(obv[0], allowedActions.index(action), mazeManager.get_rescue_items_status_bits(agentId))
                     if state == None:
                         return "Action not allowed", 403
                     else:
-                        agents[agentId].currentPosition = obv[0].tolist()
+                        agent.currentPosition = obv[0].tolist()
                         return state, 200
                 else:
                     return "Action is invalid", 400
@@ -373,9 +362,9 @@ def solve():
         agentId = request.get_json()['agentId']
     except:
         return "Agent id not found in request", 400
-    allowedAgent = db.Users.find_one({"_id": agentId})
-
-    if allowedAgent == None or agentId not in agents:
+    # taken before solving, the expiry job may end the game while this request runs
+    agent = getAgent(agentId)
+    if agentId not in authorisedAgents or agent is None:
         return "agentId is either wrong, or not initialized!", 400
     else:
         if checkTimeout(agentId):
@@ -384,7 +373,7 @@ def solve():
                 request.get_json()["riddleType"]
             except:
                 return "Wrong input ", 400
-            agents[agentId].riddlesTime[riddleType] = time.time() - agents[agentId].riddlesTime[riddleType]
+            agent.riddlesTime[riddleType] = time.time() - agent.riddlesTime[riddleType]
             mazeState = mazeManager.solve_riddle(riddleType, agentId, solution)
             state = {
                 "position": mazeState[0][0].tolist(),
@@ -419,7 +408,7 @@ def getAgentStatus():
                 "score": agent.score,
                 "teamInfo": agent.teamInfo,
                 "connectionTime": agent.connectionTime,
-                "lastAction": agent.lastStepTimeStamp,
+                "lastAction": sessionManager.last_action_time(agentId),
                 "remainingSteps": agent.stepsRemaining
             }), 200
     else:
@@ -433,7 +422,7 @@ def killSession():
     adminPassword = request.get_json()['adminPassword']
     if adminPassword in adminPasswords:
         agent = getAgent(agentId)
-        if agent == None:
+        if agent == None or sessionManager.end(agentId) is None:
             return "agentId is either wrong, or not initialized!", 400
         else:
             saveSimulationHistory(agentId)
@@ -448,7 +437,7 @@ def leave():
         agentId = request.get_json()['agentId']
     except:
         return "Can't find agent id", 400
-    if agentId not in agents:
+    if agentId not in agents or sessionManager.end(agentId) is None:
         return "agentId is either wrong, or not initialized!", 400
     else:
         position = agents[agentId].currentPosition
@@ -473,9 +462,12 @@ def saveSimulationHistory(agentId, didLeave=False):
 
     agent = agents[agentId]
     if agentId == agent.mazeId and didLeave == False:
+        # not saved, no attempt will refer to the batches it already wrote
+        if steps.num_batches > 0:
+            stepLogWriter.discard(steps.session_id)
+        dropSession(agentId)
         return
 
-
     totalScore, riddlesScores = mazeManager.calculate_final_score(agentId, agent.riddlesTime)
     riddlesTime = dict()
     riddleTypes=["cipher","server","pcap","captcha"]
@@ -488,15 +480,21 @@ def saveSimulationHistory(agentId, didLeave=False):
     info = {"escaped": escaped, "score": riddlesScores, "totalScore": totalScore, "riddlesTime": riddlesTime}
     saveLeaderboardInfo(agent, info)
     # score = mazeManger.calculateScore()
-    db.Attempts.insert_one({"agentId": agentId, "maze": str(agent.mazeId), "actions": steps, "score": totalScore,
-                            "rescueItems": str(rescueItemsStatus)})
+    steps.flush()
+    db.Attempts.insert_one({"agentId": agentId, "maze": str(agent.mazeId), "stepLog": steps.session_id,
+                            "numSteps": steps.num_steps, "score": totalScore, "rescueItems": str(rescueItemsStatus),
+                            "itemPositions": [list(position) for position in mazeManager.rescue_items_dict],
+                            "incomplete": False})
+    # the writer can only mark attempts already stored, check the batches that
+    # failed before
+    if stepLogWriter.has_failed(steps.session_id):
+        markStepsIncomplete(steps.session_id)
 
     if db.Agents.find_one({"_id": agentId}) == None:
         db.Agents.insert_one({"_id": agentId, "agent": agent.getAgentJson()})
     else:
         db.Agents.replace_one({"_id": agentId}, {"_id": agentId, "agent": agent.getAgentJson()})
-    del agents[agentId]
-    del agentsSteps[agentId]
+    dropSession(agentId)
 
 
 @app.route('/addAgent', methods=['POST'])
@@ -506,8 +504,10 @@ def addAgentId():
     users = db.Users.find_one({"_id": agentId})
     if users == None:
         db.Users.insert_one({"_id": agentId, "name":name})
+        authorisedAgents.add(agentId)
         return jsonify({"Added": True}), 200
     else:
+        authorisedAgents.add(agentId)
         return jsonify({"AlreadyAdded": True}), 200
 
 
@@ -517,8 +517,10 @@ def deleteAgentId():
     users = db.Users.find_one({"_id": agentId})
     if users != None:
         db.Users.delete_one({"_id": agentId})
+        authorisedAgents.discard(agentId)
         return jsonify({"Added": True}), 200
     else:
+        authorisedAgents.discard(agentId)
         return jsonify({"Already Deleted": True}), 200
 
 @app.route('/getActiveGames', methods=['POST'])
@@ -561,7 +563,7 @@ def getAttempt():
     mazeId = request.get_json()['mazeId']
     if adminPassword in adminPasswords:
         res = db.Attempts.find_one({"agentId": agentId, 'maze':mazeId})
-        if len(list(res)) == 0:
+        if res == None:
             attemptResponse = {
                 "actions": None,
                 "score": None
@@ -569,7 +571,7 @@ def getAttempt():
             return json.loads(json_util.dumps(attemptResponse))
 
         attemptResponse = {
-            "actions": res['actions'],
+            "actions": loadSteps(res),
             "score": res['score']
         }
 
@@ -595,16 +597,20 @@ def getScore(agentId):
     return score
 
 
-def cleanAgents():
-    print("CLEANING TIMED OUT AGENTS......")
-    for agent in agents:
-        checkTimeout(agent)
+def expireSessions():
+    # ends the sessions that went over their time limits, on the scheduler thread so
+    # their histories are saved off the request threads
+    for session in sessionManager.expire():
+        endSession(session)
 
 
+EXPIRY_INTERVAL = 1
 scheduler = BackgroundScheduler()
-scheduler.add_job(func=cleanAgents, trigger="interval", seconds=600)
+scheduler.add_job(func=expireSessions, trigger="interval", seconds=EXPIRY_INTERVAL)
+scheduler.add_job(func=refreshAuthorisedAgents, trigger="interval", seconds=AUTHORISED_AGENTS_TTL)
 scheduler.start()
 atexit.register(lambda: scheduler.shutdown())
+atexit.register(stepLogWriter.close)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,650 @@
+from quart import Quart, jsonify, request
+from quart_cors import route_cors
+import numpy as np
+import json
+import os
+import asyncio
+
+from datetime import datetime
+from bson import json_util
+
+from envs import maze_manager, maze_validation
+from repository import create_repository
+from authorised_agents import AuthorisedAgents
+from step_log import StepLog, decode_steps
+from sessions import SessionManager
+
+import time
+import uuid
+
+# asyncio version of app.py with the same routes and payloads. Database calls go
+# through an async repository (motor, or in memory with MAZE_REPOSITORY=memory) so a
+# slow write never holds up the other agents, and the history of finished games is
+# saved in background tasks.
+# Run with: hypercorn async_app:app --bind 0.0.0.0:5000
+
+# -------------START CLASSES-------------
+
+allowedActions = [
+    "N", "S", "E", "W"
+]
+
+app = Quart(__name__)
+repository = create_repository(
+    os.environ.get("MAZE_REPOSITORY", "mongodb://localhost:27017")
+)
+# the headless env never touches pygame, so a step is only a few array lookups
+mazeManager = maze_manager.MazeManager(headless=True)
+
+MAX_NO_OF_SECS_BETWEEN_ACTIONS = 30
+MAX_NO_OF_SECS_OF_GAME = 900
+MAX_STEPS = 5000
+SAVING_THRESHOLD = 50
+EXPIRY_INTERVAL = 1
+# step batches waiting for the writer task, requests wait when it falls behind
+MAX_PENDING_STEP_BATCHES = 1024
+STEP_WRITE_RETRIES = 3
+STEP_RETRY_DELAY = 0.5
+rescueItems = list(mazeManager.rescue_items_dict.keys())
+RESCUE_LOCATIONS_FIRST = [list(rescueItems[0]), list(rescueItems[1]), list(rescueItems[2]), list(rescueItems[3])]
+RESCUE_LOCATIONS_FINAL = [list(rescueItems[0]), list(rescueItems[1]), list(rescueItems[2]), list(rescueItems[3])]
+# 0 for initial and 1 for final
+HACKATHON_PHASE = 0
+
+
+class Agent:
+    def __init__(self, id, connected, currentPosition, currentRiddle, solvedRiddles, mazeId,
+                 score, teamName, session):
+        self.id = id
+        self.connected = connected
+        self.currentPosition = currentPosition
+        self.currentRiddle = currentRiddle
+        self.solvedRiddles = []
+        self.riddlesTime = dict()
+        self.mazeId = mazeId
+        self.score = score
+        self.teamName = teamName
+        # timing and steps of the game, kept up to date by sessionManager
+        self.session = session
+        self.connectionTime = session.connection_time
+
+    @property
+    def stepsRemaining(self):
+        return self.session.steps_remaining
+
+    def getAgentJson(self):
+        return {
+            "id": 0,
+            "connected": self.connected,
+            "currentPosition": self.currentPosition,
+            "currentRiddle": self.currentRiddle,
+            "solvedRiddles": self.solvedRiddles,
+            "mazeId": self.mazeId,
+            "score": self.score,
+            "teamName": self.teamName,
+            "connectionTime": self.connectionTime
+        }
+
+
+agents = dict()
+agentsSteps = dict()
+sessionManager = SessionManager(MAX_STEPS, MAX_NO_OF_SECS_BETWEEN_ACTIONS, MAX_NO_OF_SECS_OF_GAME)
+# pending database writes, kept referenced until they finish
+backgroundTasks = set()
+expiryTask = None
+refreshingTask = None
+stepBatches = None
+stepWriterTask = None
+# step logs with a batch that could not be written, their attempts are incomplete
+failedStepLogs = set()
+
+
+def getAgent(id):
+    return agents[id] if id in agents else None
+
+
+allowedAgents = {
+    'ABC123',
+    'ABC1234',
+    0
+}
+
+adminPasswords = {
+    "ADMIN123"
+}
+
+# ids of the Users collection, checked on every request without a database query
+AUTHORISED_AGENTS_TTL = 60
+authorisedAgents = AuthorisedAgents(ttl=AUTHORISED_AGENTS_TTL)
+
+
+def validate_maze(maze):
+    report = maze_validation.check_maze(maze, maze_size=(10, 10))
+    return report.is_valid, report.message
+
+
+def toJson(documents):
+    # database documents (ObjectId, datetime...) to plain JSON values
+    return json.loads(json_util.dumps(documents))
+
+
+def runInBackground(coroutine):
+    task = asyncio.get_running_loop().create_task(coroutine)
+    backgroundTasks.add(task)
+    task.add_done_callback(backgroundTasks.discard)
+    task.add_done_callback(logBackgroundFailure)
+    return task
+
+
+def logBackgroundFailure(task):
+    # nobody may be awaiting the task (games ended by the expiry task), so its
+    # failure is printed here instead of being lost
+    if not task.cancelled() and task.exception() is not None:
+        print("COULD NOT SAVE HISTORY:", task.exception())
+
+
+def writeStepBatch(sessionId, batchIndex, steps):
+    # steps of every game are written by batches while it runs, queued for the
+    # writer task. Requests wait for room first (waitForStepWriter), so the queue
+    # is only full if many games end at once
+    try:
+        stepBatches.put_nowait((sessionId, batchIndex, steps))
+    except asyncio.QueueFull:
+        print("COULD NOT SAVE STEPS: too many pending batches")
+        runInBackground(failStepLog(sessionId))
+
+
+def discardStepBatches(sessionId):
+    # deleted by the writer task, after the batches of the session still queued
+    try:
+        stepBatches.put_nowait((sessionId, None, None))
+    except asyncio.QueueFull:
+        runInBackground(stepBatches.put((sessionId, None, None)))
+
+
+async def waitForStepWriter():
+    # called before anything that may add a batch, a request adds at most one
+    while stepBatches.full():
+        await stepBatches.join()
+
+
+async def writeStepBatches():
+    # the single writer of the queued batches, a failed write is tried again a few
+    # times before the attempt of the game is marked incomplete
+    while True:
+        sessionId, batchIndex, steps = await stepBatches.get()
+        try:
+            if batchIndex is None:
+                await repository.delete_step_batches(sessionId)
+            elif not await insertStepBatch(sessionId, batchIndex, steps):
+                await failStepLog(sessionId)
+        except Exception as error:
+            print("COULD NOT SAVE STEPS:", error)
+        finally:
+            stepBatches.task_done()
+
+
+async def insertStepBatch(sessionId, batchIndex, steps):
+    # False if the batch could not be written
+    delay = STEP_RETRY_DELAY
+    for retry in range(STEP_WRITE_RETRIES + 1):
+        try:
+            await repository.insert_step_batch(sessionId, batchIndex, steps)
+            return True
+        except Exception as error:
+            print("COULD NOT SAVE STEPS:", error)
+        if retry < STEP_WRITE_RETRIES:
+            await asyncio.sleep(delay)
+            delay *= 2
+    return False
+
+
+async def failStepLog(sessionId):
+    # the attempt may not be stored yet, writeSimulationHistory checks failedStepLogs
+    failedStepLogs.add(sessionId)
+    await repository.mark_attempt_incomplete(sessionId)
+
+
+async def loadSteps(attempt):
+    if "stepLog" not in attempt:
+        return attempt["actions"]
+    batches = await repository.find_step_batches(attempt["stepLog"])
+    return decode_steps(batches, attempt["itemPositions"])
+
+
+def checkTimeout(agentId):
+    # counts the step, False if the session is over (time limits or no steps left)
+    if sessionManager.use_step(agentId):
+        return True
+    # ended here, unless the expiry task already did
+    session = sessionManager.end(agentId)
+    if session is not None:
+        endSession(session)
+    return False
+
+
+def endSession(session):
+    # session ended in sessionManager, saved if enough steps were played. Returns
+    # the task writing its history (None if nothing is saved)
+    agent = agents.get(session.agent_id)
+    if agent is None or agent.session is not session:
+        return None  # the agent already started a new game
+    if MAX_STEPS - session.steps_remaining > SAVING_THRESHOLD:
+        return saveSimulationHistory(session.agent_id)
+    dropSession(session.agent_id)
+    return None
+
+
+def dropSession(agentId):
+    del agents[agentId]
+    del agentsSteps[agentId]
+
+
+# -------------END CLASSES--------------------
+
+@app.route('/status')
+async def status():
+    return jsonify({'status': 'up'})
+
+
+@app.route('/submitMaze', methods=['POST'])
+async def submitMaze():
+    data = await request.get_json()
+    agentId = data['agentId']
+    if agentId not in authorisedAgents:
+        return "agentId is either wrong, or not initialized!", 400
+    else:
+        submittedMaze = data['submittedMaze']
+        submittedMazeNp = np.array(json.loads(submittedMaze))
+        isValid, validationText = validate_maze(submittedMazeNp)
+        if not isValid:
+            return validationText, 400
+        if not await repository.insert_maze(agentId, submittedMaze):
+            return "Maze is either already submitted or invalid", 400
+        return validationText, 200
+
+
+@app.route('/init', methods=['POST'])
+async def init():
+    try:
+        agentId = (await request.get_json())['agentId']
+    except:
+        return "Wrong request", 400
+    if agentId in authorisedAgents:
+        if agentId in agents:
+            await waitForStepWriter()
+            session = sessionManager.end(agentId)
+            if session is not None:
+                # wait for the write, the attempts are counted just below
+                await waitForHistory(endSession(session))
+        # check attempts
+        mazeNumber = HACKATHON_PHASE
+        attemptsList = await repository.find_attempts(agentId, str(mazeNumber))
+        if (len(attemptsList) >= 5) and (mazeNumber == 0):
+            return "Max attempts reached", 400
+        elif len(attemptsList) > 0 and (mazeNumber != 0):
+            return "Maze already attempted", 400
+
+        if mazeNumber != 0 and mazeNumber != 1:
+            return "Maze Number not valid", 400
+        ## check if user attempted their maze
+        if mazeNumber == 1:
+            attemptsList = await repository.find_attempts(agentId)
+            attemptedMazes = []
+            for attempt in attemptsList:
+                attemptedMazes.append(attempt['maze'])
+            if agentId not in attemptedMazes:
+                mazeNumber = agentId
+            else:
+                for submittedMaze in allowedAgents:
+                    if submittedMaze not in attemptedMazes:
+                        mazeNumber = submittedMaze
+                        break
+                if mazeNumber == 1:
+                    return "all mazes attempted", 400
+
+        Maze = await repository.find_maze(str(mazeNumber))
+        if Maze == None:
+            return "Maze Not Found", 400
+        numpyMaze = np.array(Maze["maze"])
+        mazeState = mazeManager.init_maze(agentId, maze_cells=numpyMaze)
+
+        state = {
+            "position": mazeState[0].tolist(),
+            "distances": mazeState[1],
+            "directions": mazeState[2]
+        }
+        newAgent = Agent(
+            id=agentId, connected=True, currentPosition=state["position"],
+            currentRiddle=0, solvedRiddles=[], mazeId=mazeNumber,
+            score=0, teamName="", session=sessionManager.start(agentId)
+        )
+        agentsSteps[agentId] = StepLog(uuid.uuid4().hex, writeStepBatch)
+        agents[agentId] = newAgent
+        # Send state
+        return {'position': state["position"],
+                "distances": state["distances"],
+                "directions": state["directions"]}, 200
+    else:
+        return "Connection refused because agentId is wrong, please double check and try again!", 401
+
+
+@app.route('/move', methods=['POST'])
+async def move():
+    data = await request.get_json()
+    agentId = data['agentId']
+    if agentId not in authorisedAgents:
+        return "agentId is either wrong, or not initialized!", 400
+    await waitForStepWriter()
+    # taken before stepping, like app.py (where the expiry job runs on another thread)
+    agent = getAgent(agentId)
+    steps = agentsSteps.get(agentId)
+    if agent is not None and steps is not None:
+        if checkTimeout(agentId):
+            action = data['action']
+
+            if action in allowedActions:
+                obv, reward, terminated, truncated, info = mazeManager.step(agentId, action)
+                state = {
+                    "position": obv[0].tolist(),
+                    "distances": obv[1],
+                    "directions": obv[2],
+                    "rescuedItems": info["rescued_items"],
+                    "riddleType": info["riddle_type"],
+                    "riddleQuestion": info["riddle_question"],
+                }
+                if info['riddle_type'] and info['riddle_question']:
+                    agent.riddlesTime[info['riddle_type']] = time.time()
+                steps.append(obv[0], allowedActions.index(action), mazeManager.get_rescue_items_status_bits(agentId))
+                agent.currentPosition = obv[0].tolist()
+                return state, 200
+            else:
+                return "Action is invalid", 400
+        else:
+            return "Time limit exceeded, or reached max number of steps", 400
+    else:
+        return "agent not initialized", 400
+
+
+@app.route('/solve', methods=['POST'])
+async def solve():
+    try:
+        data = await request.get_json()
+        agentId = data['agentId']
+    except:
+        return "Agent id not found in request", 400
+    if agentId not in authorisedAgents or agentId not in agents:
+        return "agentId is either wrong, or not initialized!", 400
+    else:
+        await waitForStepWriter()
+        agent = getAgent(agentId)
+        if agent is not None and checkTimeout(agentId):
+            try:
+                solution, riddleType = data['solution'], data["riddleType"]
+            except:
+                return "Wrong input ", 400
+            agent.riddlesTime[riddleType] = time.time() - agent.riddlesTime[riddleType]
+            mazeState = mazeManager.solve_riddle(riddleType, agentId, solution)
+            state = {
+                "position": mazeState[0][0].tolist(),
+                "distances": mazeState[0][1],
+                "directions": mazeState[0][2],
+                "rescuedItems": mazeState[4]["rescued_items"],
+                "riddleType":  mazeState[4]["riddle_type"],
+                "riddleQuestion":  mazeState[4]["riddle_question"],
+            }
+            return state, 200
+        else:
+            return "Time limit exceeded, or reached max number of steps", 400
+
+
+@app.route('/getAgentStatus', methods=['POST'])
+async def getAgentStatus():
+    data = await request.get_json()
+    agentId = data['agentId']
+    adminPassword = data['adminPassword']
+    if adminPassword in adminPasswords:
+        agent = getAgent(agentId)
+        if agent == None:
+            return "agentId is either wrong, or not initialized!", 400
+        else:
+            return jsonify({
+                "id": agent.id,
+                "connected": agent.connected,
+                "currentPosition": agent.currentPosition,
+                "mazeId": agent.mazeId,
+                "score": agent.score,
+                "teamInfo": agent.teamName,
+                "connectionTime": agent.connectionTime,
+                "lastAction": sessionManager.last_action_time(agentId),
+                "remainingSteps": agent.stepsRemaining
+            }), 200
+    else:
+        return "Wrong admin password", 403
+
+
+@app.route('/killSession', methods=['POST'])
+async def killSession():
+    # check admin password
+    data = await request.get_json()
+    agentId = data['agentId']
+    adminPassword = data['adminPassword']
+    if adminPassword in adminPasswords:
+        await waitForStepWriter()
+        agent = getAgent(agentId)
+        if agent == None or sessionManager.end(agentId) is None:
+            return "agentId is either wrong, or not initialized!", 400
+        else:
+            await waitForHistory(saveSimulationHistory(agentId))
+            return "Agent Killed!", 200
+    else:
+        return "Wrong admin password", 403
+
+
+@app.route('/leave', methods=['POST'])
+async def leave():
+    try:
+        agentId = (await request.get_json())['agentId']
+    except:
+        return "Can't find agent id", 400
+    await waitForStepWriter()
+    if agentId not in agents or sessionManager.end(agentId) is None:
+        return "agentId is either wrong, or not initialized!", 400
+    else:
+        position = agents[agentId].currentPosition
+        if position == [9, 9]:
+            await waitForHistory(saveSimulationHistory(agentId, True))
+        else:
+            await waitForHistory(saveSimulationHistory(agentId))
+        return "You successfully exited the maze!", 200
+
+
+def saveSimulationHistory(agentId, didLeave=False):
+    # removes the agent right away and writes its history in a background task,
+    # returns the task (None if nothing is saved)
+    steps = agentsSteps[agentId]
+    escaped = didLeave
+
+    agent = agents[agentId]
+    if agentId == agent.mazeId and didLeave == False:
+        # not saved, no attempt will refer to the batches it already wrote
+        if steps.num_batches > 0:
+            discardStepBatches(steps.session_id)
+        dropSession(agentId)
+        return None
+
+    totalScore, riddlesScores = mazeManager.calculate_final_score(agentId, agent.riddlesTime)
+    riddlesTime = dict()
+    riddleTypes = ["cipher", "server", "pcap", "captcha"]
+    for riddleType in riddleTypes:
+        try:
+            riddlesTime[riddleType] = agent.riddlesTime[riddleType]
+        except:
+            riddlesTime[riddleType] = "unsolved"
+    rescueItemsStatus = [1, 2, 0, 1]
+    info = {"escaped": escaped, "score": riddlesScores, "totalScore": totalScore, "riddlesTime": riddlesTime}
+    submission = getLeaderboardInfo(agent, info)
+    steps.flush()
+    attempt = {"agentId": agentId, "maze": str(agent.mazeId), "stepLog": steps.session_id,
+               "numSteps": steps.num_steps, "score": totalScore, "rescueItems": str(rescueItemsStatus),
+               "itemPositions": [list(position) for position in mazeManager.rescue_items_dict],
+               "incomplete": False}
+    agentJson = agent.getAgentJson()
+    dropSession(agentId)
+
+    return runInBackground(writeSimulationHistory(agentId, submission, attempt, agentJson))
+
+
+async def waitForHistory(task):
+    # waits for a history written by saveSimulationHistory (None if nothing is saved)
+    if task is not None:
+        await task
+
+
+async def writeSimulationHistory(agentId, submission, attempt, agentJson):
+    await repository.insert_submission(submission)
+    await repository.insert_attempt(attempt)
+    if attempt["stepLog"] in failedStepLogs:
+        # failed before the attempt was stored
+        await repository.mark_attempt_incomplete(attempt["stepLog"])
+    await repository.save_agent(agentId, agentJson)
+
+
+@app.route('/addAgent', methods=['POST'])
+async def addAgentId():
+    data = await request.get_json()
+    agentId = data['agentId']
+    name = data['name']
+    added = await repository.add_user(agentId, name)
+    authorisedAgents.add(agentId)
+    if added:
+        return jsonify({"Added": True}), 200
+    else:
+        return jsonify({"AlreadyAdded": True}), 200
+
+
+@app.route('/deleteAgent', methods=['POST'])
+async def deleteAgentId():
+    agentId = (await request.get_json())['agentId']
+    deleted = await repository.delete_user(agentId)
+    authorisedAgents.discard(agentId)
+    if deleted:
+        return jsonify({"Added": True}), 200
+    else:
+        return jsonify({"Already Deleted": True}), 200
+
+
+@app.route('/getActiveGames', methods=['POST'])
+async def getActiveGames():
+    adminPassword = (await request.get_json())['apiKey']
+    if adminPassword in adminPasswords:
+        return jsonify({str(agentId): agent.getAgentJson() for agentId, agent in agents.items()}), 200
+    else:
+        return "Wrong api key", 403
+
+
+@app.route('/getTeamsAndMazes', methods=['POST'])
+@route_cors(allow_origin="*")
+async def getTeamsAndMazes():
+    adminPassword = (await request.get_json())['apiKey']
+    if adminPassword in adminPasswords:
+        dbMazes = await repository.list_mazes()
+        dbTeams = await repository.list_users()
+        return jsonify(toJson({'mazes': dbMazes, 'teams': dbTeams, 'rescueItems': RESCUE_LOCATIONS_FIRST}))
+    else:
+        return "Wrong api key", 401
+
+
+@app.route('/getLeaderboard', methods=['POST'])
+@route_cors(allow_origin="*")
+async def getLeaderboard():
+    adminPassword = (await request.get_json())['apiKey']
+    if adminPassword in adminPasswords:
+        dbSubmissions = await repository.list_submissions()
+        return jsonify(toJson(dbSubmissions))
+    else:
+        return "Wrong api key", 401
+
+
+@app.route('/getAttempt', methods=['POST'])
+@route_cors(allow_origin="*")
+async def getAttempt():
+    data = await request.get_json()
+    adminPassword = data['apiKey']
+    agentId = data['agentId']
+    mazeId = data['mazeId']
+    if adminPassword in adminPasswords:
+        res = await repository.find_attempt(agentId, mazeId)
+        if res == None:
+            attemptResponse = {
+                "actions": None,
+                "score": None
+            }
+            return jsonify(toJson(attemptResponse))
+
+        attemptResponse = {
+            "actions": await loadSteps(res),
+            "score": res['score']
+        }
+
+        return jsonify(toJson(attemptResponse))
+    else:
+        return "Wrong api key", 401
+
+
+def getLeaderboardInfo(agent, info):
+    return {"agentId": agent.id,
+            "teamName": agent.teamName,
+            "actions": MAX_STEPS - agent.stepsRemaining,
+            "escaped": info['escaped'],
+            "score": info['score'],
+            "submissionTime": datetime.now(),
+            "totalScore": info['totalScore'],
+            "riddlesTime": info['riddlesTime']
+            }
+
+
+async def expireSessions():
+    # ends the sessions that went over their time limits, their histories are
+    # written in background tasks
+    while True:
+        await asyncio.sleep(EXPIRY_INTERVAL)
+        for session in sessionManager.expire():
+            await waitForStepWriter()
+            endSession(session)
+
+
+async def refreshAuthorisedAgents():
+    while True:
+        await asyncio.sleep(authorisedAgents.ttl)
+        try:
+            await authorisedAgents.reload_async(repository.list_user_ids)
+        except Exception as error:
+            print("COULD NOT REFRESH AGENTS:", error)
+
+
+@app.before_serving
+async def startBackgroundTasks():
+    global expiryTask, refreshingTask, stepBatches, stepWriterTask
+    await repository.create_indexes()
+    await authorisedAgents.reload_async(repository.list_user_ids)
+    stepBatches = asyncio.Queue(MAX_PENDING_STEP_BATCHES)
+    stepWriterTask = asyncio.get_running_loop().create_task(writeStepBatches())
+    expiryTask = asyncio.get_running_loop().create_task(expireSessions())
+    refreshingTask = asyncio.get_running_loop().create_task(refreshAuthorisedAgents())
+
+
+@app.after_serving
+async def stopBackgroundTasks():
+    expiryTask.cancel()
+    refreshingTask.cancel()
+    # let the last histories reach the database
+    if backgroundTasks:
+        await asyncio.gather(*backgroundTasks, return_exceptions=True)
+    await stepBatches.join()
+    stepWriterTask.cancel()
+    repository.close()
+
+
+if __name__ == "__main__":
+    app.run(host='0.0.0.0')
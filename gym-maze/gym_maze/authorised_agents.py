@@ -0,0 +1,77 @@
+import threading
+
+
+class AuthorisedAgents:
+    # In-process copy of the ids in the Users collection, so checking an agent is a
+    # set lookup instead of a database query. The servers fill it at startup, update
+    # it from /addAgent and /deleteAgent and reload it every few seconds (ttl) to pick
+    # up changes made directly in the database.
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self.__ids = frozenset()
+        self.__lock = threading.Lock()
+        # changes made while a reload is reading the database, replayed on top of it
+        self.__pending = None
+
+    def __contains__(self, agent_id):
+        return agent_id in self.__ids
+
+    def __len__(self):
+        return len(self.__ids)
+
+    def add(self, agent_id):
+        self.__apply(True, agent_id)
+
+    def discard(self, agent_id):
+        self.__apply(False, agent_id)
+
+    def begin_reload(self):
+        with self.__lock:
+            self.__pending = []
+
+    def finish_reload(self, agent_ids):
+        # agent_ids: every id read from the database since begin_reload
+        ids = set(agent_ids)
+        with self.__lock:
+            for added, agent_id in self.__pending or []:
+                if added:
+                    ids.add(agent_id)
+                else:
+                    ids.discard(agent_id)
+            self.__ids = frozenset(ids)
+            self.__pending = None
+
+    def cancel_reload(self):
+        # the reload failed, keep the current ids (they already include the changes)
+        with self.__lock:
+            self.__pending = None
+
+    def reload(self, load_ids):
+        # load_ids() returns the ids currently in the database
+        self.begin_reload()
+        try:
+            agent_ids = load_ids()
+        except Exception:
+            self.cancel_reload()
+            raise
+        self.finish_reload(agent_ids)
+
+    async def reload_async(self, load_ids):
+        # same as reload, load_ids is a coroutine function (async repository)
+        self.begin_reload()
+        try:
+            agent_ids = await load_ids()
+        except Exception:
+            self.cancel_reload()
+            raise
+        self.finish_reload(agent_ids)
+
+    def __apply(self, added, agent_id):
+        # the set is replaced, never mutated, so lookups need no lock
+        with self.__lock:
+            if added:
+                self.__ids = self.__ids | {agent_id}
+            else:
+                self.__ids = self.__ids - {agent_id}
+            if self.__pending is not None:
+                self.__pending.append((added, agent_id))
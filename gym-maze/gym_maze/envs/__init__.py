@@ -1,2 +1,18 @@
-from gym_maze.envs.maze_env import *
-from gym_maze.envs.maze_view_2d import MazeView2D
+import importlib
+
+from gym_maze.envs.headless_maze_env import HeadlessMazeEnv, HeadlessMazeView
+from gym_maze.envs.vector_maze_env import VectorMazeEnv
+
+
+# The pygame based environments are only imported when they are first used, so the
+# headless environment can be used without pygame installed
+def __getattr__(name):
+    if name.startswith("_"):
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    if name == "MazeView2D":
+        return importlib.import_module("gym_maze.envs.maze_view_2d").MazeView2D
+
+    maze_env = importlib.import_module("gym_maze.envs.maze_env")
+    if hasattr(maze_env, name):
+        return getattr(maze_env, name)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
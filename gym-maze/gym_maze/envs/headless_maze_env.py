@@ -0,0 +1,189 @@
+import numpy as np
+
+import gym
+from gym import spaces
+from gym.utils import seeding
+from gym_maze.envs.maze import (
+    MOVE_INDEX,
+    Maze,
+    get_rescue_items_observation,
+)
+
+
+class HeadlessMazeView:
+    # Drop-in replacement of MazeView2D without any drawing (pygame is never imported)
+
+    def __init__(
+        self, maze_cells=None, maze_size=(10, 10), rescue_item_locations=None
+    ):
+        self.__game_over = False
+        self.__rescued_items = 0
+        self.rescue_item_locations = rescue_item_locations
+
+        if hasattr(maze_cells, "shape"):
+            self.__maze = Maze(
+                maze_cells=maze_cells, rescue_item_locations=rescue_item_locations
+            )
+        else:
+            self.__maze = Maze(
+                maze_size=maze_size, rescue_item_locations=rescue_item_locations
+            )
+        self.maze_size = self.__maze.maze_size
+
+        self.__item_locations = np.array(
+            [item.location for item in self.__maze.rescue_items_list], dtype=int
+        ).reshape(-1, 2)
+
+        self.__entrance = np.zeros(2, dtype=int)
+        self.__goal = np.array(self.maze_size) - np.array((1, 1))
+        self.__robot = self.entrance.copy()
+
+    def update(self, mode="human"):
+        return None
+
+    def quit_game(self):
+        self.__game_over = True
+
+    def get_rescue_items_locations(self):
+        rescued = [item.rescued for item in self.__maze.rescue_items_list]
+        distances, directions = get_rescue_items_observation(
+            self.__robot, self.__item_locations, rescued
+        )
+        return distances.tolist(), directions.tolist()
+
+    def reset_rescue_items(self):
+        self.__rescued_items = 0
+        for rescue_item in self.__maze.rescue_items_list:
+            rescue_item.rescued = False
+
+    def move_robot(self, dir):
+        if dir not in MOVE_INDEX:
+            raise ValueError(
+                "dir cannot be %s. The only valid dirs are %s."
+                % (str(dir), str(MOVE_INDEX.keys()))
+            )
+
+        if self.__maze.open_moves[self.__robot[0], self.__robot[1], MOVE_INDEX[dir]]:
+            self.__robot += np.array(self.__maze.COMPASS[dir])
+
+    def reset_robot(self):
+        self.__robot = np.zeros(2, dtype=int)
+
+    @property
+    def maze(self):
+        return self.__maze
+
+    @property
+    def robot(self):
+        return self.__robot
+
+    @property
+    def entrance(self):
+        return self.__entrance
+
+    @property
+    def goal(self):
+        return self.__goal
+
+    @property
+    def rescued_items(self):
+        return self.__rescued_items
+
+    def increment_rescue_items(self):
+        self.__rescued_items += 1
+
+    @property
+    def game_over(self):
+        return self.__game_over
+
+
+class HeadlessMazeEnv(gym.Env):
+    # Same step/reset/get_current_state contract as MazeEnv, without rendering
+
+    metadata = {
+        "render.modes": [],
+    }
+
+    ACTION = ["N", "S", "E", "W"]
+
+    def __init__(
+        self,
+        maze_cells=None,
+        maze_size=None,
+        enable_render=False,
+        rescue_item_locations=None,
+    ):
+        if rescue_item_locations is None:
+            rescue_item_locations = []
+
+        if hasattr(maze_cells, "shape"):
+            self.maze_view = HeadlessMazeView(
+                maze_cells=maze_cells, rescue_item_locations=rescue_item_locations
+            )
+        elif maze_size:
+            self.maze_view = HeadlessMazeView(
+                maze_size=maze_size, rescue_item_locations=rescue_item_locations
+            )
+        else:
+            raise AttributeError(
+                "One must supply either maze_cells (numpy array) or the maze_size (tuple of length 2)"
+            )
+
+        self.maze_size = self.maze_view.maze_size
+
+        # forward or backward in each dimension
+        self.action_space = spaces.Discrete(2 * len(self.maze_size))
+
+        # observation is the x, y coordinate of the grid
+        low = np.zeros(len(self.maze_size), dtype=int)
+        high = np.array(self.maze_size, dtype=int) - np.ones(
+            len(self.maze_size), dtype=int
+        )
+        self.observation_space = spaces.Box(low, high, dtype=np.int64)
+
+        self.state = None
+        self.steps_beyond_done = None
+        self.steps = None
+
+        self.seed()
+        self.reset()
+
+    def seed(self, seed=None):
+        self.np_random, seed = seeding.np_random(seed)
+        return [seed]
+
+    def step(self, action):
+        if isinstance(action, (int, np.integer)):
+            self.maze_view.move_robot(self.ACTION[action])
+        else:
+            self.maze_view.move_robot(action)
+
+        self.steps += 1
+        return self.get_current_state()
+
+    def get_current_state(self):
+        info = {}
+        distances, directions = self.maze_view.get_rescue_items_locations()
+
+        info["rescued_items"] = self.maze_view.rescued_items
+        info["riddle_type"] = None
+        info["riddle_question"] = None
+
+        self.state = [self.maze_view.robot, distances, directions]
+        return self.state, None, False, False, info
+
+    def reset(self):
+        self.maze_view.reset_robot()
+        self.state = self.get_current_state()[0]
+        self.steps_beyond_done = None
+        self.steps = 0
+        self.terminated = False
+        self.truncated = False
+        self.maze_view.reset_rescue_items()
+        return self.state
+
+    def is_game_over(self):
+        return self.maze_view.game_over
+
+    def render(self, mode="human", close=False):
+        return None
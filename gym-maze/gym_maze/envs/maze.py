@@ -0,0 +1,342 @@
+import random
+import numpy as np
+import os
+
+
+# order of the last axis of the open moves table (same as the wall bits 1, 2, 4, 8)
+MOVE_INDEX = {"N": 0, "E": 1, "S": 2, "W": 3}
+
+
+def compute_open_moves(maze_cells):
+    # boolean table of shape maze_cells.shape + (4,) telling if the robot can move
+    # from a cell in each direction. A move is open if the wall is broken on either
+    # side and the destination is within bounds. Leading (batch) axes are allowed.
+    cells = np.asarray(maze_cells)
+    broken = np.stack([(cells & bit) != 0 for bit in (0x1, 0x2, 0x4, 0x8)], axis=-1)
+    moves = broken.copy()
+
+    # N: (x, y - 1) is open if this cell's N or the other cell's S wall is broken
+    moves[..., :, 1:, 0] |= broken[..., :, :-1, 2]
+    moves[..., :, 0, 0] = False
+    # E: (x + 1, y)
+    moves[..., :-1, :, 1] |= broken[..., 1:, :, 3]
+    moves[..., -1, :, 1] = False
+    # S: (x, y + 1)
+    moves[..., :, :-1, 2] |= broken[..., :, 1:, 0]
+    moves[..., :, -1, 2] = False
+    # W: (x - 1, y)
+    moves[..., 1:, :, 3] |= broken[..., :-1, :, 1]
+    moves[..., 0, :, 3] = False
+    return moves
+
+
+def get_rescue_items_observation(robot, item_locations, rescued):
+    # distances (-1 once rescued) and sign directions from the robot to every item.
+    # Leading (batch) axes are allowed: robot (..., 2), item_locations (..., K, 2)
+    # and rescued (..., K)
+    item_locations = np.asarray(item_locations, dtype=int)
+    if item_locations.ndim == 1:
+        item_locations = item_locations.reshape(-1, 2)
+    rescued = np.asarray(rescued, dtype=bool)
+    offsets = item_locations - np.asarray(robot, dtype=int)[..., None, :]
+    distances = np.where(rescued, -1, np.abs(offsets).sum(axis=-1))
+    directions = np.where(rescued[..., None], 0, np.sign(offsets))
+    return distances, directions
+
+
+class Maze:
+
+    COMPASS = {"N": (0, -1), "E": (1, 0), "S": (0, 1), "W": (-1, 0)}
+
+    def __init__(
+        self,
+        maze_cells=None,
+        maze_size=(10, 10),
+        has_loops=True,
+        num_rescue_items=0,
+        rescue_item_locations=None,
+    ):
+
+        # maze member variables
+        self.maze_cells = maze_cells
+        self.has_loops = has_loops
+        self.__rescue_items_dict = dict()
+        self.__rescue_items_list = []
+        self.num_rescue_items = num_rescue_items
+        self.rescue_item_locations = rescue_item_locations
+        # table of the open moves of every cell, see compute_open_moves
+        self.__open_moves = None
+
+        # Use existing one if exists
+        if hasattr(self.maze_cells, "shape"):
+            if (
+                isinstance(self.maze_cells, (np.ndarray, np.generic))
+                and len(self.maze_cells.shape) == 2
+            ):
+                self.maze_size = tuple(maze_cells.shape)
+                locations = self.rescue_item_locations
+                self.__set_random_rescue_items(locations)
+            else:
+                raise ValueError("maze_cells must be a 2D NumPy array.")
+        # Otherwise, generate a random one
+        else:
+            # maze's configuration parameters
+            if not (isinstance(maze_size, (list, tuple)) and len(maze_size) == 2):
+                raise ValueError("maze_size must be a tuple: (width, height).")
+            self.maze_size = maze_size
+
+            self._generate_maze()
+
+        self.__open_moves = compute_open_moves(self.maze_cells)
+
+    def save_maze(self, file_path):
+
+        if not isinstance(file_path, str):
+            raise TypeError("Invalid file_path. It must be a str.")
+
+        if not os.path.exists(os.path.dirname(file_path)):
+            raise ValueError("Cannot find the directory for %s." % file_path)
+
+        else:
+            np.save(file_path, self.maze_cells, allow_pickle=False, fix_imports=True)
+
+    @classmethod
+    def load_maze(cls, file_path):
+
+        if not isinstance(file_path, str):
+            raise TypeError("Invalid file_path. It must be a str.")
+
+        if not os.path.exists(file_path):
+            raise ValueError("Cannot find %s." % file_path)
+
+        else:
+            return np.load(file_path, allow_pickle=False, fix_imports=True)
+
+    def _generate_maze(self):
+
+        # list of all cell locations
+        self.maze_cells = np.zeros(self.maze_size, dtype=int)
+        self.invalidate_open_moves()
+
+        # Initializing constants and variables needed for maze generation
+        current_cell = (
+            random.randint(0, self.MAZE_W - 1),
+            random.randint(0, self.MAZE_H - 1),
+        )
+        num_cells_visited = 1
+        cell_stack = [current_cell]
+
+        # Continue until all cells are visited
+        while cell_stack:
+
+            # restart from a cell from the cell stack
+            current_cell = cell_stack.pop()
+            x0, y0 = current_cell
+
+            # find neighbours of the current cells that actually exist
+            neighbours = dict()
+            for dir_key, dir_val in self.COMPASS.items():
+                x1 = x0 + dir_val[0]
+                y1 = y0 + dir_val[1]
+                # if cell is within bounds
+                if 0 <= x1 < self.MAZE_W and 0 <= y1 < self.MAZE_H:
+                    # if all four walls still exist
+                    if self.all_walls_intact(self.maze_cells[x1, y1]):
+                        # if self.num_walls_broken(self.maze_cells[x1, y1]) <= 1:
+                        neighbours[dir_key] = (x1, y1)
+
+            # if there is a neighbour
+            if neighbours:
+                # select a random neighbour
+                dir = random.choice(tuple(neighbours.keys()))
+                x1, y1 = neighbours[dir]
+
+                # knock down the wall between the current cell and the selected neighbour
+                self.maze_cells[x1, y1] = self.__break_walls(
+                    self.maze_cells[x1, y1], self.__get_opposite_wall(dir)
+                )
+
+                # push the current cell location to the stack
+                cell_stack.append(current_cell)
+
+                # make the this neighbour cell the current cell
+                cell_stack.append((x1, y1))
+
+                # increment the visited cell count
+                num_cells_visited += 1
+
+        if self.has_loops:
+            self.__break_random_walls(0.2)
+
+        locations = self.rescue_item_locations
+        self.__set_random_rescue_items(locations)
+
+    def __break_random_walls(self, percent):
+        # find some random cells to break
+        num_cells = int(round(self.MAZE_H * self.MAZE_W * percent))
+        cell_ids = random.sample(range(self.MAZE_W * self.MAZE_H), num_cells)
+
+        # for each of those walls
+        for cell_id in cell_ids:
+            x = cell_id % self.MAZE_W
+            y = int(cell_id / self.MAZE_W)
+
+            # randomize the compass order
+            dirs = random.sample(list(self.COMPASS.keys()), len(self.COMPASS))
+            for dir in dirs:
+                # break the wall if it's not already open
+                if self.is_breakable((x, y), dir):
+                    self.maze_cells[x, y] = self.__break_walls(
+                        self.maze_cells[x, y], dir
+                    )
+                    self.__update_open_moves((x, y))
+                    break
+
+    def __set_random_rescue_items(self, locations):
+        for location in locations:
+            count = 1
+            item_class = "x"
+            rescue_item = RescueItem(item_class, count, location)
+            self.__rescue_items_dict[location] = rescue_item
+            self.__rescue_items_list.append(rescue_item)
+
+    @property
+    def open_moves(self):
+        # (W, H, 4) boolean table, indexed with MOVE_INDEX. Rebuilt after walls change
+        if self.__open_moves is None:
+            self.__open_moves = compute_open_moves(self.maze_cells)
+        return self.__open_moves
+
+    def invalidate_open_moves(self):
+        # must be called whenever maze_cells is modified
+        self.__open_moves = None
+
+    def __update_open_moves(self, cell_id):
+        # update the table in place after the walls of a single cell changed. A cell
+        # only keeps one broken wall, so all four of its moves may have changed, and
+        # the moves of its neighbours towards it
+        if self.__open_moves is None:
+            return
+        x0, y0 = cell_id
+        for dir, (dx, dy) in self.COMPASS.items():
+            x1, y1 = x0 + dx, y0 + dy
+            if not self.is_within_bound(x1, y1):
+                self.__open_moves[x0, y0, MOVE_INDEX[dir]] = False
+                continue
+            opposite_dir = self.__get_opposite_wall(dir)
+            is_open = bool(
+                self.maze_cells[x0, y0] & (1 << MOVE_INDEX[dir])
+                or self.maze_cells[x1, y1] & (1 << MOVE_INDEX[opposite_dir])
+            )
+            self.__open_moves[x0, y0, MOVE_INDEX[dir]] = is_open
+            self.__open_moves[x1, y1, MOVE_INDEX[opposite_dir]] = is_open
+
+    def is_open(self, cell_id, dir):
+        # the wall is opened from either side and the move stays within bounds
+        return bool(self.open_moves[cell_id[0], cell_id[1], MOVE_INDEX[dir]])
+
+    def is_breakable(self, cell_id, dir):
+        x1 = cell_id[0] + self.COMPASS[dir][0]
+        y1 = cell_id[1] + self.COMPASS[dir][1]
+
+        return not self.is_open(cell_id, dir) and self.is_within_bound(x1, y1)
+
+    def is_within_bound(self, x, y):
+        # true if cell is still within bounds after the move
+        return 0 <= x < self.MAZE_W and 0 <= y < self.MAZE_H
+
+    def is_rescue_item(self, cell):
+        return tuple(cell) in self.__rescue_items_dict
+
+    @property
+    def rescue_items_list(self):
+        return self.__rescue_items_list
+
+    @property
+    def rescue_items_dict(self):
+        return self.__rescue_items_dict
+
+    def get_rescue_item(self, cell):
+        if cell in self.__rescue_items_dict:
+            return self.__rescue_items_dict[cell]
+        return None
+
+    @property
+    def MAZE_W(self):
+        return int(self.maze_size[0])
+
+    @property
+    def MAZE_H(self):
+        return int(self.maze_size[1])
+
+    @classmethod
+    def get_walls_status(cls, cell):
+        walls = {
+            "N": (cell & 0x1) >> 0,
+            "E": (cell & 0x2) >> 1,
+            "S": (cell & 0x4) >> 2,
+            "W": (cell & 0x8) >> 3,
+        }
+        return walls
+
+    @classmethod
+    def all_walls_intact(cls, cell):
+        return cell & 0xF == 0
+
+    @classmethod
+    def num_walls_broken(cls, cell):
+        walls = cls.get_walls_status(cell)
+        num_broken = 0
+        for wall_broken in walls.values():
+            num_broken += wall_broken
+        return num_broken
+
+    @classmethod
+    def __break_walls(cls, cell, dirs):
+        if "N" in dirs:
+            cell = 0x1
+        if "E" in dirs:
+            cell = 0x2
+        if "S" in dirs:
+            cell = 0x4
+        if "W" in dirs:
+            cell = 0x8
+        return cell
+
+    @classmethod
+    def __get_opposite_wall(cls, dirs):
+
+        if not isinstance(dirs, str):
+            raise TypeError("dirs must be a str.")
+
+        opposite_dirs = ""
+
+        for dir in dirs:
+            if dir == "N":
+                opposite_dir = "S"
+            elif dir == "S":
+                opposite_dir = "N"
+            elif dir == "E":
+                opposite_dir = "W"
+            elif dir == "W":
+                opposite_dir = "E"
+            else:
+                raise ValueError("The only valid directions are (N, S, E, W).")
+
+            opposite_dirs += opposite_dir
+
+        return opposite_dirs
+
+
+class RescueItem:
+    def __init__(self, item_class, count, location):
+        self.location = location
+        # type of rescue item such as children, adults etc.
+        self.item_class = item_class
+        # count of rescue items
+        self.count = count
+        # status of rescue item. This defaults to false/not saved
+        self.rescued = False
+
+    def is_rescued(self):
+        return self.rescued
@@ -0,0 +1,159 @@
+import os
+import pickle
+import sys
+
+import numpy as np
+
+
+# A corpus is a directory with two .npy files, loaded memory-mapped:
+#   mazes.npy   uint8 array (n_mazes, W, H) of wall bitmasks (same encoding as Maze)
+#   layouts.npy structured array of item layouts sorted by (maze_id, layout_id),
+#               see layout_dtype
+MAZES_FILE = "mazes.npy"
+LAYOUTS_FILE = "layouts.npy"
+RIDDLE_TYPES = ["server", "cipher", "pcap", "captcha"]
+
+
+def layout_dtype(num_items=4):
+    return np.dtype(
+        [
+            ("maze_id", np.int32),
+            ("layout_id", np.int32),
+            # (x, y) of every rescue item
+            ("items", np.uint16, (num_items, 2)),
+            # index in RIDDLE_TYPES of the riddle of every rescue item
+            ("riddle_types", np.uint8, (num_items,)),
+        ]
+    )
+
+
+def pack_layout(maze_id, layout_id, rescue_items_dict, num_items=4):
+    # rescue_items_dict maps an item position to its riddle type (as in MazeManager)
+    if len(rescue_items_dict) != num_items:
+        raise ValueError(
+            "The layout must have %d rescue items, got %d."
+            % (num_items, len(rescue_items_dict))
+        )
+    layout = np.zeros((), dtype=layout_dtype(num_items))
+    layout["maze_id"] = maze_id
+    layout["layout_id"] = layout_id
+    layout["items"] = list(rescue_items_dict.keys())
+    layout["riddle_types"] = [
+        RIDDLE_TYPES.index(riddle_type) for riddle_type in rescue_items_dict.values()
+    ]
+    return layout
+
+
+def pack_layouts(maze_ids, layout_ids, rescue_items_dicts, num_items=4):
+    # same as pack_layout for many layouts at once
+    layouts = np.zeros(len(rescue_items_dicts), dtype=layout_dtype(num_items))
+    if len(layouts) == 0:
+        return layouts
+    if any(len(items) != num_items for items in rescue_items_dicts):
+        raise ValueError("Every layout must have %d rescue items." % num_items)
+    layouts["maze_id"] = maze_ids
+    layouts["layout_id"] = layout_ids
+    layouts["items"] = [list(items.keys()) for items in rescue_items_dicts]
+    riddle_index = {riddle_type: idx for idx, riddle_type in enumerate(RIDDLE_TYPES)}
+    layouts["riddle_types"] = [
+        [riddle_index[riddle_type] for riddle_type in items.values()]
+        for items in rescue_items_dicts
+    ]
+    return layouts
+
+
+def write_corpus(path, mazes, layouts):
+    # mazes: (n_mazes, W, H) wall bitmasks, layouts: array of layout_dtype records
+    os.makedirs(path, exist_ok=True)
+    mazes = np.asarray(mazes)
+    if mazes.ndim != 3 or mazes.min(initial=0) < 0 or mazes.max(initial=0) > 0xF:
+        raise ValueError("mazes must be a (n_mazes, W, H) array of 4 bit cells.")
+    layouts = np.asarray(layouts)
+    layouts = layouts[np.lexsort((layouts["layout_id"], layouts["maze_id"]))]
+
+    np.save(os.path.join(path, MAZES_FILE), mazes.astype(np.uint8))
+    np.save(os.path.join(path, LAYOUTS_FILE), layouts)
+
+
+def pack_pickles(maze_dir, path, num_mazes=100, num_layouts=50):
+    # converts the maze_{maze_id}_{layout_id}.p files written by maze_generator
+    mazes = []
+    layouts = []
+    for maze_id in range(num_mazes):
+        for layout_id in range(num_layouts):
+            file_path = os.path.join(
+                maze_dir, "maze_{}_{}.p".format(maze_id, layout_id)
+            )
+            with open(file_path, "rb") as maze_file:
+                saved_maze = pickle.load(maze_file)
+            if layout_id == 0:
+                mazes.append(saved_maze["maze"])
+            layouts.append(
+                pack_layout(maze_id, layout_id, saved_maze["rescue_items"])
+            )
+    write_corpus(path, np.stack(mazes), np.stack(layouts))
+
+
+class MazeCorpus:
+    def __init__(self, path, mmap_mode="r"):
+        self.path = path
+        self.mazes = np.load(os.path.join(path, MAZES_FILE), mmap_mode=mmap_mode)
+        self.layouts = np.load(os.path.join(path, LAYOUTS_FILE), mmap_mode=mmap_mode)
+
+        # rows of the layouts of every maze: [starts[maze_id], starts[maze_id + 1])
+        maze_ids = np.asarray(self.layouts["maze_id"])
+        self.__starts = np.searchsorted(maze_ids, np.arange(self.num_mazes + 1))
+
+    @staticmethod
+    def is_corpus(path):
+        return os.path.isfile(os.path.join(path, MAZES_FILE)) and os.path.isfile(
+            os.path.join(path, LAYOUTS_FILE)
+        )
+
+    @property
+    def num_mazes(self):
+        return self.mazes.shape[0]
+
+    @property
+    def maze_size(self):
+        return tuple(self.mazes.shape[1:])
+
+    def num_layouts(self, maze_id):
+        return int(self.__starts[maze_id + 1] - self.__starts[maze_id])
+
+    def get_maze(self, maze_id):
+        # read-only view into the memory-mapped array
+        return self.mazes[maze_id]
+
+    def get_layout(self, maze_id, layout_id):
+        start, end = self.__starts[maze_id], self.__starts[maze_id + 1]
+        row = start + layout_id
+        # layouts are usually numbered 0..n-1, otherwise search within the maze
+        if row >= end or self.layouts[row]["layout_id"] != layout_id:
+            layout_ids = np.asarray(self.layouts["layout_id"][start:end])
+            row = start + np.searchsorted(layout_ids, layout_id)
+            if row >= end or self.layouts[row]["layout_id"] != layout_id:
+                raise KeyError((maze_id, layout_id))
+        return self.layouts[row]
+
+    def get_rescue_items(self, maze_id, layout_id):
+        layout = self.get_layout(maze_id, layout_id)
+        return {
+            tuple(position): RIDDLE_TYPES[riddle_type]
+            for position, riddle_type in zip(
+                layout["items"].tolist(), layout["riddle_types"].tolist()
+            )
+        }
+
+    def get_episode(self, maze_id, layout_id):
+        # maze cells (as a writable int array, like the pickled mazes) and the
+        # rescue items dict of an episode
+        maze_cells = np.array(self.get_maze(maze_id), dtype=int)
+        return maze_cells, self.get_rescue_items(maze_id, layout_id)
+
+
+if __name__ == "__main__":
+    # python -m gym_maze.envs.maze_corpus <maze_dir> <corpus_path> [mazes] [layouts]
+    num_mazes = int(sys.argv[3]) if len(sys.argv) > 3 else 100
+    num_layouts = int(sys.argv[4]) if len(sys.argv) > 4 else 50
+    pack_pickles(sys.argv[1], sys.argv[2], num_mazes, num_layouts)
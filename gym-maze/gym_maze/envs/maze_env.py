@@ -103,8 +103,7 @@ class MazeEnv(gym.Env):
         else:
             self.maze_view.move_robot(action)
 
-        distances = self.maze_view.get_rescue_items_locations()[0]
-        directions = self.maze_view.get_rescue_items_locations()[1]
+        distances, directions = self.maze_view.get_rescue_items_locations()
 
         info["rescued_items"] = self.maze_view.rescued_items
 
@@ -126,8 +125,7 @@ class MazeEnv(gym.Env):
 
     def get_current_state(self):
         info = {}
-        distances = self.maze_view.get_rescue_items_locations()[0]
-        directions = self.maze_view.get_rescue_items_locations()[1]
+        distances, directions = self.maze_view.get_rescue_items_locations()
 
         info["rescued_items"] = self.maze_view.rescued_items
 
@@ -144,11 +142,8 @@ class MazeEnv(gym.Env):
 
     def reset(self):
         self.maze_view.reset_robot()
-        self.state = [
-            self.maze_view.robot,
-            self.maze_view.get_rescue_items_locations()[0],
-            self.maze_view.get_rescue_items_locations()[1],
-        ]
+        distances, directions = self.maze_view.get_rescue_items_locations()
+        self.state = [self.maze_view.robot, distances, directions]
         self.steps_beyond_done = None
         self.steps = 0
         self.terminated = False
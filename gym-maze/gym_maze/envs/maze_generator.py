@@ -1,132 +1,150 @@
+import argparse
 import random
 import pickle
-from gym_maze.envs.maze_view_2d import Maze
+from concurrent.futures import ProcessPoolExecutor
+from gym_maze.envs import maze_corpus, maze_validation
+from gym_maze.envs.maze import Maze
 import numpy as np
 import json
-from collections import deque
 from tqdm import tqdm
 
 
-def get_move(cell, r, c, rows_length, cols_length):
-    next_state = None
-    if cell == 1 and r - 1 >= 0:
-        next_state = r - 1, c
-    elif cell == 2 and c + 1 < cols_length:
-        next_state = r, c + 1
-    elif cell == 4 and r + 1 < rows_length:
-        next_state = r + 1, c
-    elif cell == 8 and c - 1 >= 0:
-        next_state = r, c - 1
-    return next_state
-
-
-def get_possible_children(r, c, rows_length, cols_length):
-    children = []
-    if r - 1 >= 0:
-        children.append((r - 1, c))
-    if c - 1 >= 0:
-        children.append((r, c - 1))
-    if c + 1 < cols_length:
-        children.append((r, c + 1))
-    if r + 1 < rows_length:
-        children.append((r + 1, c))
-    return children
-
-
-def get_possible_moves(maze, r, c):
-    rows_length, cols_length = maze.shape
-    next_states = set()
-    cell = maze[r][c]
-    next_state = get_move(cell, r, c, rows_length, cols_length)
-    if next_state is not None:
-        next_states.add(next_state)
-    possible_children = get_possible_children(r, c, rows_length, cols_length)
-    for child in possible_children:
-        child_r, child_c = child
-        cell = maze[child_r][child_c]
-        next_state = get_move(cell, child_r, child_c, rows_length, cols_length)
-        if next_state is None:
-            continue
-        r_new, c_new = next_state
-        if r_new == r and c_new == c:
-            next_states.add(child)
-    return next_states
+# the checks live in maze_validation (shared with the server)
+def maze_has_blockers(maze):
+    return maze_validation.maze_has_blockers(maze)
 
 
-def maze_has_blockers(maze):
-    maze = maze.T
-    queue = deque()
-    queue.append((0, 0))
-    optimizedQueue = set()  # for faster search
-    explored = set()
-    while len(queue) > 0:
-        currentState = queue.popleft()
-        explored.add(currentState)
-        r, c = currentState
-        children = get_possible_moves(maze, r, c)
-        for child in children:
-            if child not in optimizedQueue and child not in explored:
-                queue.append(child)
-                optimizedQueue.add(child)
-    return len(explored) != np.prod(maze.shape)
-
-
-def validate_maze(maze):
-    # Check if the maze is a 2D numpy array
-    if not isinstance(maze, np.ndarray) or maze.ndim != 2:
-        return False
-
-    # Check if the maze is 10x10
-    if maze.shape[0] != 10 or maze.shape[1] != 10:
-        return False
-
-    # Check if each entry in the array is 1, 2, 4 or 8
-    if not np.all(np.isin(maze, [1, 2, 4, 8])):
-        return False
-    if maze_has_blockers(maze):
-        return False
-    # If all checks pass, the maze is valid
-    return True
+def validate_mazes(mazes):
+    return maze_validation.validate_mazes(mazes)
 
 
-if __name__ == "__main__":
-    # DO NOT CHANGE
-    # USE ONLY FOR GENERATING RANDOM/SAMPLE MAZES
-    maze_size = 10
-    for j in tqdm(range(100)):
-        maze_id = j
-        while True:
-            maze = Maze(
-                maze_size=(maze_size, maze_size), rescue_item_locations=[(10, 10)]
+def validate_maze(maze, maze_size=(10, 10)):
+    return maze_validation.check_maze(maze, maze_size=maze_size).is_valid
+
+
+def generate_valid_maze(maze_size):
+    while True:
+        maze = Maze(maze_size=(maze_size, maze_size), rescue_item_locations=[(10, 10)])
+        is_validated = validate_maze(maze.maze_cells, (maze_size, maze_size))
+        if is_validated:
+            return maze
+
+
+def generate_rescue_items(maze_size):
+    riddle_types = ["server", "cipher", "pcap", "captcha"]
+    rescue_items_dict = {}
+    random.shuffle(riddle_types)
+
+    for riddle_type in riddle_types:
+        position = (
+            random.randrange(0, maze_size - 1),
+            random.randrange(0, maze_size - 1),
+        )
+        while (
+            position == (0, 0)
+            or position == (maze_size - 1, maze_size - 1)
+            or position in rescue_items_dict
+        ):
+            position = (
+                random.randrange(0, maze_size - 1),
+                random.randrange(0, maze_size - 1),
             )
-            is_validated = validate_maze(maze.maze_cells)
-            if is_validated:
-                break
-
-        to_save = {}
-        to_save["maze"] = maze.maze_cells
-
-        for i in range(50):
-            riddle_types = ["server", "cipher", "pcap", "captcha"]
-            rescue_items_dict = {}
-            random.shuffle(riddle_types)
-
-            for riddle_type in riddle_types:
-                position = (
-                    random.randrange(0, maze_size - 1),
-                    random.randrange(0, maze_size - 1),
-                )
-                while (
-                    position == (0, 0)
-                    or position == (9, 9)
-                    or position in rescue_items_dict
-                ):
-                    position = (
-                        random.randrange(0, maze_size - 1),
-                        random.randrange(0, maze_size - 1),
-                    )
-                rescue_items_dict[position] = riddle_type
-            to_save["rescue_items"] = rescue_items_dict
-            # pickle.dump(
-            #     to_save, open("./mazes/maze_{}_{}.p".format(str(maze_id), str(i)), "wb")
-            # )
+        rescue_items_dict[position] = riddle_type
+    return rescue_items_dict
+
+
+def generate_corpus(path, num_mazes=100, num_layouts=50, maze_size=10):
+    # writes the mazes and their item layouts as a packed corpus (see maze_corpus)
+    mazes = []
+    layouts = []
+    for maze_id in tqdm(range(num_mazes)):
+        maze = generate_valid_maze(maze_size)
+        mazes.append(maze.maze_cells)
+
+        for layout_id in range(num_layouts):
+            rescue_items_dict = generate_rescue_items(maze_size)
+            layout = maze_corpus.pack_layout(maze_id, layout_id, rescue_items_dict)
+            layouts.append(layout)
+    maze_corpus.write_corpus(path, np.stack(mazes), np.stack(layouts))
+
+
+def generate_valid_mazes(num_mazes, maze_size, batch_size=64):
+    # generates candidates in batches and keeps the ones passing validate_mazes
+    mazes = []
+    while len(mazes) < num_mazes:
+        candidates = np.stack(
+            [
+                Maze(
+                    maze_size=(maze_size, maze_size), rescue_item_locations=[]
+                ).maze_cells
+                for _ in range(batch_size)
+            ]
+        )
+        mazes.extend(candidates[validate_mazes(candidates)])
+    return np.stack(mazes[:num_mazes]).astype(np.uint8)
+
+
+def generate_shard(first_maze_id, num_mazes, num_layouts, maze_size, seed):
+    # runs in a worker: mazes [first_maze_id, first_maze_id + num_mazes) and their
+    # packed layouts, seeded from (seed, first_maze_id) to be reproducible
+    shard_seed = np.random.SeedSequence([seed, first_maze_id]).generate_state(1)[0]
+    random.seed(int(shard_seed))
+    mazes = generate_valid_mazes(num_mazes, maze_size)
+    maze_ids = np.repeat(first_maze_id + np.arange(num_mazes), num_layouts)
+    layout_ids = np.tile(np.arange(num_layouts), num_mazes)
+    rescue_items_dicts = [generate_rescue_items(maze_size) for _ in maze_ids]
+    layouts = maze_corpus.pack_layouts(maze_ids, layout_ids, rescue_items_dicts)
+    return mazes, layouts
+
+
+def generate_corpus_parallel(
+    path,
+    num_mazes=10000,
+    num_layouts=50,
+    maze_size=10,
+    workers=None,
+    seed=0,
+    shard_size=250,
+):
+    # same as generate_corpus, with the mazes split in shards across processes
+    shards = [
+        (first, min(shard_size, num_mazes - first), num_layouts, maze_size, seed)
+        for first in range(0, num_mazes, shard_size)
+    ]
+    mazes = []
+    layouts = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(generate_shard, *zip(*shards))
+        for shard_mazes, shard_layouts in tqdm(results, total=len(shards)):
+            mazes.append(shard_mazes)
+            layouts.append(shard_layouts)
+    maze_corpus.write_corpus(path, np.concatenate(mazes), np.concatenate(layouts))
+
+
+if __name__ == "__main__":
+    # Generates random/sample mazes for local evaluation: --mazes valid mazes with
+    # --layouts rescue item layouts each, written as a packed corpus to --path
+    # (read by eval_agent.py --maze-dir). Mazes are generated in this process,
+    # or in --workers processes with per-shard seeds derived from --seed
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--path", default="./mazes_corpus")
+    parser.add_argument("--mazes", type=int, default=100)
+    parser.add_argument("--layouts", type=int, default=50)
+    # bulk generation across processes (e.g. --mazes 10000 --workers 8)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    if args.workers is None:
+        generate_corpus(
+            args.path, num_mazes=args.mazes, num_layouts=args.layouts, maze_size=10
+        )
+    else:
+        generate_corpus_parallel(
+            args.path,
+            num_mazes=args.mazes,
+            num_layouts=args.layouts,
+            maze_size=10,
+            workers=args.workers,
+            seed=args.seed,
+        )
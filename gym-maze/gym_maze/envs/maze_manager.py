@@ -3,30 +3,39 @@ import time
 import random
 import numpy as np
 import copy
-from gym_maze.envs import MazeEnv
 import os, random
 import requests
 import json
+import threading
 
 
 class MazeManager:
-    def __init__(self, maze_size=10):
+    def __init__(self, maze_size=10, headless=False):
         self.maze_size = maze_size
+        # the headless env has the same interface but never imports pygame
+        self.env_id = (
+            "maze-sample-10x10-headless-v0" if headless else "maze-sample-10x10-v0"
+        )
         self.maze_map = dict()  #### mapping agent id to Maze Env Object
         self.riddles_dict = (
             dict()
-        )  ##### dictionary to map agent id to RiddleContainer object
+        )  ##### dictionary to map agent id to RiddleState object
         self.rescue_items_dict = dict()  ### map rescue item position to riddle_type
         self.randomize_rescue_items()
         self.riddle_scores = {"cipher": 20, "server": 30, "pcap": 40, "captcha": 10}
 
     ## end init
 
+    @property
+    def riddles(self):
+        ## read-only riddle templates, shared by all agents (and managers)
+        return RiddleContainer.get_shared()
+
     def init_maze(self, agent_id, maze_cells=None):
         if hasattr(maze_cells, "shape"):
             # print("hey" * 20, self.rescue_items_dict)
             env = gym.make(
-                "maze-sample-10x10-v0",
+                self.env_id,
                 rescue_item_locations=list(self.rescue_items_dict.keys()),
                 maze_cells=maze_cells,
                 enable_render=True,
@@ -42,13 +51,13 @@ class MazeManager:
     ### end init maze
 
     def init_riddles(self, agent_id):
-        self.riddles_dict[agent_id] = RiddleContainer()
+        self.riddles_dict[agent_id] = RiddleState()
         return
 
     ## end init riddles
 
     def pull_riddle(self, riddle_type, agent_id):
-        riddle = self.riddles_dict[agent_id].get_riddle(riddle_type)
+        riddle = self.riddles.get_riddle(riddle_type)
         question = riddle.get_question()
         return question
 
@@ -60,14 +69,15 @@ class MazeManager:
             print()
             return self.maze_map[agent_id].get_current_state()
 
-        riddle = self.riddles_dict[agent_id].get_riddle(actual_riddle_type)
+        riddle = self.riddles.get_riddle(actual_riddle_type)
+        riddle_state = self.riddles_dict[agent_id]
 
         if riddle_type == actual_riddle_type:
 
-            if not riddle.solved():
-                riddle.solve_riddle(solution)
+            if not riddle_state.solved(actual_riddle_type):
+                riddle.solve_riddle(riddle_state, solution)
 
-                if riddle.solved():
+                if riddle_state.solved(actual_riddle_type):
                     # print(riddle_type)
                     # print("riddle solved")
                     if (
@@ -90,13 +100,13 @@ class MazeManager:
                     # print("rescue item nulled")
                     # print()
 
-        elif riddle.attempts == 0:
+        elif riddle_state.get_attempts(actual_riddle_type) == 0:
             print("wrong riddle type")
-            print(riddle.attempts)
+            print(riddle_state.get_attempts(actual_riddle_type))
             self.maze_map[agent_id].maze_view.maze.get_rescue_item(
                 tuple(robot)
             ).rescued = True
-            riddle.attempts += 1
+            riddle_state.add_attempt(actual_riddle_type)
             print("rescue item nulled")
             print()
 
@@ -129,8 +139,11 @@ class MazeManager:
         obv, reward, terminated, truncated, info = self.maze_map[agent_id].step(action)
         if tuple(obv[0]) in self.rescue_items_dict:
             riddle_type = self.rescue_items_dict[tuple(obv[0])]
-            riddle = self.riddles_dict[agent_id].get_riddle(riddle_type)
-            if not riddle.solved() and riddle.attempts == 0:
+            riddle_state = self.riddles_dict[agent_id]
+            if (
+                not riddle_state.solved(riddle_type)
+                and riddle_state.get_attempts(riddle_type) == 0
+            ):
                 question = self.pull_riddle(riddle_type, agent_id)
                 info["riddle_type"] = riddle_type
                 info["riddle_question"] = question
@@ -141,7 +154,7 @@ class MazeManager:
 
     def reset(self, agent_id):
         if agent_id in self.maze_map:
-            self.riddles_dict[agent_id].reset_riddles()
+            self.riddles_dict[agent_id].reset()
             return self.maze_map[agent_id].reset()
         else:
             raise ("Agent Not Found")
@@ -185,8 +198,10 @@ class MazeManager:
         )
         riddles_score = 0
         riddles_score_dict = dict()
-        for riddle in self.riddles_dict[agent_id].riddles.values():
-            riddle_score = self.riddle_scores[riddle.riddle_type] * riddle.solved()
+        riddle_state = self.riddles_dict[agent_id]
+        for riddle in self.riddles.riddles.values():
+            solved = riddle_state.solved(riddle.riddle_type)
+            riddle_score = self.riddle_scores[riddle.riddle_type] * solved
             if riddle_score > 0:
                 riddle_score = riddle_score / (
                     riddlesTimeDictionary.get(riddle.riddle_type, 1) * 100
@@ -209,8 +224,10 @@ class MazeManager:
         )
         riddles_score = 0
         riddles_score_dict = dict()
-        for riddle in self.riddles_dict[agent_id].riddles.values():
-            riddle_score = self.riddle_scores[riddle.riddle_type] * riddle.solved()
+        riddle_state = self.riddles_dict[agent_id]
+        for riddle in self.riddles.riddles.values():
+            solved = riddle_state.solved(riddle.riddle_type)
+            riddle_score = self.riddle_scores[riddle.riddle_type] * solved
             riddles_score += riddle_score
             riddles_score_dict[riddle.riddle_type] = riddle_score
 
@@ -219,23 +236,113 @@ class MazeManager:
         return total_score, riddles_score_dict
 
     def get_rescue_items_status(self, agent_id):
-        riddles = self.riddles_dict[agent_id].riddles
+        riddle_state = self.riddles_dict[agent_id]
         rescue_items_status = dict()
 
         for position, riddle_type in self.rescue_items_dict.items():
-            if riddles[riddle_type].attempts == 0:
-                rescue_items_status[str(position)] = 0
-
-            else:
-                if riddles[riddle_type].solved():
-                    rescue_items_status[str(position)] = 1
-                else:
-                    rescue_items_status[str(position)] = 2
+            rescue_items_status[str(position)] = riddle_state.get_status(riddle_type)
 
         return rescue_items_status
 
+    def get_rescue_items_status_bits(self, agent_id):
+        ## same as get_rescue_items_status packed in an int, 2 bits per rescue item
+        ## (in rescue_items_dict order). The step logs keep it in 16 bits
+        if len(self.rescue_items_dict) > 8:
+            raise ValueError("at most 8 rescue items fit in the 16 bits of a step")
+        riddle_state = self.riddles_dict[agent_id]
+        status_bits = 0
+
+        for index, riddle_type in enumerate(self.rescue_items_dict.values()):
+            status_bits |= riddle_state.get_status(riddle_type) << (2 * index)
+
+        return status_bits
+
+
+class RiddleCatalog:
+    """
+    Process-wide cache of the riddle files, each riddles.json is parsed once (on
+    first use) and its records are shared by every RiddleContainer
+    The records must be treated as read-only
+    """
+
+    _collections = dict()  ## maps an absolute riddle file path to its records
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_riddle(cls, riddle_dir_path, riddle_id=0):
+        path = os.path.abspath(riddle_dir_path)
+        collection = cls._collections.get(path)
+        if collection is None:
+            with cls._lock:
+                collection = cls._collections.get(path)
+                if collection is None:
+                    # Open the txt file as Unicode strings and read all of it
+                    with open(path, "r") as r:
+                        riddle_collection = json.load(r)
+                    collection = tuple(
+                        (riddle["question"], riddle["solution"])
+                        for riddle in riddle_collection
+                    )
+                    cls._collections[path] = collection
+        return collection[riddle_id]
+
+    @classmethod
+    def clear(cls):
+        with cls._lock:
+            cls._collections.clear()
+
+
+RIDDLE_TYPES = ("cipher", "server", "pcap", "captcha")
+
+
+class RiddleState:
+    """
+    Mutable riddle state of one agent: number of attempts and solved flag of every
+    riddle type (the questions live in the shared RiddleContainer)
+    """
+
+    __slots__ = ("attempts", "solved_bits")
+
+    def __init__(self):
+        self.attempts = bytearray(len(RIDDLE_TYPES))  ## attempts per riddle type
+        self.solved_bits = 0  ## bit i is set if RIDDLE_TYPES[i] is solved
+
+    def get_attempts(self, riddle_type):
+        return self.attempts[RIDDLE_TYPES.index(riddle_type)]
+
+    def add_attempt(self, riddle_type):
+        idx = RIDDLE_TYPES.index(riddle_type)
+        self.attempts[idx] = min(self.attempts[idx] + 1, 255)
+
+    def solved(self, riddle_type):
+        return bool(self.solved_bits >> RIDDLE_TYPES.index(riddle_type) & 1)
+
+    def set_solved(self, riddle_type, solved_flag):
+        bit = 1 << RIDDLE_TYPES.index(riddle_type)
+        if solved_flag:
+            self.solved_bits |= bit
+        else:
+            self.solved_bits &= ~bit
+
+    def get_status(self, riddle_type):
+        ## 0 not attempted, 1 solved, 2 attempted but not solved
+        if self.get_attempts(riddle_type) == 0:
+            return 0
+        return 1 if self.solved(riddle_type) else 2
+
+    def reset(self):
+        ## only the solved flags, as the attempts were never reset
+        self.solved_bits = 0
+
 
 class RiddleContainer:
+    """
+    The 4 riddles, used as read-only templates shared by all agents
+    """
+
+    _shared = None
+    _lock = threading.Lock()
+
     def __init__(self):
         ## initialize the 4 riddles
         self.cipher_riddle = CipherRiddle(
@@ -268,129 +375,86 @@ class RiddleContainer:
             "captcha": self.captcha_riddle,
         }
 
-    def get_riddle(self, riddle_type):
-        riddles = {
-            "cipher": self.cipher_riddle,
-            "server": self.server_riddle,
-            "pcap": self.pcap_riddle,
-            "captcha": self.captcha_riddle,
-        }
-
-        return riddles.get(riddle_type, None)
+    @classmethod
+    def get_shared(cls):
+        ## process-wide instance, created on first use
+        if cls._shared is None:
+            with cls._lock:
+                if cls._shared is None:
+                    cls._shared = cls()
+        return cls._shared
 
-    def reset_riddles(self):
-        self.cipher_riddle.set_solved(False)
-        self.server_riddle.set_solved(False)
-        self.pcap_riddle.set_solved(False)
-        self.captcha_riddle.set_solved(False)
+    def get_riddle(self, riddle_type):
+        return self.riddles.get(riddle_type, None)
 
 
 class Riddle:
     """
     This class will represent any of the 4 riddles
+    The per-agent attempts and solved flag are kept in a RiddleState
     """
 
+    __slots__ = (
+        "riddle_type",
+        "riddle_dir_path",
+        "riddle_question",
+        "riddle_solution",
+    )
+
     def __init__(self, riddle_type, riddle_dir_path):
         self.riddle_type = riddle_type
         self.riddle_dir_path = riddle_dir_path
         ## pull random file from the riddle type
         self.riddle_question = None
         self.riddle_solution = None
-        self._solved = False  ##solved flag
-        self.attempts = 0  # number of attempts to solve the riddle
 
     def load_riddle(self):
-        pass
+        riddle_id = 0
+        # shared with the other riddles of the same file, see RiddleCatalog
+        self.riddle_question, self.riddle_solution = RiddleCatalog.get_riddle(
+            self.riddle_dir_path, riddle_id
+        )
+        ## end load riddle
 
     def get_question(self):
         return self.riddle_question
 
-    def set_solved(self, solved_flag):
-        self._solved = solved_flag
-
-    def solved(self):
-        return self._solved
-
-    def solve_riddle(self, solution):
-        self.attempts += 1
-        self._solved = solution == self.riddle_solution
+    def solve_riddle(self, riddle_state, solution):
+        riddle_state.add_attempt(self.riddle_type)
+        riddle_state.set_solved(self.riddle_type, solution == self.riddle_solution)
 
 
 class CipherRiddle(Riddle):
+    __slots__ = ()
+
     def __init__(self, riddle_type, riddle_dir_path):
         super().__init__(riddle_type, riddle_dir_path)
 
-    def load_riddle(self):
-
-        # Open the txt file as Unicode strings and read all of it
-        with open(self.riddle_dir_path, "r") as r:
-            riddle_collection = json.load(r)
-
-        riddle_id = 0
-
-        riddle = riddle_collection[riddle_id]
-        self.riddle_question = riddle["question"]
-        self.riddle_solution = riddle["solution"]
-        ## end load riddle
-
 
 class CaptchaRiddle(Riddle):
+    __slots__ = ()
+
     def __init__(self, riddle_type, riddle_dir_path):
         super().__init__(riddle_type, riddle_dir_path)
 
-    def load_riddle(self):
-
-        # Open the txt file as Unicode strings and read all of it
-        with open(self.riddle_dir_path, "r") as r:
-            riddle_collection = json.load(r)
-
-        riddle_id = 0
-
-        riddle = riddle_collection[riddle_id]
-        self.riddle_question = riddle["question"]
-        self.riddle_solution = riddle["solution"]
-        ## end load riddle
-
 
 class ServerRiddle(Riddle):
+    __slots__ = ()
+
     def __init__(self, riddle_type, riddle_dir_path):
         super().__init__(riddle_type, riddle_dir_path)
 
-    def load_riddle(self):
-
-        # Open the txt file as Unicode strings and read all of it
-        with open(self.riddle_dir_path, "r") as r:
-            riddle_collection = json.load(r)
-
-        riddle_id = 0
-
-        riddle = riddle_collection[riddle_id]
-        self.riddle_question = riddle["question"]
-        self.riddle_solution = riddle["solution"]
-        ## end load riddle
-
-    def solve_riddle(self, solution):
+    def solve_riddle(self, riddle_state, solution):
         ### the logic to verify the server riddle locally is to be implemented by your team ###
         pass
 
 
 class PcapRiddle(Riddle):
+    __slots__ = ()
+
     def __init__(self, riddle_type, riddle_dir_path):
         super().__init__(riddle_type, riddle_dir_path)
 
-    def load_riddle(self):
-
-        # Open the txt file as Unicode strings and read all of it
-        with open(self.riddle_dir_path, "r") as r:
-            riddle_collection = json.load(r)
-
-        riddle_id = 0
-
-        riddle = riddle_collection[riddle_id]
-        self.riddle_question = riddle["question"]
-        self.riddle_solution = riddle["solution"]
-        ## end load riddle
-
 
 if __name__ == "__main__":
     #########
@@ -0,0 +1,145 @@
+import numpy as np
+
+
+# Shared maze checks, used by the server (app.py) for submissions and by
+# maze_generator. Cells use the one-hot wall encoding of Maze (N=1, E=2, S=4, W=8),
+# indexed [x, y], and a move is open if the wall is broken on either side.
+VALID_CELLS = (1, 2, 4, 8)
+MAX_MAZE_SIZE = (1000, 1000)
+
+
+class ValidationReport:
+    def __init__(self, is_valid, message, unreachable_cells=0, component_sizes=None):
+        self.is_valid = is_valid
+        self.message = message
+        # number of cells that can not be reached from the entrance (0, 0)
+        self.unreachable_cells = unreachable_cells
+        # size of every connected component, the entrance's component first
+        self.component_sizes = component_sizes if component_sizes is not None else []
+
+    def __bool__(self):
+        return self.is_valid
+
+    def __repr__(self):
+        return "ValidationReport(is_valid=%r, message=%r, unreachable_cells=%d)" % (
+            self.is_valid,
+            self.message,
+            self.unreachable_cells,
+        )
+
+
+def get_open_edges(mazes):
+    # flat cell indices (u, v) of the open edges of a (..., W, H) stack of mazes,
+    # cells are numbered in C order over the whole stack
+    mazes = np.asarray(mazes)
+    cells = np.arange(mazes.size).reshape(mazes.shape)
+
+    # E of (x, y) or W of (x + 1, y)
+    east = ((mazes[..., :-1, :] & 0x2) != 0) | ((mazes[..., 1:, :] & 0x8) != 0)
+    # S of (x, y) or N of (x, y + 1)
+    south = ((mazes[..., :, :-1] & 0x4) != 0) | ((mazes[..., :, 1:] & 0x1) != 0)
+
+    u = np.concatenate([cells[..., :-1, :][east], cells[..., :, :-1][south]])
+    v = np.concatenate([cells[..., 1:, :][east], cells[..., :, 1:][south]])
+    return u, v
+
+
+def connected_components(mazes):
+    # label (smallest flat cell index of the component) of every cell, computed
+    # with an array based disjoint-set: every round links the root of the larger
+    # label under the smaller one for all edges at once (hooking), then compresses
+    # the trees until every cell points to its root (pointer jumping)
+    mazes = np.asarray(mazes)
+    u, v = get_open_edges(mazes)
+    parent = np.arange(mazes.size)
+
+    while True:
+        root_u = parent[u]
+        root_v = parent[v]
+        different = root_u != root_v
+        if not different.any():
+            break
+        u, v = u[different], v[different]
+        low = np.minimum(root_u[different], root_v[different])
+        high = np.maximum(root_u[different], root_v[different])
+        np.minimum.at(parent, high, low)
+
+        while True:
+            grandparent = parent[parent]
+            if np.array_equal(grandparent, parent):
+                break
+            parent = grandparent
+
+    return parent.reshape(mazes.shape)
+
+
+def reachable_cells(mazes):
+    # boolean mask (..., W, H) of the cells connected to the entrance of their maze
+    mazes = np.asarray(mazes)
+    labels = connected_components(mazes)
+    return labels == labels[..., :1, :1]
+
+
+def maze_has_blockers(maze):
+    return not reachable_cells(maze).all()
+
+
+def check_maze(maze, maze_size=None):
+    # full check of a single maze, maze_size (W, H) is required when given
+    size_text = "%dx%d" % tuple(maze_size) if maze_size is not None else "2D"
+
+    # Check if the maze is a 2D numpy array
+    if not isinstance(maze, np.ndarray) or maze.ndim != 2:
+        return ValidationReport(
+            False, "Please submit a valid %s numpy array" % size_text
+        )
+
+    # Check the size
+    if maze_size is not None and tuple(maze.shape) != tuple(maze_size):
+        return ValidationReport(
+            False, "Please submit a valid %s numpy array" % size_text
+        )
+    if (
+        min(maze.shape) < 1
+        or maze.shape[0] > MAX_MAZE_SIZE[0]
+        or maze.shape[1] > MAX_MAZE_SIZE[1]
+    ):
+        return ValidationReport(
+            False,
+            "Please submit a maze of at most %dx%d cells" % MAX_MAZE_SIZE,
+        )
+
+    # Check if each entry in the array is 1, 2, 4 or 8
+    if not np.all(np.isin(maze, VALID_CELLS)):
+        return ValidationReport(
+            False,
+            "Please submit a valid %s numpy array which only contains the values "
+            "1,2,4 or 8" % size_text,
+        )
+
+    labels = connected_components(maze).ravel()
+    sizes = np.bincount(labels, minlength=labels.size)
+    entrance_size = int(sizes[labels[0]])
+    sizes[labels[0]] = 0
+    component_sizes = [entrance_size] + sorted(sizes[sizes > 0].tolist(), reverse=True)
+    unreachable_cells = labels.size - entrance_size
+
+    if unreachable_cells > 0:
+        return ValidationReport(
+            False,
+            "Please submit a valid maze which has a solution and has no blockers",
+            unreachable_cells,
+            component_sizes,
+        )
+    # If all checks pass, the maze is valid
+    return ValidationReport(
+        True, "Maze submitted successfully", unreachable_cells, component_sizes
+    )
+
+
+def validate_mazes(mazes):
+    # validity of every maze of a (B, W, H) stack at once, returns (B,) bool
+    mazes = np.asarray(mazes)
+    one_hot = np.isin(mazes, VALID_CELLS).all(axis=(1, 2))
+    connected = reachable_cells(mazes).all(axis=(1, 2))
+    return one_hot & connected
@@ -5,6 +5,8 @@ import os
 import time
 import sys
 
+from gym_maze.envs.maze import Maze, RescueItem, get_rescue_items_observation
+
 
 class MazeView2D:
     def __init__(
@@ -48,6 +50,15 @@ class MazeView2D:
             )
 
         self.maze_size = self.__maze.maze_size
+
+        # item locations as an array, and the last observation with its
+        # (robot position, rescued flags) key
+        self.__item_locations = np.array(
+            [item.location for item in self.__maze.rescue_items_list], dtype=int
+        ).reshape(-1, 2)
+        self.__observation_key = None
+        self.__observation = None
+
         if self.__enable_render is True:
             # to show the right and bottom border
             self.screen = pygame.display.set_mode(screen_size)
@@ -116,46 +127,18 @@ class MazeView2D:
             pass
 
     def get_rescue_items_locations(self):
-        distances = []
-        directions = []
-        # temp = self.keys
-        # print("Items:")
-        # print(self.rescue_item_locations)
-        for rescue_item in self.maze.rescue_items_list:
-            # print(rescue_item.location)
-            # rescue_item.location.remove from temp
-            if rescue_item.rescued:
-                distance = -1
-                direction = [0, 0]
-            else:
-                distance = sum(
-                    abs(val1 - val2)
-                    for val1, val2 in zip(self.robot, rescue_item.location)
-                )
-                x_direction = self.robot[0] - rescue_item.location[0]
-                y_direction = self.robot[1] - rescue_item.location[1]
-
-                if x_direction < 0:
-                    x_direction = 1
-                elif x_direction > 0:
-                    x_direction = -1
-                else:
-                    x_direction = 0
-
-                if y_direction < 0:
-                    y_direction = 1
-                elif y_direction > 0:
-                    y_direction = -1
-                else:
-                    y_direction = 0
-
-                direction = [x_direction, y_direction]
-            directions.append(direction)
-            distances.append(int(distance))
-
-        # for item in temp:
-        #     distance[item] = -1
-        return distances, directions
+        rescued = tuple(item.rescued for item in self.maze.rescue_items_list)
+        key = (tuple(self.robot), rescued)
+        if key != self.__observation_key:
+            distances, directions = get_rescue_items_observation(
+                self.robot, self.__item_locations, rescued
+            )
+            self.__observation_key = key
+            self.__observation = (distances.tolist(), directions.tolist())
+
+        # copies, so the callers can not modify the cached observation
+        distances, directions = self.__observation
+        return list(distances), [list(direction) for direction in directions]
 
     def reset_rescue_items(self):
         self.__rescued_items = 0
@@ -369,281 +352,5 @@ class MazeView2D:
         return float(self.SCREEN_H) / float(self.maze.MAZE_H)
 
 
-class Maze:
-
-    COMPASS = {"N": (0, -1), "E": (1, 0), "S": (0, 1), "W": (-1, 0)}
-
-    def __init__(
-        self,
-        maze_cells=None,
-        maze_size=(10, 10),
-        has_loops=True,
-        num_rescue_items=0,
-        rescue_item_locations=None,
-    ):
-
-        # maze member variables
-        self.maze_cells = maze_cells
-        self.has_loops = has_loops
-        self.__rescue_items_dict = dict()
-        self.__rescue_items_list = []
-        self.num_rescue_items = num_rescue_items
-        self.rescue_item_locations = rescue_item_locations
-
-        # Use existing one if exists
-        if hasattr(self.maze_cells, "shape"):
-            if (
-                isinstance(self.maze_cells, (np.ndarray, np.generic))
-                and len(self.maze_cells.shape) == 2
-            ):
-                self.maze_size = tuple(maze_cells.shape)
-                locations = self.rescue_item_locations
-                self.__set_random_rescue_items(locations)
-            else:
-                raise ValueError("maze_cells must be a 2D NumPy array.")
-        # Otherwise, generate a random one
-        else:
-            # maze's configuration parameters
-            if not (isinstance(maze_size, (list, tuple)) and len(maze_size) == 2):
-                raise ValueError("maze_size must be a tuple: (width, height).")
-            self.maze_size = maze_size
-
-            self._generate_maze()
-
-    def save_maze(self, file_path):
-
-        if not isinstance(file_path, str):
-            raise TypeError("Invalid file_path. It must be a str.")
-
-        if not os.path.exists(os.path.dirname(file_path)):
-            raise ValueError("Cannot find the directory for %s." % file_path)
-
-        else:
-            np.save(file_path, self.maze_cells, allow_pickle=False, fix_imports=True)
-
-    @classmethod
-    def load_maze(cls, file_path):
-
-        if not isinstance(file_path, str):
-            raise TypeError("Invalid file_path. It must be a str.")
-
-        if not os.path.exists(file_path):
-            raise ValueError("Cannot find %s." % file_path)
-
-        else:
-            return np.load(file_path, allow_pickle=False, fix_imports=True)
-
-    def _generate_maze(self):
-
-        # list of all cell locations
-        self.maze_cells = np.zeros(self.maze_size, dtype=int)
-
-        # Initializing constants and variables needed for maze generation
-        current_cell = (
-            random.randint(0, self.MAZE_W - 1),
-            random.randint(0, self.MAZE_H - 1),
-        )
-        num_cells_visited = 1
-        cell_stack = [current_cell]
-
-        # Continue until all cells are visited
-        while cell_stack:
-
-            # restart from a cell from the cell stack
-            current_cell = cell_stack.pop()
-            x0, y0 = current_cell
-
-            # find neighbours of the current cells that actually exist
-            neighbours = dict()
-            for dir_key, dir_val in self.COMPASS.items():
-                x1 = x0 + dir_val[0]
-                y1 = y0 + dir_val[1]
-                # if cell is within bounds
-                if 0 <= x1 < self.MAZE_W and 0 <= y1 < self.MAZE_H:
-                    # if all four walls still exist
-                    if self.all_walls_intact(self.maze_cells[x1, y1]):
-                        # if self.num_walls_broken(self.maze_cells[x1, y1]) <= 1:
-                        neighbours[dir_key] = (x1, y1)
-
-            # if there is a neighbour
-            if neighbours:
-                # select a random neighbour
-                dir = random.choice(tuple(neighbours.keys()))
-                x1, y1 = neighbours[dir]
-
-                # knock down the wall between the current cell and the selected neighbour
-                self.maze_cells[x1, y1] = self.__break_walls(
-                    self.maze_cells[x1, y1], self.__get_opposite_wall(dir)
-                )
-
-                # push the current cell location to the stack
-                cell_stack.append(current_cell)
-
-                # make the this neighbour cell the current cell
-                cell_stack.append((x1, y1))
-
-                # increment the visited cell count
-                num_cells_visited += 1
-
-        if self.has_loops:
-            self.__break_random_walls(0.2)
-
-        locations = self.rescue_item_locations
-        self.__set_random_rescue_items(locations)
-
-    def __break_random_walls(self, percent):
-        # find some random cells to break
-        num_cells = int(round(self.MAZE_H * self.MAZE_W * percent))
-        cell_ids = random.sample(range(self.MAZE_W * self.MAZE_H), num_cells)
-
-        # for each of those walls
-        for cell_id in cell_ids:
-            x = cell_id % self.MAZE_H
-            y = int(cell_id / self.MAZE_H)
-
-            # randomize the compass order
-            dirs = random.sample(list(self.COMPASS.keys()), len(self.COMPASS))
-            for dir in dirs:
-                # break the wall if it's not already open
-                if self.is_breakable((x, y), dir):
-                    self.maze_cells[x, y] = self.__break_walls(
-                        self.maze_cells[x, y], dir
-                    )
-                    break
-
-    def __set_random_rescue_items(self, locations):
-        for location in locations:
-            count = 1
-            item_class = "x"
-            rescue_item = RescueItem(item_class, count, location)
-            self.__rescue_items_dict[location] = rescue_item
-            self.__rescue_items_list.append(rescue_item)
-
-    def is_open(self, cell_id, dir):
-        # check if it would be out-of-bound
-        x1 = cell_id[0] + self.COMPASS[dir][0]
-        y1 = cell_id[1] + self.COMPASS[dir][1]
-
-        # if cell is still within bounds after the move
-        if self.is_within_bound(x1, y1):
-            # check if the wall is opened
-            this_wall = bool(
-                self.get_walls_status(self.maze_cells[cell_id[0], cell_id[1]])[dir]
-            )
-            other_wall = bool(
-                self.get_walls_status(self.maze_cells[x1, y1])[
-                    self.__get_opposite_wall(dir)
-                ]
-            )
-            return this_wall or other_wall
-        return False
-
-    def is_breakable(self, cell_id, dir):
-        x1 = cell_id[0] + self.COMPASS[dir][0]
-        y1 = cell_id[1] + self.COMPASS[dir][1]
-
-        return not self.is_open(cell_id, dir) and self.is_within_bound(x1, y1)
-
-    def is_within_bound(self, x, y):
-        # true if cell is still within bounds after the move
-        return 0 <= x < self.MAZE_W and 0 <= y < self.MAZE_H
-
-    def is_rescue_item(self, cell):
-        return tuple(cell) in self.__rescue_items_dict
-
-    @property
-    def rescue_items_list(self):
-        return self.__rescue_items_list
-
-    @property
-    def rescue_items_dict(self):
-        return self.__rescue_items_dict
-
-    def get_rescue_item(self, cell):
-        if cell in self.__rescue_items_dict:
-            return self.__rescue_items_dict[cell]
-        return None
-
-    @property
-    def MAZE_W(self):
-        return int(self.maze_size[0])
-
-    @property
-    def MAZE_H(self):
-        return int(self.maze_size[1])
-
-    @classmethod
-    def get_walls_status(cls, cell):
-        walls = {
-            "N": (cell & 0x1) >> 0,
-            "E": (cell & 0x2) >> 1,
-            "S": (cell & 0x4) >> 2,
-            "W": (cell & 0x8) >> 3,
-        }
-        return walls
-
-    @classmethod
-    def all_walls_intact(cls, cell):
-        return cell & 0xF == 0
-
-    @classmethod
-    def num_walls_broken(cls, cell):
-        walls = cls.get_walls_status(cell)
-        num_broken = 0
-        for wall_broken in walls.values():
-            num_broken += wall_broken
-        return num_broken
-
-    @classmethod
-    def __break_walls(cls, cell, dirs):
-        if "N" in dirs:
-            cell = 0x1
-        if "E" in dirs:
-            cell = 0x2
-        if "S" in dirs:
-            cell = 0x4
-        if "W" in dirs:
-            cell = 0x8
-        return cell
-
-    @classmethod
-    def __get_opposite_wall(cls, dirs):
-
-        if not isinstance(dirs, str):
-            raise TypeError("dirs must be a str.")
-
-        opposite_dirs = ""
-
-        for dir in dirs:
-            if dir == "N":
-                opposite_dir = "S"
-            elif dir == "S":
-                opposite_dir = "N"
-            elif dir == "E":
-                opposite_dir = "W"
-            elif dir == "W":
-                opposite_dir = "E"
-            else:
-                raise ValueError("The only valid directions are (N, S, E, W).")
-
-            opposite_dirs += opposite_dir
-
-        return opposite_dirs
-
-
-class RescueItem:
-    def __init__(self, item_class, count, location):
-        self.location = location
-        # type of rescue item such as children, adults etc.
-        self.item_class = item_class
-        # count of rescue items
-        self.count = count
-        # status of rescue item. This defaults to false/not saved
-        self.rescued = False
-
-    def is_rescued(self):
-        return self.rescued
-
-
 if __name__ == "__main__":
     pass
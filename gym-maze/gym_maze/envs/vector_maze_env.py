@@ -0,0 +1,108 @@
+import numpy as np
+
+from gym_maze.envs.maze import (
+    MOVE_INDEX,
+    Maze,
+    compute_open_moves,
+    get_rescue_items_observation,
+)
+
+
+class VectorMazeEnv:
+    # Steps B episodes (one maze and one set of K rescue items each) at once with
+    # array operations. Observations are the same as MazeEnv, stacked over the batch:
+    # robots (B, 2), distances (B, K) and directions (B, K, 2)
+
+    ACTION = ["N", "S", "E", "W"]
+
+    def __init__(self, maze_cells, rescue_item_locations):
+        self.maze_cells = np.asarray(maze_cells)
+        if self.maze_cells.ndim != 3:
+            raise ValueError("maze_cells must be a 3D NumPy array (B, W, H).")
+
+        self.item_locations = np.asarray(rescue_item_locations, dtype=int)
+        if self.item_locations.ndim == 2:
+            # the same items in every maze
+            batch_shape = (len(self.maze_cells),) + self.item_locations.shape
+            self.item_locations = np.broadcast_to(self.item_locations, batch_shape)
+        if (
+            self.item_locations.ndim != 3
+            or self.item_locations.shape[0] != self.maze_cells.shape[0]
+            or self.item_locations.shape[2] != 2
+        ):
+            raise ValueError("rescue_item_locations must have the shape (B, K, 2).")
+
+        self.num_envs = self.maze_cells.shape[0]
+        self.maze_size = tuple(self.maze_cells.shape[1:])
+        self.num_rescue_items = self.item_locations.shape[1]
+
+        # open_moves[b, x, y, MOVE_INDEX[dir]]
+        self.open_moves = compute_open_moves(self.maze_cells)
+        # move index and (dx, dy) of every action, in ACTION order
+        self.action_moves = np.array([MOVE_INDEX[dir] for dir in self.ACTION])
+        self.action_deltas = np.array([Maze.COMPASS[dir] for dir in self.ACTION])
+
+        self.batch_index = np.arange(self.num_envs)
+        self.robots = None
+        self.rescued = None
+        self.steps = None
+        self.state = None
+
+        self.reset()
+
+    def reset(self):
+        self.robots = np.zeros((self.num_envs, 2), dtype=int)
+        self.rescued = np.zeros((self.num_envs, self.num_rescue_items), dtype=bool)
+        self.steps = np.zeros(self.num_envs, dtype=int)
+        self.state = self.get_current_state()[0]
+        return self.state
+
+    def step(self, actions, active=None):
+        # actions: (B,) indices in ACTION (or direction strings). Episodes where
+        # active is False keep their position and step count
+        actions = np.asarray(actions)
+        if actions.dtype.kind in "US":
+            actions = np.array([self.ACTION.index(str(dir)) for dir in actions])
+        actions = np.broadcast_to(actions, (self.num_envs,))
+
+        can_move = self.open_moves[
+            self.batch_index,
+            self.robots[:, 0],
+            self.robots[:, 1],
+            self.action_moves[actions],
+        ]
+        if active is not None:
+            can_move &= np.asarray(active, dtype=bool)
+            self.steps += np.asarray(active, dtype=bool)
+        else:
+            self.steps += 1
+        self.robots += self.action_deltas[actions] * can_move[:, None]
+
+        return self.get_current_state()
+
+    def rescue_items(self, active=None):
+        # marks the items under the robots as rescued, returns which episodes rescued
+        # an item in this call
+        on_item = np.all(self.item_locations == self.robots[:, None, :], axis=-1)
+        on_item &= ~self.rescued
+        if active is not None:
+            on_item &= np.asarray(active, dtype=bool)[:, None]
+        self.rescued |= on_item
+        return on_item.any(axis=1)
+
+    def get_current_state(self):
+        distances, directions = get_rescue_items_observation(
+            self.robots, self.item_locations, self.rescued
+        )
+
+        info = {}
+        info["rescued_items"] = self.rescued.sum(axis=1)
+
+        self.state = [self.robots.copy(), distances, directions]
+        terminated = np.zeros(self.num_envs, dtype=bool)
+        truncated = np.zeros(self.num_envs, dtype=bool)
+        return self.state, None, terminated, truncated, info
+
+    def at_goal(self):
+        goal = np.array(self.maze_size) - np.array((1, 1))
+        return np.all(self.robots == goal, axis=1)
@@ -0,0 +1,202 @@
+import copy
+
+
+# Storage used by the async server (async_app.py). Both repositories expose the same
+# coroutines over the collections of the "Maze" database used by app.py:
+#   Users       {"_id": agentId, "name": name}
+#   Mazes       {"_id": agentId, "maze": maze}
+#   Attempts    {"agentId", "maze", "actions", "score", "rescueItems"}
+#   Agents      {"_id": agentId, "agent": agentJson}
+#   Submissions leaderboard entries
+#   StepLogs    {"sessionId", "batch", "steps"} steps of a game in step_log format
+
+
+class MongoRepository:
+    # MongoDB through the motor asyncio driver, calls never block the event loop
+    def __init__(self, uri="mongodb://localhost:27017", database="Maze"):
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from pymongo.errors import DuplicateKeyError
+
+        self.client = AsyncIOMotorClient(uri)
+        self.db = self.client[database]
+        self.duplicate_key_error = DuplicateKeyError
+
+    async def find_user(self, agent_id):
+        return await self.db.Users.find_one({"_id": agent_id})
+
+    async def add_user(self, agent_id, name):
+        # False if the user already exists
+        try:
+            await self.db.Users.insert_one({"_id": agent_id, "name": name})
+        except self.duplicate_key_error:
+            return False
+        return True
+
+    async def delete_user(self, agent_id):
+        # False if there was no such user
+        result = await self.db.Users.delete_one({"_id": agent_id})
+        return result.deleted_count > 0
+
+    async def list_users(self):
+        return await self.db.Users.find().to_list(None)
+
+    async def list_user_ids(self):
+        users = await self.db.Users.find({}, {"_id": 1}).to_list(None)
+        return [user["_id"] for user in users]
+
+    async def find_maze(self, maze_id):
+        return await self.db.Mazes.find_one({"_id": maze_id})
+
+    async def insert_maze(self, agent_id, maze):
+        # False if the agent already submitted a maze
+        try:
+            await self.db.Mazes.insert_one({"_id": agent_id, "maze": maze})
+        except self.duplicate_key_error:
+            return False
+        return True
+
+    async def list_mazes(self):
+        return await self.db.Mazes.find().to_list(None)
+
+    async def find_attempts(self, agent_id, maze=None):
+        query = {"agentId": agent_id}
+        if maze is not None:
+            query["maze"] = maze
+        return await self.db.Attempts.find(query).to_list(None)
+
+    async def find_attempt(self, agent_id, maze):
+        return await self.db.Attempts.find_one({"agentId": agent_id, "maze": maze})
+
+    async def insert_attempt(self, attempt):
+        await self.db.Attempts.insert_one(attempt)
+
+    async def mark_attempt_incomplete(self, step_log):
+        # a batch of the steps of the attempt could not be written
+        await self.db.Attempts.update_one(
+            {"stepLog": step_log}, {"$set": {"incomplete": True}}
+        )
+
+    async def save_agent(self, agent_id, agent_json):
+        await self.db.Agents.replace_one(
+            {"_id": agent_id}, {"_id": agent_id, "agent": agent_json}, upsert=True
+        )
+
+    async def insert_submission(self, submission):
+        await self.db.Submissions.insert_one(submission)
+
+    async def insert_step_batch(self, session_id, batch_index, steps):
+        await self.db.StepLogs.insert_one(
+            {"sessionId": session_id, "batch": batch_index, "steps": steps}
+        )
+
+    async def delete_step_batches(self, session_id):
+        await self.db.StepLogs.delete_many({"sessionId": session_id})
+
+    async def find_step_batches(self, session_id):
+        batches = self.db.StepLogs.find({"sessionId": session_id}).sort("batch", 1)
+        return [bytes(batch["steps"]) for batch in await batches.to_list(None)]
+
+    async def create_indexes(self):
+        await self.db.StepLogs.create_index([("sessionId", 1), ("batch", 1)])
+
+    async def list_submissions(self):
+        return await self.db.Submissions.find().to_list(None)
+
+    def close(self):
+        self.client.close()
+
+
+class InMemoryRepository:
+    # same interface kept in dicts and lists, to run the server without MongoDB
+    # (local testing). Documents are copied in and out like a real database would
+    def __init__(self):
+        self.users = dict()
+        self.mazes = dict()
+        self.attempts = []
+        self.agents = dict()
+        self.submissions = []
+        self.step_batches = dict()
+
+    async def find_user(self, agent_id):
+        return copy.deepcopy(self.users.get(agent_id))
+
+    async def add_user(self, agent_id, name):
+        if agent_id in self.users:
+            return False
+        self.users[agent_id] = {"_id": agent_id, "name": name}
+        return True
+
+    async def delete_user(self, agent_id):
+        return self.users.pop(agent_id, None) is not None
+
+    async def list_users(self):
+        return copy.deepcopy(list(self.users.values()))
+
+    async def list_user_ids(self):
+        return list(self.users)
+
+    async def find_maze(self, maze_id):
+        return copy.deepcopy(self.mazes.get(maze_id))
+
+    async def insert_maze(self, agent_id, maze):
+        if agent_id in self.mazes:
+            return False
+        self.mazes[agent_id] = {"_id": agent_id, "maze": copy.deepcopy(maze)}
+        return True
+
+    async def list_mazes(self):
+        return copy.deepcopy(list(self.mazes.values()))
+
+    async def find_attempts(self, agent_id, maze=None):
+        return copy.deepcopy(
+            [
+                attempt
+                for attempt in self.attempts
+                if attempt["agentId"] == agent_id
+                and (maze is None or attempt["maze"] == maze)
+            ]
+        )
+
+    async def find_attempt(self, agent_id, maze):
+        attempts = await self.find_attempts(agent_id, maze)
+        return attempts[0] if attempts else None
+
+    async def insert_attempt(self, attempt):
+        self.attempts.append(copy.deepcopy(attempt))
+
+    async def mark_attempt_incomplete(self, step_log):
+        for attempt in self.attempts:
+            if attempt.get("stepLog") == step_log:
+                attempt["incomplete"] = True
+
+    async def save_agent(self, agent_id, agent_json):
+        self.agents[agent_id] = {"_id": agent_id, "agent": copy.deepcopy(agent_json)}
+
+    async def insert_submission(self, submission):
+        self.submissions.append(copy.deepcopy(submission))
+
+    async def insert_step_batch(self, session_id, batch_index, steps):
+        self.step_batches.setdefault(session_id, dict())[batch_index] = bytes(steps)
+
+    async def delete_step_batches(self, session_id):
+        self.step_batches.pop(session_id, None)
+
+    async def find_step_batches(self, session_id):
+        batches = self.step_batches.get(session_id, dict())
+        return [batches[batch_index] for batch_index in sorted(batches)]
+
+    async def create_indexes(self):
+        pass
+
+    async def list_submissions(self):
+        return copy.deepcopy(self.submissions)
+
+    def close(self):
+        pass
+
+
+def create_repository(uri):
+    # "memory" for the in-memory repository, otherwise a MongoDB connection string
+    if uri == "memory":
+        return InMemoryRepository()
+    return MongoRepository(uri)
@@ -0,0 +1,134 @@
+import heapq
+import itertools
+import threading
+import time
+
+
+TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class Session:
+    # timing of one game, in seconds of the session manager's clock (monotonic, so
+    # neither wall clock changes nor string round trips affect the limits)
+    __slots__ = ("agent_id", "started_at", "last_action_at", "steps_remaining",
+                 "connection_time")
+
+    def __init__(self, agent_id, now, steps_remaining):
+        self.agent_id = agent_id
+        self.started_at = now
+        self.last_action_at = now
+        self.steps_remaining = steps_remaining
+        # wall clock time, only for the API output
+        self.connection_time = time.strftime(TIME_FORMAT)
+
+    def last_action_time(self, now):
+        # wall clock time of the last action, only for the API output
+        return time.strftime(
+            TIME_FORMAT, time.localtime(time.time() - (now - self.last_action_at))
+        )
+
+
+class SessionManager:
+    # enforces the limits of every game: seconds between two actions, seconds of the
+    # whole game and number of steps.
+    # Every session has one entry in a heap of deadlines, so expire() only looks at
+    # the sessions that may be over (O(log n) per session checked) instead of
+    # scanning all of them. An entry is not updated when the agent acts: when it
+    # comes up, the session is either over or pushed back with its new deadline.
+    # Safe to use from several threads (request threads and the expiry job)
+    def __init__(self, max_steps, max_secs_between_actions, max_secs_of_game,
+                 clock=time.monotonic):
+        self.max_steps = max_steps
+        self.max_secs_between_actions = max_secs_between_actions
+        self.max_secs_of_game = max_secs_of_game
+        self.clock = clock
+        self.sessions = dict()  # agent id to Session
+        self.deadlines = []  # heap of (deadline, sequence number, Session)
+        self.__sequence = itertools.count()
+        self.__lock = threading.Lock()
+
+    def __contains__(self, agent_id):
+        return agent_id in self.sessions
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def start(self, agent_id):
+        # a new session replaces any previous one of the agent
+        session = Session(agent_id, self.clock(), self.max_steps)
+        with self.__lock:
+            self.sessions[agent_id] = session
+            self.__schedule(session)
+        return session
+
+    def end(self, agent_id):
+        # the ended session, or None if it was already ended: only one caller (a
+        # request or the expiry job) gets to save it
+        with self.__lock:
+            return self.sessions.pop(agent_id, None)
+
+    def get(self, agent_id):
+        return self.sessions.get(agent_id)
+
+    def steps_taken(self, agent_id):
+        # None once the session is ended
+        session = self.sessions.get(agent_id)
+        if session is None:
+            return None
+        return self.max_steps - session.steps_remaining
+
+    def deadline(self, session):
+        # the session is over after this time even if the agent keeps acting
+        return min(
+            session.last_action_at + self.max_secs_between_actions,
+            session.started_at + self.max_secs_of_game,
+        )
+
+    def is_timed_out(self, session, now):
+        return now > self.deadline(session)
+
+    def is_expired(self, session, now=None):
+        if now is None:
+            now = self.clock()
+        return self.is_timed_out(session, now) or session.steps_remaining <= 0
+
+    def use_step(self, agent_id):
+        # counts an action of the agent, False (and nothing counted) if its session
+        # is over or already ended
+        now = self.clock()
+        with self.__lock:
+            session = self.sessions.get(agent_id)
+            if session is None or self.is_expired(session, now):
+                return False
+            session.last_action_at = now
+            session.steps_remaining -= 1
+            return True
+
+    def expire(self):
+        # ends the sessions that went over their time limits and returns them.
+        # Sessions out of steps are left to the next request of the agent (or to the
+        # time limits): the request that used the last step may still be running
+        now = self.clock()
+        expired = []
+        with self.__lock:
+            while self.deadlines and self.deadlines[0][0] < now:
+                _, _, session = heapq.heappop(self.deadlines)
+                if self.sessions.get(session.agent_id) is not session:
+                    continue  # ended or replaced since it was scheduled
+                if self.is_timed_out(session, now):
+                    del self.sessions[session.agent_id]
+                    expired.append(session)
+                else:
+                    self.__schedule(session)
+        return expired
+
+    def __schedule(self, session):
+        entry = (self.deadline(session), next(self.__sequence), session)
+        heapq.heappush(self.deadlines, entry)
+
+    def last_action_time(self, agent_id):
+        # None once the session is ended
+        session = self.sessions.get(agent_id)
+        if session is None:
+            return None
+        return session.last_action_time(self.clock())
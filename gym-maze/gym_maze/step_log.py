@@ -0,0 +1,128 @@
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+# One record per /move: position, index of the action in allowedActions and the
+# status of the rescue items (MazeManager.get_rescue_items_status_bits). Little
+# endian so the stored batches read the same on any machine, 7 bytes per step
+STEP_DTYPE = np.dtype(
+    [("x", "<i2"), ("y", "<i2"), ("action", "u1"), ("items", "<u2")]
+)
+# larger than the servers' SAVING_THRESHOLD, so a session dropped before it is worth
+# saving never wrote a batch
+BATCH_SIZE = 256
+
+
+class StepLog:
+    # steps of one game, buffered in a fixed size array and handed to
+    # flush(session_id, batch_index, data) as raw bytes every batch_size steps, so
+    # the memory used by a session does not grow with its number of steps
+    def __init__(self, session_id, flush, batch_size=BATCH_SIZE):
+        self.session_id = session_id
+        self.flush_batch = flush
+        self.buffer = np.zeros(batch_size, dtype=STEP_DTYPE)
+        self.buffered = 0
+        self.num_batches = 0
+        self.num_steps = 0
+
+    def __len__(self):
+        return self.num_steps
+
+    def append(self, position, action, items):
+        self.buffer[self.buffered] = (position[0], position[1], action, items)
+        self.buffered += 1
+        self.num_steps += 1
+        if self.buffered == len(self.buffer):
+            self.flush()
+
+    def flush(self):
+        if self.buffered == 0:
+            return
+        data = self.buffer[: self.buffered].tobytes()
+        self.flush_batch(self.session_id, self.num_batches, data)
+        self.num_batches += 1
+        self.buffered = 0
+
+
+def decode_steps(batches, item_positions):
+    # batches: the bytes of every batch of a session, in order. Returns the steps in
+    # the format of the "actions" of the old Attempts documents:
+    # [{"0": [[x, y], action, "{'(x, y)': status, ...}"]}, ...]
+    steps = np.frombuffer(b"".join(batches), dtype=STEP_DTYPE)
+    positions = [str(tuple(position)) for position in item_positions]
+    actions = []
+    for index, (x, y, action, items) in enumerate(steps.tolist()):
+        status = {
+            position: (items >> (2 * item)) & 0x3
+            for item, position in enumerate(positions)
+        }
+        actions.append({str(index): [[x, y], action, str(status)]})
+    return actions
+
+
+class StepLogWriter:
+    # writes the batches of every session from a background thread with
+    # write(session_id, batch_index, data). The queue is bounded, when the database
+    # falls behind the requests wait instead of piling up batches in memory.
+    # A failed write is tried again (retries times, waiting retry_delay seconds
+    # doubled each time); if it still fails the session is added to failed and
+    # on_failure(session_id) is called, so its attempt can be marked incomplete.
+    # delete(session_id) removes the batches of a session that will not be saved
+    def __init__(self, write, delete=None, max_pending=1024, retries=3,
+                 retry_delay=0.5, on_failure=None):
+        self.write_batch = write
+        self.delete_batches = delete
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.on_failure = on_failure
+        self.failed = set()  # ids of the sessions with a missing batch
+        self.queue = queue.Queue(max_pending)
+        self.thread = threading.Thread(target=self.__run, daemon=True)
+        self.thread.start()
+
+    def put(self, session_id, batch_index, data):
+        self.queue.put((session_id, batch_index, data))
+
+    def discard(self, session_id):
+        # deletes the batches of the session, after the ones still queued are written
+        self.queue.put((session_id, None, None))
+
+    def has_failed(self, session_id):
+        return session_id in self.failed
+
+    def close(self):
+        # writes the pending batches and stops the thread
+        self.queue.put(None)
+        self.thread.join()
+
+    def __run(self):
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                break
+            session_id, batch_index, _ = batch
+            if batch_index is None:
+                self.__retry("COULD NOT DELETE STEPS:", self.delete_batches, session_id)
+            elif not self.__retry("COULD NOT SAVE STEPS:", self.write_batch, *batch):
+                self.failed.add(batch[0])
+                if self.on_failure is not None:
+                    try:
+                        self.on_failure(batch[0])
+                    except Exception as error:
+                        print("COULD NOT MARK STEPS INCOMPLETE:", error)
+
+    def __retry(self, message, operation, *args):
+        delay = self.retry_delay
+        for attempt in range(self.retries + 1):
+            try:
+                operation(*args)
+                return True
+            except Exception as error:
+                print(message, error)
+            if attempt < self.retries:
+                time.sleep(delay)
+                delay *= 2
+        return False
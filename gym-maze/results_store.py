@@ -0,0 +1,181 @@
+"""
+Module to store evaluation results on disk as they are produced
+Records are kept in a structured NumPy array (one field per column) and written
+in chunks, so an interrupted evaluation can be resumed without rerunning the
+episodes that already finished
+"""
+import glob
+import os
+from typing import Iterable, Set, Tuple
+
+import numpy as np
+
+RECORD_DTYPE = np.dtype(
+    [
+        ("maze_id", np.int32),
+        ("layout_id", np.int32),
+        ("steps", np.int32),
+        ("rescued_items", np.int32),
+        ("planning_time", np.float64),
+        ("replans", np.int32),
+        ("cache_hits", np.int32),
+        ("cache_misses", np.int32),
+    ]
+)
+
+
+class ResultsStore:
+    """
+    Class to append per-episode records to chunked .npy files in a directory
+
+    Parameters
+    ----------
+    directory: str
+        Directory of the chunk files, created if needed
+    chunk_size: int
+        Number of records buffered in memory before a chunk is written
+    """
+
+    def __init__(self, directory: str, chunk_size: int = 100):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        os.makedirs(directory, exist_ok=True)
+
+        self.chunk_paths = sorted(
+            glob.glob(os.path.join(directory, "results_[0-9]*.npy"))
+        )
+        # Index of the next chunk, after the highest existing one so that a gap in
+        # the numbering never makes a new chunk overwrite an old one
+        self.next_chunk = 1 + max(
+            (self.get_chunk_index(path) for path in self.chunk_paths), default=-1
+        )
+        self.buffer = []
+        self.completed: Set[Tuple[int, int]] = set()
+        for chunk in self.load_chunks():
+            pairs = zip(chunk["maze_id"].tolist(), chunk["layout_id"].tolist())
+            self.completed.update(pairs)
+
+    def __enter__(self) -> "ResultsStore":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.flush()
+
+    def __len__(self) -> int:
+        return len(self.completed)
+
+    @staticmethod
+    def get_chunk_index(path: str) -> int:
+        """
+        Get the index of a chunk from its file name (results_<index>.npy)
+
+        Parameters
+        ----------
+        path : str
+            Path to the chunk file
+
+        Returns
+        -------
+        int
+            Index of the chunk
+        """
+        name = os.path.splitext(os.path.basename(path))[0]
+        return int(name[len("results_") :])
+
+    def is_completed(self, maze_id: int, layout_id: int) -> bool:
+        """
+        Check whether an episode was already recorded
+
+        Parameters
+        ----------
+        maze_id : int
+            Index of the maze
+        layout_id : int
+            Index of the item layout
+
+        Returns
+        -------
+        bool
+            True if a record exists for the episode
+        """
+        return (maze_id, layout_id) in self.completed
+
+    def append(self, record: tuple) -> None:
+        """
+        Add a record, written to disk once the buffer holds chunk_size records
+
+        Parameters
+        ----------
+        record : tuple
+            Values of the record in RECORD_DTYPE order
+        """
+        self.buffer.append(tuple(record))
+        self.completed.add((int(record[0]), int(record[1])))
+        if len(self.buffer) >= self.chunk_size:
+            self.flush()
+
+    def extend(self, records: Iterable[tuple]) -> None:
+        """
+        Add several records
+
+        Parameters
+        ----------
+        records : Iterable[tuple]
+            Values of every record in RECORD_DTYPE order
+        """
+        for record in records:
+            self.append(record)
+
+    def flush(self) -> None:
+        """
+        Write the buffered records as a new chunk
+        The file is written under a temporary name and then renamed, so a crash
+        never leaves a partially written chunk behind
+        """
+        if not self.buffer:
+            return
+        chunk = np.array(self.buffer, dtype=RECORD_DTYPE)
+        path = os.path.join(
+            self.directory, "results_{:06d}.npy".format(self.next_chunk)
+        )
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as chunk_file:
+            np.save(chunk_file, chunk, allow_pickle=False)
+        os.replace(tmp_path, path)
+        self.chunk_paths.append(path)
+        self.next_chunk += 1
+        self.buffer = []
+
+    def load_chunks(self) -> Iterable[np.ndarray]:
+        """
+        Read the chunks written to disk
+        Chunks written before a field was added to RECORD_DTYPE are converted, the
+        missing fields are 0
+
+        Returns
+        -------
+        Iterable[np.ndarray]
+            Structured arrays (RECORD_DTYPE) of every chunk
+        """
+        for path in self.chunk_paths:
+            chunk = np.load(path, allow_pickle=False)
+            if chunk.dtype != RECORD_DTYPE:
+                converted = np.zeros(len(chunk), dtype=RECORD_DTYPE)
+                for name in chunk.dtype.names:
+                    converted[name] = chunk[name]
+                chunk = converted
+            yield chunk
+
+    def load(self) -> np.ndarray:
+        """
+        Get all the records (on disk and buffered)
+
+        Returns
+        -------
+        np.ndarray
+            Structured array (RECORD_DTYPE) sorted by maze then layout
+        """
+        chunks = list(self.load_chunks())
+        chunks.append(np.array(self.buffer, dtype=RECORD_DTYPE))
+        records = np.concatenate(chunks)
+        return records[np.lexsort((records["layout_id"], records["maze_id"]))]
@@ -2,5 +2,7 @@
 Module imports
 """
 from .graph_manager import GraphManager
+from .grid_graph_manager import GridGraphManager
+from .incremental_planner import IncrementalPlanner
 from .mind_visualizer import MindVisualizer
 from .algorithmic_agent import AlgorithmicAgent
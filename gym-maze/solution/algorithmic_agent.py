@@ -1,11 +1,14 @@
 """
 Implementation of an algorithmic agent for the maze problem
 """
+import time
 from typing import Tuple
 
 from .item_locator import ItemLocator
 from .item_selector import ItemSelector
 from .graph_manager import GraphManager
+from .grid_graph_manager import GridGraphManager
+from .incremental_planner import IncrementalPlanner
 from .mind_visualizer import MindVisualizer
 
 
@@ -19,22 +22,59 @@ class AlgorithmicAgent:
         The size of the maze
     visualize: bool
         Whether to visualize the agent's mind
+    grid_graph: bool
+        Whether to store the known maze in NumPy bitmask grids (GridGraphManager),
+        recommended for large mazes
+    incremental: bool
+        Whether to plan with D* Lite (IncrementalPlanner), which repairs previous
+        searches when a wall is discovered instead of running A* from scratch.
+        Paths are plain shortest paths (without the unsure edge penalties of A*)
+    n_items: int
+        The number of rescue items in the maze
+    order_mode: str
+        How the ItemSelector orders the items ("permutations" or "held_karp"),
+        use "held_karp" when there are more than a handful of items
+    candidate_mode: str
+        Which possible location the ItemSelector plans towards for items that are
+        not located yet ("first" or "nearest")
+    cache_paths: bool
+        Whether the graph keeps the paths found by A* across replans (same routes
+        as fresh searches, with less planning time)
     """
 
-    def __init__(self, maze_size: Tuple[int, int] = (10, 10), visualize: bool = True):
-        self.graph = GraphManager(maze_size)
+    def __init__(
+        self,
+        maze_size: Tuple[int, int] = (10, 10),
+        visualize: bool = True,
+        grid_graph: bool = False,
+        incremental: bool = False,
+        n_items: int = 4,
+        order_mode: str = "permutations",
+        candidate_mode: str = "first",
+        cache_paths: bool = True,
+    ):
+        if grid_graph:
+            self.graph = GridGraphManager(maze_size, cache_paths)
+        else:
+            self.graph = GraphManager(maze_size, cache_paths)
         self.visualize = visualize
-        self.item_selector = ItemSelector()
-        self.item_locator = ItemLocator(maze_size)
+        self.exit_pos = (maze_size[0] - 1, maze_size[1] - 1)
+        planner = IncrementalPlanner(self.graph) if incremental else None
+        self.item_selector = ItemSelector(
+            self.exit_pos, planner, order_mode, candidate_mode=candidate_mode
+        )
+        self.item_locator = ItemLocator(maze_size, n_items)
         if self.visualize:
-            self.visualizer = MindVisualizer()
+            self.visualizer = MindVisualizer(maze_size=maze_size)
 
         self.count = 0
+        self.replans = 0  # number of times a new plan was computed
+        self.planning_time = 0.0  # total time spent planning (seconds)
         self.curr_pos = (0, 0)
         self.closest_goal = None
         self.expected_next_pos = None
         self.planned_path = None
-        self.prev_possible_locations = None
+        self.belief_version = None
         self.actions = ["N", "S", "E", "W"]
 
     def get_action(self, state: list) -> Tuple[str, int]:
@@ -54,12 +94,8 @@ class AlgorithmicAgent:
         self.count += 1
         new_pos = tuple(x for x in state[0])
 
-        finished = True
-        for item in self.item_locator.item_possible_locations:
-            if len(list(item)) > 0:
-                finished = False
-                break
-        if finished and new_pos == (9, 9):
+        finished = not self.item_locator.item_masks.any()
+        if finished and new_pos == self.exit_pos:
             return "E", -1
 
         # Update the graph (representing the maze) according to the new position
@@ -74,18 +110,17 @@ class AlgorithmicAgent:
 
         # Update estimates of items, and get a path to follow
         self.item_locator.update_estimates(self.curr_pos, state[1], state[2])
-        if (
-            not replan
-            and self.prev_possible_locations
-            != self.item_locator.item_possible_locations
-        ):
-            self.prev_possible_locations = self.item_locator.item_possible_locations
+        if self.belief_version != self.item_locator.version:
+            self.belief_version = self.item_locator.version
             replan = True
 
         if replan:
+            tic = time.perf_counter()
             self.planned_path = self.item_selector.get_plan(
-                self.curr_pos, self.item_locator.item_possible_locations, self.graph
+                self.curr_pos, self.item_locator.item_masks, self.graph
             )
+            self.planning_time += time.perf_counter() - tic
+            self.replans += 1
         else:
             self.planned_path = self.planned_path[1:]
 
@@ -4,63 +4,134 @@ The purpose of this class is to keep track of the known edges in the maze
 It can find the shortest path between any two nodes
 Finally, it can draw the current state of the maze (known edges)
 """
-from typing import Tuple, List
-from dataclasses import dataclass
+import heapq
+from array import array
+from typing import Callable, Dict, Optional, Tuple, List, Set
 
+import numpy as np
 
-@dataclass
-class Node:
+# Neighbor offsets in N, E, S, W order, both graph backends list the neighbors of a
+# node in this order so that A* breaks ties the same way with either of them
+NEIGHBOR_DELTAS = ((0, -1), (1, 0), (0, 1), (-1, 0))
+
+
+class SearchTree:
     """
-    Node class used to store information about a node
+    Compact storage for the nodes of an A* search tree. Node data is kept in
+    parallel arrays indexed by node id (ids are given in insertion order)
 
     Parameters
     ----------
-    position: Tuple[int, int]
-        Position of the node
-    parent: Node
-        The parent node of this node
-    cost: float
-        The cost from the start node to reach this node
-    heuristic: float
-        The heuristic value of this node
-    depth: int
-        The depth of this node (Depth of start node is 0)
+    root: Tuple[int, int]
+        Position of the root (start) node, stored with id 0
     """
 
-    def __init__(
+    __slots__ = (
+        "positions",
+        "parents",
+        "costs",
+        "heuristics",
+        "parent_branch_costs",
+        "nearest_branches",
+        "is_unsure_edges",
+    )
+
+    def __init__(self, root: Tuple[int, int]):
+        self.positions = []
+        self.parents = array("l")
+        self.costs = array("d")
+        self.heuristics = array("d")
+        self.parent_branch_costs = array("d")
+        self.nearest_branches = array("l")
+        self.is_unsure_edges = array("b")
+        self.add_node(root)
+
+    def add_node(
         self,
         position: Tuple[int, int],
-        parent=None,
+        parent: int = -1,
         cost: float = 0,
         heuristic: float = 0,
         parent_branch_cost: float = 0,
         nearest_branch: int = 0,
         is_unsure_edge: bool = True,
-        depth: int = 0,
-    ):
-        self.position = position
-        self.parent = parent
-        self.cost = cost
-        self.heuristic = heuristic
-        self.parent_branch_cost = parent_branch_cost
-        self.nearest_branch = nearest_branch
-        self.is_unsure_edge = is_unsure_edge
-        self.depth = depth
+    ) -> int:
+        """
+        Add a node to the tree
 
-    def get_cost(self) -> float:
+        Parameters
+        ----------
+        position: Tuple[int, int]
+            Position of the node
+        parent: int
+            Id of the parent node (-1 for the root)
+        cost: float
+            The cost from the start node to reach this node
+        heuristic: float
+            The heuristic value of this node
+        parent_branch_cost: float
+            Accumulated unsure-edge penalty of the ancestors of this node
+        nearest_branch: int
+            Number of steps since the last branching point
+        is_unsure_edge: bool
+            Whether the edge from the parent to this node is not confirmed
+
+        Returns
+        -------
+        int
+            The id of the new node
         """
-        Get the cost of this node
+        self.positions.append(position)
+        self.parents.append(parent)
+        self.costs.append(cost)
+        self.heuristics.append(heuristic)
+        self.parent_branch_costs.append(parent_branch_cost)
+        self.nearest_branches.append(nearest_branch)
+        self.is_unsure_edges.append(is_unsure_edge)
+        return len(self.positions) - 1
+
+    def get_cost(self, node: int) -> float:
+        """
+        Get the cost of a node
+
+        Parameters
+        ----------
+        node: int
+            Id of the node
 
         Returns
         -------
         float
             The cost of this node
         """
-        cost = self.cost + self.heuristic + self.parent_branch_cost
-        if self.is_unsure_edge:
-            cost += 0.9 * self.nearest_branch
+        cost = (
+            self.costs[node] + self.heuristics[node] + self.parent_branch_costs[node]
+        )
+        if self.is_unsure_edges[node]:
+            cost += 0.9 * self.nearest_branches[node]
         return cost
 
+    def get_path(self, node: int) -> List[Tuple[int, int]]:
+        """
+        Get the positions from the root to a node
+
+        Parameters
+        ----------
+        node: int
+            Id of the last node in the path
+
+        Returns
+        -------
+        List[Tuple[int, int]]
+            List of positions from the root to the node
+        """
+        path = []
+        while node != -1:
+            path.append(self.positions[node])
+            node = self.parents[node]
+        path.reverse()
+        return path
+
 
 class PathNotFound(Exception):
     """
@@ -76,15 +147,311 @@ class GraphManager:
     ----------
     maze_size: Tuple[int, int]
         The size of the maze
+    cache_paths: bool
+        Whether get_path keeps the paths found by A* across replans. A cached
+        path is always the one a fresh search would return
     """
 
-    def __init__(self, maze_size: Tuple[int, int] = (10, 10)):
+    def __init__(
+        self, maze_size: Tuple[int, int] = (10, 10), cache_paths: bool = True
+    ):
         self.maze_size = maze_size
         self.graph = None
         self.confirmed_edges = set()
+        self.edge_removed_callbacks = []
+
+        # Cache of paths found by A*, keyed by (from, to). A search only reads the
+        # neighbors of the nodes it expands and whether the edges to them are
+        # confirmed, so a cached path stays exact until an edge touching one of
+        # the nodes its search expanded is deleted or confirmed
+        self.cache_paths = cache_paths
+        self.version = 0
+        self.path_cache: Dict[
+            Tuple[Tuple[int, int], Tuple[int, int]], List[Tuple[int, int]]
+        ] = {}
+        self.path_expansions: Dict[
+            Tuple[Tuple[int, int], Tuple[int, int]], Set[Tuple[int, int]]
+        ] = {}
+        self.paths_by_node: Dict[
+            Tuple[int, int], Set[Tuple[Tuple[int, int], Tuple[int, int]]]
+        ] = {}
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        # Breadth first distances from a source to every cell, valid until an edge
+        # is deleted (at most max_distance_fields are kept)
+        self.max_distance_fields = 64
+        self.distance_fields: Dict[Tuple[int, int], np.ndarray] = {}
+        self.edge_grid = None
+        self.edge_grid_version = -1
 
         self.initialize_graph()
 
+    def add_edge_removed_callback(
+        self, callback: Callable[[Tuple[int, int], Tuple[int, int]], None]
+    ) -> None:
+        """
+        Register a function to be called whenever an edge is deleted from the graph
+
+        Parameters
+        ----------
+        callback : Callable[[Tuple[int, int], Tuple[int, int]], None]
+            Function called with the two nodes (positions) of the deleted edge
+        """
+        self.edge_removed_callbacks.append(callback)
+
+    def on_edge_removed(
+        self, from_node: Tuple[int, int], to_node: Tuple[int, int]
+    ) -> None:
+        """
+        Notify the registered callbacks that an edge was deleted from the graph
+
+        Parameters
+        ----------
+        from_node : Tuple[int, int]
+            First node (position)
+        to_node : Tuple[int, int]
+            Second node (position)
+        """
+        self.version += 1
+        self.distance_fields.clear()
+        self.invalidate_paths(from_node, to_node)
+        for callback in self.edge_removed_callbacks:
+            callback(from_node, to_node)
+
+    def on_edge_confirmed(
+        self, from_node: Tuple[int, int], to_node: Tuple[int, int]
+    ) -> None:
+        """
+        Drop the cached paths affected by an edge confirmed for the first time
+
+        Parameters
+        ----------
+        from_node : Tuple[int, int]
+            First node (position)
+        to_node : Tuple[int, int]
+            Second node (position)
+        """
+        self.invalidate_paths(from_node, to_node)
+
+    def invalidate_paths(
+        self, from_node: Tuple[int, int], to_node: Tuple[int, int]
+    ) -> None:
+        """
+        Drop the cached paths whose search expanded one of the nodes of a changed
+        edge (the only searches that read it)
+
+        Parameters
+        ----------
+        from_node : Tuple[int, int]
+            First node (position)
+        to_node : Tuple[int, int]
+            Second node (position)
+        """
+        for node in (from_node, to_node):
+            for key in self.paths_by_node.pop(node, ()):
+                self.evict_path(key)
+
+    def evict_path(self, key: Tuple[Tuple[int, int], Tuple[int, int]]) -> None:
+        """
+        Remove a path from the cache and from the index of every node its search
+        expanded
+
+        Parameters
+        ----------
+        key : Tuple[Tuple[int, int], Tuple[int, int]]
+            The (from, to) nodes of the cached path
+        """
+        if self.path_cache.pop(key, None) is None:
+            return
+        for node in self.path_expansions.pop(key):
+            node_paths = self.paths_by_node.get(node)
+            if node_paths is not None:
+                node_paths.discard(key)
+                if len(node_paths) == 0:
+                    del self.paths_by_node[node]
+
+    @staticmethod
+    def get_edge_key(
+        from_node: Tuple[int, int], to_node: Tuple[int, int]
+    ) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        """
+        Get a key identifying an (undirected) edge
+
+        Parameters
+        ----------
+        from_node : Tuple[int, int]
+            First node (position)
+        to_node : Tuple[int, int]
+            Second node (position)
+
+        Returns
+        -------
+        Tuple[Tuple[int, int], Tuple[int, int]]
+            The two nodes in sorted order
+        """
+        if from_node <= to_node:
+            return (from_node, to_node)
+        return (to_node, from_node)
+
+    def get_path(
+        self, from_node: Tuple[int, int], to_node: Tuple[int, int]
+    ) -> List[Tuple[int, int]]:
+        """
+        Get a path between two nodes with A*. With cache_paths, the result is
+        reused until an edge explored by its search is deleted or confirmed. The
+        returned list may be shared and must not be modified
+
+        Parameters
+        ----------
+        from_node : Tuple[int, int]
+            Start node (position)
+        to_node : Tuple[int, int]
+            Goal node (position)
+
+        Returns
+        -------
+        List[Tuple[int, int]]
+            List of positions in the path
+
+        Raises
+        ------
+        PathNotFound
+            If no path is found
+        """
+        if not self.cache_paths:
+            return self.a_star(from_node, to_node)
+
+        key = (from_node, to_node)
+        path = self.path_cache.get(key)
+        if path is not None:
+            self.cache_hits += 1
+            return path
+        self.cache_misses += 1
+
+        # Only the queried direction is stored, A* is not symmetric (costs and
+        # tie-breaking depend on the start)
+        expanded = set()
+        path = self.a_star(from_node, to_node, expanded)
+        self.path_cache[key] = path
+        self.path_expansions[key] = expanded
+        for node in expanded:
+            self.paths_by_node.setdefault(node, set()).add(key)
+        return path
+
+    def get_distance(
+        self, from_node: Tuple[int, int], to_node: Tuple[int, int]
+    ) -> int:
+        """
+        Get the length of the (cached) path between two nodes
+
+        Parameters
+        ----------
+        from_node : Tuple[int, int]
+            Start node (position)
+        to_node : Tuple[int, int]
+            Goal node (position)
+
+        Returns
+        -------
+        int
+            Number of steps in the path
+
+        Raises
+        ------
+        PathNotFound
+            If no path is found
+        """
+        return len(self.get_path(from_node, to_node)) - 1
+
+    def get_cache_stats(self) -> Dict[str, int]:
+        """
+        Get statistics about the path cache
+
+        Returns
+        -------
+        Dict[str, int]
+            Number of hits, misses, cached paths and the graph version
+        """
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "size": len(self.path_cache),
+            "version": self.version,
+        }
+
+    def get_edge_grid(self) -> np.ndarray:
+        """
+        Get the edges that are not known to be blocked as a bitmask grid, using the
+        same encoding as the environment (N=1, E=2, S=4, W=8)
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape maze_size (dtype uint8), should not be modified
+        """
+        if self.edge_grid_version != self.version:
+            self.edge_grid = np.zeros(self.maze_size, dtype=np.uint8)
+            for (i, j), neighbors in self.graph.items():
+                for neighbor in neighbors:
+                    if neighbor[1] < j:
+                        self.edge_grid[i, j] |= 0x1
+                    elif neighbor[0] > i:
+                        self.edge_grid[i, j] |= 0x2
+                    elif neighbor[1] > j:
+                        self.edge_grid[i, j] |= 0x4
+                    else:
+                        self.edge_grid[i, j] |= 0x8
+            self.edge_grid_version = self.version
+        return self.edge_grid
+
+    def get_distance_field(self, source: Tuple[int, int]) -> np.ndarray:
+        """
+        Get the number of steps from a source to every cell of the maze in one
+        breadth first sweep (vectorized over the frontier). Edges that are not
+        known to be blocked are assumed open
+
+        Parameters
+        ----------
+        source : Tuple[int, int]
+            The position to measure distances from
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape maze_size with the distances (-1 if unreachable),
+            should not be modified
+        """
+        if source in self.distance_fields:
+            return self.distance_fields[source]
+
+        height = self.maze_size[1]
+        edges = self.get_edge_grid().ravel()
+        # Offsets of the neighbor in the flattened grid for each wall bit
+        offsets = ((0x1, -1), (0x2, height), (0x4, 1), (0x8, -height))
+
+        distances = np.full(edges.size, -1, dtype=np.int32)
+        frontier = np.array([source[0] * height + source[1]])
+        distances[frontier] = 0
+        depth = 0
+        while frontier.size > 0:
+            depth += 1
+            frontier_edges = edges[frontier]
+            neighbors = np.concatenate(
+                [
+                    frontier[(frontier_edges & bit) != 0] + offset
+                    for bit, offset in offsets
+                ]
+            )
+            frontier = np.unique(neighbors[distances[neighbors] < 0])
+            distances[frontier] = depth
+
+        field = distances.reshape(self.maze_size)
+        if len(self.distance_fields) >= self.max_distance_fields:
+            self.distance_fields.clear()
+        self.distance_fields[source] = field
+        return field
+
     def initialize_graph(self) -> None:
         """
         Initializes the graph with all edges (neighbors) connected
@@ -131,7 +498,10 @@ class GraphManager:
         return neighbors
 
     def a_star(
-        self, current_position: Tuple[int, int], goal: Tuple[int, int]
+        self,
+        current_position: Tuple[int, int],
+        goal: Tuple[int, int],
+        expanded: Optional[Set[Tuple[int, int]]] = None,
     ) -> List[Tuple[int, int]]:
         """
         A* algorithm to find the shortest path between two nodes
@@ -142,6 +512,8 @@ class GraphManager:
             Current position of the agent
         goal : Tuple[int, int]
             Goal position
+        expanded : Optional[Set[Tuple[int, int]]]
+            Empty set filled with the nodes expanded by the search
 
         Returns
         -------
@@ -153,49 +525,47 @@ class GraphManager:
         PathNotFound
             If no path is found
         """
-        explored = [current_position]
-        fringe = [Node(current_position)]
+        # The fringe is a binary heap ordered by (cost, node id). Node ids are
+        # given in insertion order, which matches the old linear scan picking
+        # the first node with minimum cost
+        tree = SearchTree(current_position)
+        fringe = [(tree.get_cost(0), 0)]
+        discovered = {current_position}
+        closed = expanded if expanded is not None else set()
 
         while len(fringe) > 0:
-            costs = [node.get_cost() for node in fringe]
-            to_explore_idx = costs.index(min(costs))
-            to_explore = fringe[to_explore_idx]
+            _, to_explore = heapq.heappop(fringe)
+            position = tree.positions[to_explore]
+            if position in closed:
+                continue  # Stale heap entry
+            closed.add(position)
 
-            if to_explore.position == goal:
-                path_nodes = self.get_tree(to_explore)
-                path_positions = [node.position for node in path_nodes]
-                return path_positions
+            if position == goal:
+                return self.get_tree(tree, to_explore)
 
-            children, heuristics = self.get_children(to_explore.position, goal)
-            fringe_states = [node.position for node in fringe]
+            children, heuristics = self.get_children(position, goal)
             for child, heuristic in zip(children, heuristics):
-                if child not in explored and child not in fringe_states:
+                if child not in discovered:
                     if len(children) > 1:
                         nearest_branch = 1
                     else:
-                        nearest_branch = to_explore.nearest_branch + 1
-                    is_unsure_edge = (
+                        nearest_branch = tree.nearest_branches[to_explore] + 1
+                    is_unsure_edge = not self.is_confirmed_edge(child, position)
+                    parent_branch_cost = tree.parent_branch_costs[to_explore]
+                    if tree.is_unsure_edges[to_explore]:
+                        parent_branch_cost += 0.9 * tree.nearest_branches[to_explore]
+                    child_node = tree.add_node(
                         child,
-                        to_explore.position,
-                    ) not in self.confirmed_edges
-                    parent_branch_cost = to_explore.parent_branch_cost
-                    if to_explore.is_unsure_edge:
-                        parent_branch_cost += 0.9 * to_explore.nearest_branch
-                    fringe.append(
-                        Node(
-                            child,
-                            to_explore,
-                            to_explore.cost + 1,
-                            heuristic,
-                            parent_branch_cost,
-                            nearest_branch,
-                            is_unsure_edge,
-                            to_explore.depth + 1,
-                        )
+                        to_explore,
+                        tree.costs[to_explore] + 1,
+                        heuristic,
+                        parent_branch_cost,
+                        nearest_branch,
+                        is_unsure_edge,
                     )
-                    explored.append(child)
+                    heapq.heappush(fringe, (tree.get_cost(child_node), child_node))
+                    discovered.add(child)
 
-            del fringe[to_explore_idx]
         raise PathNotFound("No path found")
 
     def get_children(
@@ -216,15 +586,54 @@ class GraphManager:
         Tuple[List[Tuple[int, int]], List[float]]
             List of children and list of heuristics
         """
-        children = self.graph[position]
+        children = self.get_neighbors(position)
         heuristics = []
         for neighbor in children:
-            to_add = 0
-            if (position, neighbor) not in self.confirmed_edges:
-                to_add += 0.5
             heuristics.append(abs(neighbor[0] - goal[0]) + abs(neighbor[1] - goal[1]))
         return children, heuristics
 
+    def get_neighbors(self, position: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """
+        Get the neighbors of a node (position) that are not known to be blocked
+
+        Parameters
+        ----------
+        position : Tuple[int, int]
+            Position of the node
+
+        Returns
+        -------
+        List[Tuple[int, int]]
+            The reachable neighbors of the node (in N, E, S, W order)
+        """
+        i, j = position
+        neighbors = self.graph[position]
+        return [
+            (i + di, j + dj)
+            for di, dj in NEIGHBOR_DELTAS
+            if (i + di, j + dj) in neighbors
+        ]
+
+    def is_confirmed_edge(
+        self, from_node: Tuple[int, int], to_node: Tuple[int, int]
+    ) -> bool:
+        """
+        Check whether the edge between two nodes (positions) was confirmed
+
+        Parameters
+        ----------
+        from_node : Tuple[int, int]
+            First node (position)
+        to_node : Tuple[int, int]
+            Second node (position)
+
+        Returns
+        -------
+        bool
+            True if the agent already moved along this edge
+        """
+        return (from_node, to_node) in self.confirmed_edges
+
     def remove_edge_from_graph(
         self, from_node: Tuple[int, int], to_node: Tuple[int, int]
     ) -> None:
@@ -238,10 +647,15 @@ class GraphManager:
         to_node : Tuple[int, int]
             Second node (position)
         """
+        removed = False
         if from_node in self.graph and to_node in self.graph[from_node]:
             self.graph[from_node].remove(to_node)
+            removed = True
         if to_node in self.graph and from_node in self.graph[to_node]:
             self.graph[to_node].remove(from_node)
+            removed = True
+        if removed:
+            self.on_edge_removed(from_node, to_node)
 
     def confirm_edge(
         self, from_node: Tuple[int, int], to_node: Tuple[int, int]
@@ -256,24 +670,27 @@ class GraphManager:
         to_node : Tuple[int, int]
             Second node (position)
         """
+        if (from_node, to_node) in self.confirmed_edges:
+            return
         self.confirmed_edges.add((from_node, to_node))
         self.confirmed_edges.add((to_node, from_node))
+        self.on_edge_confirmed(from_node, to_node)
 
-    def get_tree(self, path_node: Node) -> List[Node]:
+    def get_tree(self, tree: SearchTree, path_node: int) -> List[Tuple[int, int]]:
         """
-        Generates the solution path (recursively) as a list of states from
-        the goal node to the start node
+        Generates the solution path (iteratively) as a list of states from
+        the start node to the goal node
 
         Parameters
         ----------
-        path_node: Node
-            The goal node reached
+        tree: SearchTree
+            The search tree built by A*
+        path_node: int
+            Id of the goal node reached
 
         Returns
         -------
-        List[Node]
-            List of nodes from the goal node to the start node
+        List[Tuple[int, int]]
+            List of positions from the start node to the goal node
         """
-        if path_node.parent is None:
-            return [path_node]
-        return self.get_tree(path_node.parent) + [path_node]
+        return tree.get_path(path_node)
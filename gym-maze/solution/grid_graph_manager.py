@@ -0,0 +1,220 @@
+"""
+Module to implement the GridGraphManager class
+An alternative backend to GraphManager which stores the known edges of the
+maze as NumPy bitmask grids instead of a dict of sets of positions
+Each cell uses 4 bits (N, E, S, W) with the same encoding as the environment
+"""
+from collections.abc import Mapping
+from typing import Iterator, List, Tuple
+
+import numpy as np
+
+from .graph_manager import NEIGHBOR_DELTAS, GraphManager
+
+# Same encoding as Maze.get_walls_status in the environment
+DIRECTIONS = dict(zip(NEIGHBOR_DELTAS, (0x1, 0x2, 0x4, 0x8)))
+OPPOSITE = {0x1: 0x4, 0x2: 0x8, 0x4: 0x1, 0x8: 0x2}
+# Neighbor offsets (in N, E, S, W order) for every 4-bit cell value
+OPEN_DELTAS = [
+    tuple(delta for delta, bit in DIRECTIONS.items() if bits & bit)
+    for bits in range(16)
+]
+
+
+class GridAdjacencyView(Mapping):
+    """
+    Read-only dict-like view (position -> set of neighbors) over a bitmask grid,
+    so code written for GraphManager.graph keeps working
+
+    Parameters
+    ----------
+    edges: np.ndarray
+        Bitmask grid of the edges that are not known to be blocked
+    """
+
+    def __init__(self, edges: np.ndarray):
+        self.edges = edges
+
+    def __getitem__(self, position: Tuple[int, int]) -> set:
+        i, j = position
+        if not (0 <= i < self.edges.shape[0] and 0 <= j < self.edges.shape[1]):
+            raise KeyError(position)
+        return {(i + di, j + dj) for di, dj in OPEN_DELTAS[self.edges.item(i, j)]}
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        for i in range(self.edges.shape[0]):
+            for j in range(self.edges.shape[1]):
+                yield (i, j)
+
+    def __len__(self) -> int:
+        return self.edges.size
+
+
+class GridGraphManager(GraphManager):
+    """
+    Class to manage the graph of the maze using NumPy bitmask grids
+
+    Parameters
+    ----------
+    maze_size: Tuple[int, int]
+        The size of the maze
+    cache_paths: bool
+        Whether get_path keeps the paths found by A* across replans
+    """
+
+    def __init__(
+        self, maze_size: Tuple[int, int] = (10, 10), cache_paths: bool = True
+    ):
+        self.open_edges = None
+        self.confirmed = None
+        super().__init__(maze_size, cache_paths)
+
+    def initialize_graph(self) -> None:
+        """
+        Initializes the graph with all edges (neighbors) connected
+        """
+        self.open_edges = np.full(self.maze_size, 0xF, dtype=np.uint8)
+        self.open_edges[:, 0] &= ~np.uint8(0x1)
+        self.open_edges[-1, :] &= ~np.uint8(0x2)
+        self.open_edges[:, -1] &= ~np.uint8(0x4)
+        self.open_edges[0, :] &= ~np.uint8(0x8)
+        self.confirmed = np.zeros(self.maze_size, dtype=np.uint8)
+        self.graph = GridAdjacencyView(self.open_edges)
+
+    def get_edge_grid(self) -> np.ndarray:
+        """
+        Get the edges that are not known to be blocked as a bitmask grid, using the
+        same encoding as the environment (N=1, E=2, S=4, W=8)
+
+        Returns
+        -------
+        np.ndarray
+            Array of shape maze_size (dtype uint8), should not be modified
+        """
+        return self.open_edges
+
+    def get_neighbors(self, position: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """
+        Get the neighbors of a node (position) that are not known to be blocked
+
+        Parameters
+        ----------
+        position : Tuple[int, int]
+            Position of the node
+
+        Returns
+        -------
+        List[Tuple[int, int]]
+            The reachable neighbors of the node (in N, E, S, W order)
+        """
+        i, j = position
+        return [(i + di, j + dj) for di, dj in OPEN_DELTAS[self.open_edges.item(i, j)]]
+
+    def is_confirmed_edge(
+        self, from_node: Tuple[int, int], to_node: Tuple[int, int]
+    ) -> bool:
+        """
+        Check whether the edge between two nodes (positions) was confirmed
+
+        Parameters
+        ----------
+        from_node : Tuple[int, int]
+            First node (position)
+        to_node : Tuple[int, int]
+            Second node (position)
+
+        Returns
+        -------
+        bool
+            True if the agent already moved along this edge
+        """
+        bit = self.get_edge_bit(from_node, to_node)
+        return bit is not None and bool(self.confirmed.item(from_node) & bit)
+
+    def remove_edge_from_graph(
+        self, from_node: Tuple[int, int], to_node: Tuple[int, int]
+    ) -> None:
+        """
+        Delete the edge between two nodes (positions) in the graph
+
+        Parameters
+        ----------
+        from_node : Tuple[int, int]
+            First node (position)
+        to_node : Tuple[int, int]
+            Second node (position)
+        """
+        bit = self.get_edge_bit(from_node, to_node)
+        if (
+            bit is None
+            or not self.is_within_bounds(from_node)
+            or not self.is_within_bounds(to_node)
+        ):
+            return
+        if not self.open_edges.item(from_node) & bit:
+            return
+        self.open_edges[from_node] &= ~np.uint8(bit)
+        self.open_edges[to_node] &= ~np.uint8(OPPOSITE[bit])
+        self.on_edge_removed(from_node, to_node)
+
+    def confirm_edge(
+        self, from_node: Tuple[int, int], to_node: Tuple[int, int]
+    ) -> None:
+        """
+        Mark the edge between two nodes (positions) as confirmed
+
+        Parameters
+        ----------
+        from_node : Tuple[int, int]
+            First node (position)
+        to_node : Tuple[int, int]
+            Second node (position)
+        """
+        bit = self.get_edge_bit(from_node, to_node)
+        if (
+            bit is None
+            or not self.is_within_bounds(from_node)
+            or not self.is_within_bounds(to_node)
+        ):
+            return
+        if self.confirmed.item(from_node) & bit:
+            return
+        self.confirmed[from_node] |= bit
+        self.confirmed[to_node] |= OPPOSITE[bit]
+        self.on_edge_confirmed(from_node, to_node)
+
+    def is_within_bounds(self, position: Tuple[int, int]) -> bool:
+        """
+        Check whether a position is inside the maze
+
+        Parameters
+        ----------
+        position : Tuple[int, int]
+            The position to check
+
+        Returns
+        -------
+        bool
+            True if the position is inside the maze
+        """
+        i, j = position
+        return 0 <= i < self.maze_size[0] and 0 <= j < self.maze_size[1]
+
+    @staticmethod
+    def get_edge_bit(from_node: Tuple[int, int], to_node: Tuple[int, int]):
+        """
+        Get the wall bit of from_node that leads to to_node
+
+        Parameters
+        ----------
+        from_node : Tuple[int, int]
+            First node (position)
+        to_node : Tuple[int, int]
+            Second node (position)
+
+        Returns
+        -------
+        Optional[int]
+            The bit (N=1, E=2, S=4, W=8), or None if the nodes are not adjacent
+        """
+        return DIRECTIONS.get((to_node[0] - from_node[0], to_node[1] - from_node[1]))
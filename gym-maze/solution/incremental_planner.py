@@ -0,0 +1,258 @@
+"""
+Module to implement incremental shortest path planning (D* Lite)
+Each search runs backwards from a fixed goal, so when the agent moves or an edge
+is deleted from the GraphManager, only the affected part of the previous search
+is repaired instead of planning from scratch
+"""
+import heapq
+from collections import OrderedDict
+from typing import Dict, List, Set, Tuple
+
+from .graph_manager import GraphManager, PathNotFound
+
+INF = float("inf")
+
+
+class DStarLite:
+    """
+    D* Lite search towards a single goal, all edges have unit cost
+
+    Parameters
+    ----------
+    graph: GraphManager
+        The graph representing the maze
+    goal: Tuple[int, int]
+        The goal position
+    """
+
+    def __init__(self, graph: GraphManager, goal: Tuple[int, int]):
+        self.graph = graph
+        self.goal = goal
+        self.g_values: Dict[Tuple[int, int], float] = {}
+        self.rhs_values: Dict[Tuple[int, int], float] = {goal: 0}
+        self.key_modifier = 0
+        self.last_start = None
+        self.changed_nodes: Set[Tuple[int, int]] = set()
+
+        # Priority queue with lazy deletion: a heap entry is only valid if its key
+        # matches the key stored for the node in open_keys
+        self.open_heap = []
+        self.open_keys: Dict[Tuple[int, int], Tuple[float, float]] = {}
+        self.push(goal, (self.heuristic(goal, goal), 0))
+
+    @staticmethod
+    def heuristic(pos_a: Tuple[int, int], pos_b: Tuple[int, int]) -> float:
+        """
+        Manhattan distance between two positions
+        """
+        return abs(pos_a[0] - pos_b[0]) + abs(pos_a[1] - pos_b[1])
+
+    def get_g(self, node: Tuple[int, int]) -> float:
+        """
+        Get the current distance estimate from a node to the goal
+        """
+        return self.g_values.get(node, INF)
+
+    def get_rhs(self, node: Tuple[int, int]) -> float:
+        """
+        Get the one-step lookahead distance estimate from a node to the goal
+        """
+        return self.rhs_values.get(node, INF)
+
+    def calculate_key(
+        self, node: Tuple[int, int], start: Tuple[int, int]
+    ) -> Tuple[float, float]:
+        """
+        Priority of a node in the queue
+        """
+        value = min(self.get_g(node), self.get_rhs(node))
+        return (value + self.heuristic(start, node) + self.key_modifier, value)
+
+    def push(self, node: Tuple[int, int], key: Tuple[float, float]) -> None:
+        """
+        Insert a node in the queue (or update its key)
+        """
+        self.open_keys[node] = key
+        heapq.heappush(self.open_heap, (key, node))
+
+    def top_key(self) -> Tuple[float, float]:
+        """
+        Get the smallest valid key in the queue, dropping stale entries
+        """
+        while self.open_heap:
+            key, node = self.open_heap[0]
+            if self.open_keys.get(node) == key:
+                return key
+            heapq.heappop(self.open_heap)
+        return (INF, INF)
+
+    def update_node(self, node: Tuple[int, int], start: Tuple[int, int]) -> None:
+        """
+        Recompute the lookahead value of a node and its membership in the queue
+        """
+        if node != self.goal:
+            rhs = INF
+            for neighbor in self.graph.get_neighbors(node):
+                rhs = min(rhs, 1 + self.get_g(neighbor))
+            self.rhs_values[node] = rhs
+        if self.get_g(node) != self.get_rhs(node):
+            self.push(node, self.calculate_key(node, start))
+        else:
+            self.open_keys.pop(node, None)
+
+    def notify_edge_removed(
+        self, from_node: Tuple[int, int], to_node: Tuple[int, int]
+    ) -> None:
+        """
+        Record the end points of a deleted edge, they are repaired on the next plan
+
+        Parameters
+        ----------
+        from_node : Tuple[int, int]
+            First node (position)
+        to_node : Tuple[int, int]
+            Second node (position)
+        """
+        self.changed_nodes.add(from_node)
+        self.changed_nodes.add(to_node)
+
+    def compute_shortest_path(self, start: Tuple[int, int]) -> None:
+        """
+        Expand nodes until the distance estimate of the start node is correct
+
+        Parameters
+        ----------
+        start : Tuple[int, int]
+            The position to plan from
+        """
+        if self.last_start is not None:
+            self.key_modifier += self.heuristic(self.last_start, start)
+        self.last_start = start
+        for node in self.changed_nodes:
+            self.update_node(node, start)
+        self.changed_nodes.clear()
+
+        while (
+            self.top_key() < self.calculate_key(start, start)
+            or self.get_rhs(start) != self.get_g(start)
+        ):
+            if not self.open_heap:
+                break
+            old_key, node = heapq.heappop(self.open_heap)
+            del self.open_keys[node]
+            new_key = self.calculate_key(node, start)
+            if old_key < new_key:
+                self.push(node, new_key)
+            elif self.get_g(node) > self.get_rhs(node):
+                self.g_values[node] = self.get_rhs(node)
+                for neighbor in self.graph.get_neighbors(node):
+                    self.update_node(neighbor, start)
+            else:
+                self.g_values[node] = INF
+                self.update_node(node, start)
+                for neighbor in self.graph.get_neighbors(node):
+                    self.update_node(neighbor, start)
+
+    def plan(self, start: Tuple[int, int]) -> List[Tuple[int, int]]:
+        """
+        Find the shortest path from a position to the goal
+
+        Parameters
+        ----------
+        start : Tuple[int, int]
+            The position to plan from
+
+        Returns
+        -------
+        List[Tuple[int, int]]
+            List of positions in the shortest path
+
+        Raises
+        ------
+        PathNotFound
+            If no path is found
+        """
+        self.compute_shortest_path(start)
+        if self.get_g(start) == INF:
+            raise PathNotFound("No path found")
+
+        path = [start]
+        node = start
+        while node != self.goal:
+            best_cost = INF
+            for neighbor in self.graph.get_neighbors(node):
+                cost = 1 + self.get_g(neighbor)
+                if cost < best_cost:
+                    best_cost = cost
+                    node = neighbor
+            if best_cost == INF or len(path) > len(self.graph.graph):
+                raise PathNotFound("No path found")
+            path.append(node)
+        return path
+
+
+class IncrementalPlanner:
+    """
+    Class to plan shortest paths between positions while reusing previous searches
+    One D* Lite search is kept per goal (least recently used goals are dropped)
+
+    Parameters
+    ----------
+    graph: GraphManager
+        The graph representing the maze, deleted edges are picked up automatically
+    max_goals: int
+        Maximum number of goals to keep a search for
+    """
+
+    def __init__(self, graph: GraphManager, max_goals: int = 16):
+        self.graph = graph
+        self.max_goals = max_goals
+        self.searches: "OrderedDict[Tuple[int, int], DStarLite]" = OrderedDict()
+        graph.add_edge_removed_callback(self.notify_edge_removed)
+
+    def notify_edge_removed(
+        self, from_node: Tuple[int, int], to_node: Tuple[int, int]
+    ) -> None:
+        """
+        Forward a deleted edge to every kept search
+
+        Parameters
+        ----------
+        from_node : Tuple[int, int]
+            First node (position)
+        to_node : Tuple[int, int]
+            Second node (position)
+        """
+        for search in self.searches.values():
+            search.notify_edge_removed(from_node, to_node)
+
+    def plan(
+        self, start: Tuple[int, int], goal: Tuple[int, int]
+    ) -> List[Tuple[int, int]]:
+        """
+        Find the shortest path between two positions
+
+        Parameters
+        ----------
+        start : Tuple[int, int]
+            The position to plan from
+        goal : Tuple[int, int]
+            The goal position
+
+        Returns
+        -------
+        List[Tuple[int, int]]
+            List of positions in the shortest path
+
+        Raises
+        ------
+        PathNotFound
+            If no path is found
+        """
+        search = self.searches.pop(goal, None)
+        if search is None:
+            search = DStarLite(self.graph, goal)
+        self.searches[goal] = search
+        if len(self.searches) > self.max_goals:
+            self.searches.popitem(last=False)
+        return search.plan(start)
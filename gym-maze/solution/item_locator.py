@@ -2,25 +2,39 @@
 Class to estimate the locations of the items in the maze given
 the observations (distance and direction)
 """
-from typing import List, Tuple
+from typing import List, Set, Tuple
+
+import numpy as np
 
 
 class ItemLocator:
     """
     Class to estimate the locations of the items in the maze
+    The belief about each item is a boolean grid of the locations compatible
+    with all observations so far. version is incremented every time a belief
+    shrinks, so users can detect changes without comparing the beliefs
     """
 
     def __init__(self, maze_size: Tuple[int, int] = (10, 10), n_items: int = 4):
         self.maze_size = maze_size
         self.is_item_available = [True] * n_items  # False, if item is found
-        self.item_possible_locations = [
-            set() for _ in range(n_items)
-        ]  # List of possible locations (compatible with all observations) for each item
+        self.item_masks = np.ones((n_items,) + tuple(maze_size), dtype=bool)
+        self.cell_x, self.cell_y = np.indices(maze_size)
+        self.cached_locations = None
+        self.version = 0
 
-        for i in range(maze_size[0]):
-            for j in range(maze_size[1]):
-                for item in self.item_possible_locations:
-                    item.add((i, j))
+    @property
+    def item_possible_locations(self) -> List[Set[Tuple[int, int]]]:
+        """
+        List of possible locations (compatible with all observations) for each item,
+        built from item_masks for the visualizer (planning uses the masks directly)
+        """
+        if self.cached_locations is None:
+            self.cached_locations = [
+                set(map(tuple, np.argwhere(mask).tolist()))
+                for mask in self.item_masks
+            ]
+        return self.cached_locations
 
     def update_estimates(
         self,
@@ -40,58 +54,53 @@ class ItemLocator:
         directions : List[Tuple[int, int]]
             The directions to each item
         """
-        for idx, is_available in enumerate(self.is_item_available):
-            if is_available:
-                if distances[idx] == -1:
-                    self.item_possible_locations[idx] = set()
-                    self.is_item_available[idx] = False
-                else:
-                    possible_locs = self.get_locs_from_obs(
-                        curr_pos, distances[idx], directions[idx]
-                    )
-                    new_locs = set()
-                    for loc in possible_locs:
-                        if loc in self.item_possible_locations[idx]:
-                            new_locs.add(loc)
-                    self.item_possible_locations[idx] = new_locs
+        counts_before = np.count_nonzero(self.item_masks, axis=(1, 2))
+        available = np.array(self.is_item_available)
+        found = available & (np.asarray(distances) == -1)
+        self.item_masks[found] = False
+        for idx in np.flatnonzero(found):
+            self.is_item_available[idx] = False
+
+        observed = available & ~found
+        if observed.any():
+            self.item_masks[observed] &= self.get_masks_from_obs(
+                curr_pos,
+                np.asarray(distances)[observed],
+                np.asarray(directions).reshape(-1, 2)[observed],
+            )
 
-    def get_locs_from_obs(
-        self, curr_pos: Tuple[int, int], distance: int, direction: Tuple[int, int]
-    ) -> List[Tuple[int, int]]:
+        if (np.count_nonzero(self.item_masks, axis=(1, 2)) < counts_before).any():
+            self.version += 1
+            self.cached_locations = None
+
+    def get_masks_from_obs(
+        self, curr_pos: Tuple[int, int], distances: np.ndarray, directions: np.ndarray
+    ) -> np.ndarray:
         """
-        Get the possible locations of an item from the distance and direction
+        Get the possible locations of items from their distances and directions,
+        i.e. the cells at the given Manhattan distance in the given quadrant
 
         Parameters
         ----------
         curr_pos : Tuple[int, int]
             The current position of the agent
-        distance : int
-            Manhattan distance to the item
-        direction : Tuple[int, int]
-            Direction to the item
+        distances : np.ndarray
+            Manhattan distance to each item, shape (n,)
+        directions : np.ndarray
+            Direction (sign of the offset in x and y) to each item, shape (n, 2)
 
         Returns
         -------
-        List[Tuple[int, int]]
-            List of possible locations of the item
+        np.ndarray
+            Boolean masks of shape (n,) + maze_size of the possible locations
         """
-        possible_locs = []
-        if 0 in direction:  # Exact location of the item is known
-            possible_locs.append(
-                (
-                    curr_pos[0] + direction[0] * distance,
-                    curr_pos[1] + direction[1] * distance,
-                )
-            )
-            return possible_locs
-        for i in range(1, distance):
-            possible_locs.append(
-                (
-                    curr_pos[0] + direction[0] * i,
-                    curr_pos[1] + direction[1] * (distance - i),
-                )
-            )
-        return possible_locs
+        offset_x = (self.cell_x - curr_pos[0])[None]
+        offset_y = (self.cell_y - curr_pos[1])[None]
+        return (
+            (np.abs(offset_x) + np.abs(offset_y) == distances[:, None, None])
+            & (np.sign(offset_x) == directions[:, 0, None, None])
+            & (np.sign(offset_y) == directions[:, 1, None, None])
+        )
 
     def get_estimates(self, item_idx: int) -> List[Tuple[int, int]]:
         """
@@ -107,4 +116,4 @@ class ItemLocator:
         List[Tuple[int, int]]
             List of possible locations of the item
         """
-        return list(self.item_possible_locations[item_idx])
+        return list(map(tuple, np.argwhere(self.item_masks[item_idx]).tolist()))
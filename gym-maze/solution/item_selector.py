@@ -2,9 +2,13 @@
 Class to choose which item to rescue next
 """
 from itertools import permutations
-from typing import List, Tuple, Set
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
 
 from .graph_manager import GraphManager
+from .incremental_planner import IncrementalPlanner
+from .route_optimizer import RouteOptimizer
 
 
 class ItemSelector:
@@ -15,15 +19,43 @@ class ItemSelector:
     ----------
     exit_pos: Tuple[int, int]
         The position of the exit
+    planner: Optional[IncrementalPlanner]
+        If given, paths between positions are found with this incremental planner
+        instead of running A* from scratch
+    order_mode: str
+        How to choose the order of the items: "permutations" tries every order,
+        "held_karp" uses RouteOptimizer on a matrix of distances between items
+    max_exact_items: int
+        In "held_karp" mode, number of items above which the order is found with
+        a 2-opt/or-opt heuristic instead of the exact dynamic programming
+    candidate_mode: str
+        Which possible location to plan towards for items that are not located yet:
+        "first" takes the first one in (x, y) order, "nearest" takes the closest
+        one from the current position (using a single distance field of the graph)
     """
 
-    def __init__(self, exit_pos: Tuple[int, int] = (9, 9)):
+    def __init__(
+        self,
+        exit_pos: Tuple[int, int] = (9, 9),
+        planner: Optional[IncrementalPlanner] = None,
+        order_mode: str = "permutations",
+        max_exact_items: int = 12,
+        candidate_mode: str = "first",
+    ):
+        if order_mode not in ("permutations", "held_karp"):
+            raise ValueError(f"Unknown order_mode: {order_mode}")
+        if candidate_mode not in ("first", "nearest"):
+            raise ValueError(f"Unknown candidate_mode: {candidate_mode}")
         self.exit_pos = exit_pos
+        self.planner = planner
+        self.order_mode = order_mode
+        self.route_optimizer = RouteOptimizer(max_exact_items)
+        self.candidate_mode = candidate_mode
 
     def get_plan(
         self,
         curr_pos: Tuple[int, int],
-        item_possible_locs: List[Set[Tuple[int, int]]],
+        item_masks: np.ndarray,
         graph: GraphManager,
     ) -> List[Tuple[int, int]]:
         """
@@ -33,8 +65,9 @@ class ItemSelector:
         ----------
         curr_pos : Tuple[int, int]
             The current position of the agent
-        item_possible_locs : List[Set[Tuple[int, int]]]
-            For each item, a set of possible locations consistent with the observations
+        item_masks : np.ndarray
+            Boolean array of shape (n_items,) + maze_size, the possible locations of
+            each item consistent with the observations
         graph: GraphManager
             The graph representing the maze
 
@@ -47,24 +80,19 @@ class ItemSelector:
 
         # Create a minimized graph containing curr_pos, items, and exit
         positions = [curr_pos]
-        for item_locs in item_possible_locs:
-            if len(list(item_locs)) > 0:
-                all_item_locs = list(item_locs)
-                # min_dist = float("inf")
-                # min_item_loc = None
-                # for item_loc in all_item_locs:
-                #     if (curr_pos, item_loc) in memory:
-                #         dist = len(memory[(curr_pos, item_loc)]) - 1
-                #     else:
-                #         memory[(curr_pos, item_loc)] = graph.a_star(curr_pos, item_loc)
-                #         dist = len(memory[(curr_pos, item_loc)]) - 1
-                #     if dist < min_dist:
-                #         min_dist = dist
-                #         min_item_loc = item_loc
-                # positions.append(min_item_loc)
-                positions.append(all_item_locs[0])
+        for mask in item_masks:
+            if self.candidate_mode == "nearest":
+                if mask.any():
+                    positions.append(self.get_nearest_location(curr_pos, mask, graph))
+            else:
+                item_locs = np.argwhere(mask)
+                if len(item_locs) > 0:
+                    positions.append(tuple(item_locs[0].tolist()))
         positions.append(self.exit_pos)
 
+        if self.order_mode == "held_karp":
+            return self.get_route_plan(positions, graph, memory)
+
         order_items = list(permutations(positions[1:-1]))
         min_cost = float("inf")
         min_solution = None
@@ -78,7 +106,7 @@ class ItemSelector:
                 if (order[i], order[i + 1]) in memory:
                     sol = memory[(order[i], order[i + 1])]
                 else:
-                    sol = graph.a_star(order[i], order[i + 1])
+                    sol = self.find_path(order[i], order[i + 1], graph)
                     memory[(order[i], order[i + 1])] = sol
                     memory[(order[i + 1], order[i])] = sol[::-1]
                 solution_cells.extend(sol[1:])
@@ -87,3 +115,103 @@ class ItemSelector:
                 min_cost = cost
                 min_solution = solution_cells
         return min_solution
+
+    def get_nearest_location(
+        self,
+        curr_pos: Tuple[int, int],
+        mask: np.ndarray,
+        graph: GraphManager,
+    ) -> Tuple[int, int]:
+        """
+        Get the possible location of an item which is the closest to the agent
+
+        Parameters
+        ----------
+        curr_pos : Tuple[int, int]
+            The current position of the agent
+        mask : np.ndarray
+            Boolean array of shape maze_size, the possible locations of the item
+        graph: GraphManager
+            The graph representing the maze
+
+        Returns
+        -------
+        Tuple[int, int]
+            The closest reachable location, ties broken in (x, y) order (or the
+            first location if none is reachable)
+        """
+        field = graph.get_distance_field(curr_pos)
+        reachable = np.argwhere(mask & (field >= 0))
+        if len(reachable) == 0:
+            return tuple(np.argwhere(mask)[0].tolist())
+        # argwhere is in (x, y) order and argmin takes the first minimum
+        nearest = np.argmin(field[reachable[:, 0], reachable[:, 1]])
+        return tuple(reachable[nearest].tolist())
+
+    def get_route_plan(
+        self,
+        positions: List[Tuple[int, int]],
+        graph: GraphManager,
+        memory: Dict[Tuple[Tuple[int, int], Tuple[int, int]], List[Tuple[int, int]]],
+    ) -> List[Tuple[int, int]]:
+        """
+        Plan a route through all positions using a matrix of distances between them
+
+        Parameters
+        ----------
+        positions : List[Tuple[int, int]]
+            The current position, the position of each item, then the exit
+        graph: GraphManager
+            The graph representing the maze
+        memory: Dict[Tuple[Tuple[int, int], Tuple[int, int]], List[Tuple[int, int]]]
+            Paths already found between pairs of positions
+
+        Returns
+        -------
+        List[Tuple[int, int]]
+            The path to follow to rescue all items and exit the maze
+        """
+        n_positions = len(positions)
+        distances = np.zeros((n_positions, n_positions))
+        for i in range(n_positions):
+            for j in range(i + 1, n_positions):
+                key = (positions[i], positions[j])
+                if key not in memory:
+                    sol = self.find_path(positions[i], positions[j], graph)
+                    memory[key] = sol
+                    memory[(positions[j], positions[i])] = sol[::-1]
+                distances[i, j] = distances[j, i] = len(memory[key]) - 1
+
+        order = [0] + self.route_optimizer.solve(distances) + [n_positions - 1]
+        solution_cells = [positions[0]]
+        for i in range(len(order) - 1):
+            leg = memory[(positions[order[i]], positions[order[i + 1]])]
+            solution_cells.extend(leg[1:])
+        return solution_cells
+
+    def find_path(
+        self,
+        from_pos: Tuple[int, int],
+        to_pos: Tuple[int, int],
+        graph: GraphManager,
+    ) -> List[Tuple[int, int]]:
+        """
+        Find a path between two positions
+
+        Parameters
+        ----------
+        from_pos : Tuple[int, int]
+            The position to start from
+        to_pos : Tuple[int, int]
+            The position to reach
+        graph: GraphManager
+            The graph representing the maze
+
+        Returns
+        -------
+        List[Tuple[int, int]]
+            List of positions in the path
+        """
+        if self.planner is not None:
+            return self.planner.plan(from_pos, to_pos)
+        return graph.get_path(from_pos, to_pos)
@@ -197,7 +197,7 @@ class MindVisualizer:
         # yellow, purple, red, blue
         colors = [(255, 255, 0), (255, 0, 255), (255, 0, 0), (0, 0, 255)]
         for idx, possible_locations in enumerate(goal_possible_locations):
-            goal_color = colors[idx]
+            goal_color = colors[idx % len(colors)]
             for goal in possible_locations:
                 self.draw_square(
                     goal,
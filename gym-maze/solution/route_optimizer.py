@@ -0,0 +1,186 @@
+"""
+Class to choose the order in which to visit waypoints (a path-shaped TSP with
+fixed start and end) from a matrix of distances between them
+"""
+from typing import List
+
+import numpy as np
+
+
+class RouteOptimizer:
+    """
+    Class to order waypoints so that the total route length is minimal
+    Uses Held-Karp dynamic programming (exact) for up to max_exact_items waypoints,
+    and a nearest neighbor tour improved with 2-opt and or-opt moves otherwise
+
+    Parameters
+    ----------
+    max_exact_items: int
+        Maximum number of waypoints (excluding start and end) solved exactly
+    """
+
+    def __init__(self, max_exact_items: int = 12):
+        self.max_exact_items = max_exact_items
+
+    def solve(self, distances: np.ndarray) -> List[int]:
+        """
+        Order the waypoints of a route
+
+        Parameters
+        ----------
+        distances : np.ndarray
+            Matrix of shape (n + 2, n + 2) with the distances between waypoints,
+            index 0 is the start and index n + 1 is the end of the route
+
+        Returns
+        -------
+        List[int]
+            Indices of the n intermediate waypoints in visiting order
+        """
+        n_items = distances.shape[0] - 2
+        if n_items <= 1:
+            return list(range(1, n_items + 1))
+        if n_items <= self.max_exact_items:
+            return self.held_karp(distances)
+        return self.local_search(distances, self.nearest_neighbor(distances))
+
+    @staticmethod
+    def route_length(distances: np.ndarray, order: List[int]) -> float:
+        """
+        Length of a route going from the start through order to the end
+
+        Parameters
+        ----------
+        distances : np.ndarray
+            Matrix of distances between waypoints
+        order : List[int]
+            Indices of the intermediate waypoints in visiting order
+
+        Returns
+        -------
+        float
+            The total length of the route
+        """
+        route = [0] + list(order) + [distances.shape[0] - 1]
+        return float(distances[route[:-1], route[1:]].sum())
+
+    @staticmethod
+    def held_karp(distances: np.ndarray) -> List[int]:
+        """
+        Exact ordering with bitmask dynamic programming, O(2^n * n^2) vectorized
+        over all subsets of the same size
+
+        Parameters
+        ----------
+        distances : np.ndarray
+            Matrix of distances between waypoints
+
+        Returns
+        -------
+        List[int]
+            Indices of the intermediate waypoints in visiting order
+        """
+        n_items = distances.shape[0] - 2
+        items = distances[1:-1, 1:-1]
+        n_masks = 1 << n_items
+        bits = 1 << np.arange(n_items)
+
+        # cost[mask, j]: shortest route from the start visiting the items in mask,
+        # ending at item j. parent[mask, j]: item visited before j
+        cost = np.full((n_masks, n_items), np.inf)
+        parent = np.full((n_masks, n_items), -1, dtype=np.int64)
+        cost[bits, np.arange(n_items)] = distances[0, 1:-1]
+
+        masks = np.arange(n_masks)
+        popcounts = np.zeros(n_masks, dtype=np.int64)
+        for bit in bits:
+            popcounts += (masks & bit) > 0
+
+        for size in range(1, n_items):
+            layer = masks[popcounts == size]
+            # Extend every route in the layer by one more item
+            candidates = cost[layer][:, :, None] + items[None, :, :]
+            best_prev = np.argmin(candidates, axis=1)
+            best_cost = np.take_along_axis(candidates, best_prev[:, None, :], axis=1)[
+                :, 0, :
+            ]
+            for k in range(n_items):
+                valid = (layer & bits[k]) == 0
+                new_masks = layer[valid] | bits[k]
+                cost[new_masks, k] = best_cost[valid, k]
+                parent[new_masks, k] = best_prev[valid, k]
+
+        full = n_masks - 1
+        last = int(np.argmin(cost[full] + distances[1:-1, -1]))
+        order = []
+        mask = full
+        while last != -1:
+            order.append(last + 1)
+            mask, last = mask ^ (1 << last), int(parent[mask, last])
+        order.reverse()
+        return order
+
+    @staticmethod
+    def nearest_neighbor(distances: np.ndarray) -> List[int]:
+        """
+        Greedy ordering, always visiting the closest remaining waypoint next
+
+        Parameters
+        ----------
+        distances : np.ndarray
+            Matrix of distances between waypoints
+
+        Returns
+        -------
+        List[int]
+            Indices of the intermediate waypoints in visiting order
+        """
+        remaining = list(range(1, distances.shape[0] - 1))
+        order = []
+        current = 0
+        while remaining:
+            current = min(remaining, key=lambda idx: distances[current, idx])
+            remaining.remove(current)
+            order.append(current)
+        return order
+
+    def local_search(self, distances: np.ndarray, order: List[int]) -> List[int]:
+        """
+        Improve an ordering with 2-opt (segment reversal) and or-opt (moving a
+        segment of up to 3 waypoints) moves until no move shortens the route
+
+        Parameters
+        ----------
+        distances : np.ndarray
+            Matrix of distances between waypoints
+        order : List[int]
+            Initial indices of the intermediate waypoints in visiting order
+
+        Returns
+        -------
+        List[int]
+            Improved indices of the intermediate waypoints in visiting order
+        """
+        best = list(order)
+        best_length = self.route_length(distances, best)
+        improved = True
+        while improved:
+            improved = False
+            for i in range(len(best) - 1):
+                for j in range(i + 1, len(best)):
+                    candidate = best[:i] + best[i : j + 1][::-1] + best[j + 1 :]
+                    length = self.route_length(distances, candidate)
+                    if length < best_length:
+                        best, best_length, improved = candidate, length, True
+            for seg_len in range(1, 4):
+                for i in range(len(best) - seg_len + 1):
+                    segment = best[i : i + seg_len]
+                    rest = best[:i] + best[i + seg_len :]
+                    for j in range(len(rest) + 1):
+                        if j == i:
+                            continue
+                        candidate = rest[:j] + segment + rest[j:]
+                        length = self.route_length(distances, candidate)
+                        if length < best_length:
+                            best, best_length, improved = candidate, length, True
+        return best
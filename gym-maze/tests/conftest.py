@@ -0,0 +1,27 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the agent and evaluation modules are imported from the repository root, the
+# servers from gym_maze/ (they import envs, step_log... as top level modules)
+sys.path.insert(0, ROOT)
+sys.path.insert(1, os.path.join(ROOT, "gym_maze"))
+
+
+@pytest.fixture
+def in_root(monkeypatch):
+    # the riddle files are found relative to the repository root
+    monkeypatch.chdir(ROOT)
+
+
+def open_maze(width=10, height=10):
+    # maze without any inner wall, cells use the environment encoding
+    # (N=1, E=2, S=4, W=8 for the open sides)
+    x, y = np.indices((width, height))
+    return (
+        (y > 0) * 0x1 | (x < width - 1) * 0x2 | (y < height - 1) * 0x4 | (x > 0) * 0x8
+    ).astype(np.uint8)
@@ -0,0 +1,246 @@
+import ast
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("quart")
+pytest.importorskip("quart_cors")
+pytest.importorskip("bson")
+
+os.environ["MAZE_REPOSITORY"] = "memory"
+
+import async_app  # noqa: E402
+from conftest import open_maze  # noqa: E402
+from repository import InMemoryRepository  # noqa: E402
+from sessions import SessionManager  # noqa: E402
+
+
+AGENT_ID = "team-1"
+ADMIN = "ADMIN123"
+RESCUE_ITEMS = {(3, 0): "cipher", (5, 5): "server", (1, 7): "pcap", (8, 2): "captcha"}
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def server(in_root, monkeypatch):
+    # fresh state for every test, the routes use the module globals
+    clock = FakeClock()
+    monkeypatch.setattr(async_app, "repository", InMemoryRepository())
+    monkeypatch.setattr(async_app, "agents", dict())
+    monkeypatch.setattr(async_app, "agentsSteps", dict())
+    monkeypatch.setattr(
+        async_app,
+        "sessionManager",
+        SessionManager(
+            async_app.MAX_STEPS,
+            async_app.MAX_NO_OF_SECS_BETWEEN_ACTIONS,
+            async_app.MAX_NO_OF_SECS_OF_GAME,
+            clock=clock,
+        ),
+    )
+    monkeypatch.setattr(async_app, "EXPIRY_INTERVAL", 0.01)
+    monkeypatch.setattr(async_app.mazeManager, "rescue_items_dict", dict(RESCUE_ITEMS))
+    asyncio.run(
+        async_app.repository.insert_maze(
+            str(async_app.HACKATHON_PHASE), open_maze().tolist()
+        )
+    )
+    return clock
+
+
+def run(scenario):
+    # runs scenario(client) with the server started (background tasks included)
+    async def main():
+        async with async_app.app.test_app() as test_app:
+            return await scenario(test_app.test_client())
+
+    return asyncio.run(main())
+
+
+async def post(client, route, payload):
+    response = await client.post(route, json=payload)
+    return response.status_code, await response.get_data(as_text=True)
+
+
+async def post_json(client, route, payload):
+    response = await client.post(route, json=payload)
+    return response.status_code, await response.get_json()
+
+
+async def start_game(client):
+    await post_json(client, "/addAgent", {"agentId": AGENT_ID, "name": "team"})
+    return await post_json(client, "/init", {"agentId": AGENT_ID})
+
+
+async def move(client, actions):
+    states = []
+    for action in actions:
+        status, state = await post_json(
+            client, "/move", {"agentId": AGENT_ID, "action": action}
+        )
+        assert status == 200
+        states.append(state)
+    return states
+
+
+# back and forth along the top row, never on a rescue item
+WANDER = "EW" * 30
+
+
+def test_full_game(server):
+    async def scenario(client):
+        status, state = await start_game(client)
+        assert status == 200
+        assert state["position"] == [0, 0]
+
+        # to the cipher rescue item at (3, 0)
+        states = await move(client, "EEE")
+        assert states[-1]["position"] == [3, 0]
+        assert states[-1]["riddleType"] == "cipher"
+        assert states[-1]["riddleQuestion"] is not None
+
+        status, state = await post_json(
+            client,
+            "/solve",
+            {"agentId": AGENT_ID, "riddleType": "cipher", "solution": "wrong"},
+        )
+        assert status == 200
+        assert state["position"] == [3, 0]
+
+        await move(client, "W" * 3 + WANDER)
+        status, text = await post(client, "/leave", {"agentId": AGENT_ID})
+        assert status == 200
+        assert AGENT_ID not in async_app.agents
+
+        status, attempt = await post_json(
+            client, "/getAttempt", {"apiKey": ADMIN, "agentId": AGENT_ID, "mazeId": "0"}
+        )
+        return status, attempt
+
+    status, attempt = run(scenario)
+    assert status == 200
+    actions = attempt["actions"]
+    # /solve is not a step of the log, every /move is
+    assert len(actions) == 3 + 3 + len(WANDER)
+    positions = [list(step.values())[0][0] for step in actions]
+    assert positions[:6] == [[1, 0], [2, 0], [3, 0], [2, 0], [1, 0], [0, 0]]
+    for index, step in enumerate(actions):
+        position, action, status_text = step[str(index)]
+        assert action in range(4)
+        items = ast.literal_eval(status_text)
+        assert set(items) == {str(position) for position in RESCUE_ITEMS}
+    # the cipher item was attempted (and failed) from the fourth step on
+    final_items = ast.literal_eval(actions[-1][str(len(actions) - 1)][2])
+    assert final_items[str((3, 0))] != 0
+    assert final_items[str((5, 5))] == 0
+
+    repository = async_app.repository
+    assert len(repository.attempts) == 1
+    assert repository.attempts[0]["numSteps"] == len(actions)
+    assert repository.attempts[0]["incomplete"] is False
+    assert len(repository.submissions) == 1
+    assert AGENT_ID in repository.agents
+
+
+def test_move_requires_an_authorised_agent(server):
+    async def scenario(client):
+        return await post(client, "/move", {"agentId": "nobody", "action": "E"})
+
+    status, _ = run(scenario)
+    assert status == 400
+
+
+def test_kill_session_saves_the_game(server):
+    async def scenario(client):
+        await start_game(client)
+        await move(client, WANDER[:10])
+        wrong = await post(
+            client, "/killSession", {"agentId": AGENT_ID, "adminPassword": "wrong"}
+        )
+        killed = await post(
+            client, "/killSession", {"agentId": AGENT_ID, "adminPassword": ADMIN}
+        )
+        again = await post(
+            client, "/killSession", {"agentId": AGENT_ID, "adminPassword": ADMIN}
+        )
+        return wrong, killed, again
+
+    wrong, killed, again = run(scenario)
+    assert wrong[0] == 403
+    assert killed == (200, "Agent Killed!")
+    assert again[0] == 400
+    assert AGENT_ID not in async_app.agents
+    assert [attempt["numSteps"] for attempt in async_app.repository.attempts] == [10]
+
+
+def test_timed_out_session_is_expired_and_saved(server):
+    clock = server
+
+    async def scenario(client):
+        await start_game(client)
+        await move(client, WANDER[: async_app.SAVING_THRESHOLD + 1])
+        clock.now += async_app.MAX_NO_OF_SECS_BETWEEN_ACTIONS + 1
+        for _ in range(100):
+            await asyncio.sleep(async_app.EXPIRY_INTERVAL)
+            if AGENT_ID not in async_app.agents and async_app.repository.attempts:
+                break
+        return await post(client, "/move", {"agentId": AGENT_ID, "action": "E"})
+
+    status, _ = run(scenario)
+    assert status == 400
+    assert len(async_app.sessionManager) == 0
+    attempts = async_app.repository.attempts
+    assert [attempt["numSteps"] for attempt in attempts] == [
+        async_app.SAVING_THRESHOLD + 1
+    ]
+
+
+def test_short_timed_out_session_is_dropped(server):
+    clock = server
+
+    async def scenario(client):
+        await start_game(client)
+        await move(client, WANDER[:5])
+        clock.now += async_app.MAX_NO_OF_SECS_BETWEEN_ACTIONS + 1
+        for _ in range(100):
+            await asyncio.sleep(async_app.EXPIRY_INTERVAL)
+            if AGENT_ID not in async_app.agents:
+                break
+
+    run(scenario)
+    assert AGENT_ID not in async_app.agents
+    assert async_app.repository.attempts == []
+
+
+def test_unsaved_game_leaves_no_step_batches(server):
+    # games on the agent's own maze are not saved (unless it escapes)
+    own_maze_agent = async_app.HACKATHON_PHASE
+
+    async def scenario(client):
+        await post_json(client, "/addAgent", {"agentId": own_maze_agent, "name": "x"})
+        await post_json(client, "/init", {"agentId": own_maze_agent})
+        for action in "EW" * 150:
+            await client.post(
+                "/move", json={"agentId": own_maze_agent, "action": action}
+            )
+        session_id = async_app.agentsSteps[own_maze_agent].session_id
+        written = len(await async_app.repository.find_step_batches(session_id))
+        killed = await post(
+            client, "/killSession", {"agentId": own_maze_agent, "adminPassword": ADMIN}
+        )
+        await async_app.stepBatches.join()
+        return written, killed
+
+    written, killed = run(scenario)
+    assert written == 1
+    assert killed[0] == 200
+    assert async_app.repository.attempts == []
+    assert async_app.repository.step_batches == {}
@@ -0,0 +1,110 @@
+import random
+
+import pytest
+
+from gym_maze.envs.maze_generator import generate_valid_maze
+from gym_maze.envs.maze_manager import MazeManager
+from solution.algorithmic_agent import AlgorithmicAgent
+from solution.graph_manager import GraphManager, PathNotFound
+from solution.grid_graph_manager import GridGraphManager
+
+
+def random_edge(rng, size):
+    x, y = rng.randrange(size[0]), rng.randrange(size[1])
+    if rng.random() < 0.5 and x + 1 < size[0]:
+        return (x, y), (x + 1, y)
+    if y + 1 < size[1]:
+        return (x, y), (x, y + 1)
+    return (x, y), (x - 1, y)
+
+
+def fresh_path(graph, from_node, to_node):
+    try:
+        return graph.a_star(from_node, to_node)
+    except PathNotFound:
+        return None
+
+
+def cached_path(graph, from_node, to_node):
+    try:
+        return graph.get_path(from_node, to_node)
+    except PathNotFound:
+        return None
+
+
+@pytest.mark.parametrize("graph_class", [GraphManager, GridGraphManager])
+@pytest.mark.parametrize("seed", range(5))
+def test_cached_paths_match_fresh_searches(graph_class, seed):
+    rng = random.Random(seed)
+    size = (8, 6)
+    graph = graph_class(size, cache_paths=True)
+    nodes = [(x, y) for x in range(size[0]) for y in range(size[1])]
+    queries = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(6)]
+
+    for _ in range(60):
+        from_node, to_node = random_edge(rng, size)
+        if rng.random() < 0.3:
+            graph.remove_edge_from_graph(from_node, to_node)
+        else:
+            graph.confirm_edge(from_node, to_node)
+        for query in queries:
+            assert cached_path(graph, *query) == fresh_path(graph, *query)
+
+    stats = graph.get_cache_stats()
+    # the queries are repeated after every change, most must be answered by the
+    # cache for it to be worth it
+    assert stats["hits"] > stats["misses"]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_backends_give_the_same_paths(seed):
+    rng = random.Random(seed)
+    size = (7, 9)
+    graphs = [GraphManager(size), GridGraphManager(size)]
+    nodes = [(x, y) for x in range(size[0]) for y in range(size[1])]
+
+    for _ in range(60):
+        from_node, to_node = random_edge(rng, size)
+        change = rng.random() < 0.3
+        for graph in graphs:
+            if change:
+                graph.remove_edge_from_graph(from_node, to_node)
+            else:
+                graph.confirm_edge(from_node, to_node)
+        for node in nodes:
+            assert graphs[0].get_neighbors(node) == graphs[1].get_neighbors(node)
+        query = (rng.choice(nodes), rng.choice(nodes))
+        # the neighbors are listed in the same order, so A* breaks ties the same
+        # way and the paths are equal, not only of equal length
+        assert fresh_path(graphs[0], *query) == fresh_path(graphs[1], *query)
+
+
+def run_agent(maze_cells, rescue_items, grid_graph):
+    manager = MazeManager(headless=True)
+    manager.rescue_items_dict = rescue_items
+    manager.init_maze("agent", maze_cells=maze_cells)
+    agent = AlgorithmicAgent(visualize=False, grid_graph=grid_graph)
+    obv = manager.reset("agent")
+    positions = []
+    while True:
+        action, action_index = agent.get_action(obv)
+        if action_index == -1 or len(positions) > 1000:
+            return positions
+        obv, _, _, _, info = manager.step("agent", action)
+        positions.append(tuple(obv[0].tolist()))
+        if info["riddle_type"] is not None:
+            obv, _, _, _, _ = manager.solve_riddle(info["riddle_type"], "agent", "")
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_agent_takes_the_same_route_with_both_backends(in_root, seed):
+    random.seed(seed)
+    maze = generate_valid_maze(10)
+    locations = random.sample([(x, y) for x in range(1, 9) for y in range(1, 9)], 4)
+    rescue_items = dict(zip(locations, ["cipher", "server", "pcap", "captcha"]))
+    routes = [
+        run_agent(maze.maze_cells, rescue_items, grid_graph)
+        for grid_graph in (False, True)
+    ]
+    assert routes[0] == routes[1]
+    assert routes[0][-1] == (9, 9)
@@ -0,0 +1,90 @@
+import random
+from collections import deque
+
+import pytest
+
+from solution.graph_manager import GraphManager, PathNotFound
+from solution.grid_graph_manager import GridGraphManager
+from solution.incremental_planner import DStarLite, IncrementalPlanner
+
+
+SIZE = (9, 7)
+NODES = [(x, y) for x in range(SIZE[0]) for y in range(SIZE[1])]
+
+
+def bfs_length(graph, start, goal):
+    # number of moves of a shortest path, None if the goal is unreachable
+    distances = {start: 0}
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        if node == goal:
+            return distances[node]
+        for neighbor in graph.get_neighbors(node):
+            if neighbor not in distances:
+                distances[neighbor] = distances[node] + 1
+                queue.append(neighbor)
+    return None
+
+
+def planned_length(planner, graph, start, goal):
+    try:
+        path = planner.plan(start, goal)
+    except PathNotFound:
+        return None
+    assert path[0] == start and path[-1] == goal
+    for node, next_node in zip(path, path[1:]):
+        assert next_node in graph.get_neighbors(node)
+    return len(path) - 1
+
+
+def remove_random_wall(rng, graph):
+    node = rng.choice(NODES)
+    neighbors = sorted(graph.get_neighbors(node))
+    if neighbors:
+        graph.remove_edge_from_graph(node, rng.choice(neighbors))
+
+
+@pytest.mark.parametrize("graph_class", [GraphManager, GridGraphManager])
+@pytest.mark.parametrize("seed", range(10))
+def test_paths_match_bfs_after_wall_removals_and_start_jumps(graph_class, seed):
+    rng = random.Random(seed)
+    graph = graph_class(SIZE)
+    goals = [rng.choice(NODES) for _ in range(3)]
+    # fewer goals kept than used, so some searches are dropped and rebuilt
+    planner = IncrementalPlanner(graph, max_goals=2)
+    start = (0, 0)
+
+    for _ in range(80):
+        for _ in range(rng.randrange(3)):
+            remove_random_wall(rng, graph)
+        if rng.random() < 0.3:
+            # jump anywhere, the key modifier grows by more than one move
+            start = rng.choice(NODES)
+        else:
+            neighbors = sorted(graph.get_neighbors(start))
+            if neighbors:
+                start = rng.choice(neighbors)
+        goal = rng.choice(goals)
+        assert planned_length(planner, graph, start, goal) == bfs_length(
+            graph, start, goal
+        )
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_single_search_reused_from_many_starts(seed):
+    rng = random.Random(seed)
+    graph = GraphManager(SIZE)
+    goal = rng.choice(NODES)
+    search = DStarLite(graph, goal)
+    graph.add_edge_removed_callback(search.notify_edge_removed)
+
+    for _ in range(50):
+        remove_random_wall(rng, graph)
+        start = rng.choice(NODES)
+        expected = bfs_length(graph, start, goal)
+        if expected is None:
+            with pytest.raises(PathNotFound):
+                search.plan(start)
+        else:
+            assert len(search.plan(start)) - 1 == expected
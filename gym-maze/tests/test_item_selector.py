@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from solution.graph_manager import GraphManager
+from solution.item_selector import ItemSelector
+
+
+SIZE = (5, 5)
+EXIT = (4, 4)
+
+
+def masks(*item_locations):
+    item_masks = np.zeros((len(item_locations),) + SIZE, dtype=bool)
+    for idx, locations in enumerate(item_locations):
+        for location in locations:
+            item_masks[(idx,) + location] = True
+    return item_masks
+
+
+@pytest.mark.parametrize(
+    "candidate_mode, expected", [("first", (0, 4)), ("nearest", (4, 0))]
+)
+def test_candidate_location(candidate_mode, expected):
+    graph = GraphManager(SIZE)
+    # (0, 4) is 6 moves away and (4, 0) only 4, "first" takes (0, 4) anyway
+    graph.remove_edge_from_graph((0, 0), (0, 1))
+    selector = ItemSelector(EXIT, candidate_mode=candidate_mode)
+
+    plan = selector.get_plan((0, 0), masks([(4, 0), (0, 4)], []), graph)
+    assert plan[0] == (0, 0) and plan[-1] == EXIT
+    assert expected in plan
+    for pos, next_pos in zip(plan, plan[1:]):
+        assert next_pos in graph.get_neighbors(pos)
+
+
+def test_nearest_falls_back_to_an_unreachable_location():
+    graph = GraphManager(SIZE)
+    for neighbor in sorted(graph.get_neighbors((2, 2))):
+        graph.remove_edge_from_graph((2, 2), neighbor)
+    selector = ItemSelector(EXIT, candidate_mode="nearest")
+    assert selector.get_nearest_location((0, 0), masks([(2, 2)])[0], graph) == (2, 2)
+    item_mask = masks([(2, 2), (3, 3), (1, 3)])[0]
+    assert selector.get_nearest_location((0, 0), item_mask, graph) == (1, 3)
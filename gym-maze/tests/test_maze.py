@@ -0,0 +1,16 @@
+import random
+
+import numpy as np
+import pytest
+
+from gym_maze.envs.maze import Maze, compute_open_moves
+
+
+@pytest.mark.parametrize("maze_size", [(10, 10), (7, 12), (12, 7)])
+def test_open_moves_match_the_walls_after_generation(maze_size):
+    # the walls broken to add loops update the open moves table in place
+    for seed in range(20):
+        random.seed(seed)
+        maze = Maze(maze_size=maze_size, rescue_item_locations=[])
+        assert maze.open_moves.shape == maze_size + (4,)
+        assert np.array_equal(maze.open_moves, compute_open_moves(maze.maze_cells))
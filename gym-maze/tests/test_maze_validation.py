@@ -0,0 +1,156 @@
+from collections import deque
+
+import numpy as np
+import pytest
+
+from gym_maze.envs.maze_validation import (
+    check_maze,
+    connected_components,
+    maze_has_blockers,
+    validate_mazes,
+)
+
+
+MOVES = {1: (0, -1), 2: (1, 0), 4: (0, 1), 8: (-1, 0)}
+
+
+def bfs_component(maze, start):
+    # the BFS of the old validator (maze_generator.maze_has_blockers): a move is
+    # open if the cell's wall points to its neighbor, or the neighbor's to it
+    width, height = maze.shape
+
+    def points_to(cell, target):
+        dx, dy = MOVES[int(maze[cell])]
+        return (cell[0] + dx, cell[1] + dy) == target
+
+    explored = {start}
+    queue = deque([start])
+    while queue:
+        x, y = queue.popleft()
+        for dx, dy in MOVES.values():
+            child = (x + dx, y + dy)
+            if not (0 <= child[0] < width and 0 <= child[1] < height):
+                continue
+            if child in explored:
+                continue
+            if points_to((x, y), child) or points_to(child, (x, y)):
+                explored.add(child)
+                queue.append(child)
+    return explored
+
+
+def bfs_component_sizes(maze):
+    # the entrance's component first, then the others by decreasing size
+    remaining = {(x, y) for x in range(maze.shape[0]) for y in range(maze.shape[1])}
+    entrance = bfs_component(maze, (0, 0))
+    remaining -= entrance
+    sizes = []
+    while remaining:
+        component = bfs_component(maze, min(remaining))
+        remaining -= component
+        sizes.append(len(component))
+    return [len(entrance)] + sorted(sizes, reverse=True)
+
+
+def spanning_tree_maze(rng, width, height):
+    # every cell points to its parent in a random spanning tree rooted at the
+    # entrance, so the maze is valid, returns the maze and the parents
+    maze = np.zeros((width, height), dtype=np.int64)
+    parents = {(0, 0): None}
+    frontier = [((0, 0), child) for child in [(1, 0), (0, 1)]]
+    while frontier:
+        parent, cell = frontier.pop(rng.integers(len(frontier)))
+        if cell in parents or not (0 <= cell[0] < width and 0 <= cell[1] < height):
+            continue
+        parents[cell] = parent
+        delta = (parent[0] - cell[0], parent[1] - cell[1])
+        maze[cell] = next(bit for bit, move in MOVES.items() if move == delta)
+        for dx, dy in MOVES.values():
+            frontier.append((cell, (cell[0] + dx, cell[1] + dy)))
+    # the entrance points to one of its children, to not open another edge
+    first_child = next((cell for cell, parent in parents.items() if parent), None)
+    maze[0, 0] = 2 if first_child in (None, (1, 0)) else 4
+    return maze, parents
+
+
+SHAPES = [(10, 10), (1, 1), (1, 7), (7, 1), (3, 12), (12, 5)]
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_random_mazes_match_bfs(shape):
+    rng = np.random.default_rng(sum(shape))
+    n_cells = shape[0] * shape[1]
+    for _ in range(50):
+        maze = rng.choice([1, 2, 4, 8], size=shape)
+        report = check_maze(maze)
+        sizes = bfs_component_sizes(maze)
+        assert report.component_sizes == sizes
+        assert report.unreachable_cells == n_cells - sizes[0]
+        assert bool(report) == (sizes[0] == n_cells)
+        assert maze_has_blockers(maze) == (sizes[0] != n_cells)
+
+
+@pytest.mark.parametrize("shape", SHAPES)
+def test_spanning_tree_mazes_are_valid(shape):
+    rng = np.random.default_rng(sum(shape))
+    for _ in range(10):
+        maze, _ = spanning_tree_maze(rng, *shape)
+        assert len(bfs_component(maze, (0, 0))) == maze.size
+        report = check_maze(maze)
+        assert report.is_valid, report
+        assert report.component_sizes == [maze.size]
+        assert np.all(connected_components(maze) == 0)
+
+
+@pytest.mark.parametrize("shape", [(10, 10), (4, 9), (11, 3)])
+def test_blocked_component_is_reported(shape):
+    rng = np.random.default_rng(sum(shape))
+    for _ in range(10):
+        maze, parents = spanning_tree_maze(rng, *shape)
+        children = {}
+        for cell, parent in parents.items():
+            children.setdefault(parent, []).append(cell)
+        # cut a subtree off the entrance: its root points to one of its children
+        # instead of its parent (that edge is already open). The root is not next
+        # to the entrance, whose wall may point to it
+        inner = [cell for cell in children if parents.get(cell) not in (None, (0, 0))]
+        root = inner[rng.integers(len(inner))]
+        child = children[root][0]
+        maze[root] = next(
+            bit
+            for bit, move in MOVES.items()
+            if move == (child[0] - root[0], child[1] - root[1])
+        )
+        subtree, stack = set(), [root]
+        while stack:
+            cell = stack.pop()
+            subtree.add(cell)
+            stack.extend(children.get(cell, []))
+
+        report = check_maze(maze)
+        assert not report.is_valid
+        assert report.unreachable_cells == len(subtree)
+        assert report.component_sizes == bfs_component_sizes(maze)
+        assert report.component_sizes == [maze.size - len(subtree), len(subtree)]
+        labels = connected_components(maze)
+        blocked = np.zeros(shape, dtype=bool)
+        blocked[tuple(np.array(sorted(subtree)).T)] = True
+        assert np.all(labels[blocked] == labels[root])
+        assert np.all(labels[~blocked] == 0)
+
+
+def test_stack_of_mazes_matches_single_checks():
+    rng = np.random.default_rng(0)
+    mazes = [spanning_tree_maze(rng, 6, 8)[0] for _ in range(10)]
+    mazes += [rng.choice([1, 2, 4, 8], size=(6, 8)) for _ in range(10)]
+    mazes[3][2, 2] = 3  # not one-hot
+    expected = [check_maze(maze).is_valid for maze in mazes]
+    assert validate_mazes(np.stack(mazes)).tolist() == expected
+    assert expected[:3] == [True] * 3 and not expected[3]
+
+
+def test_invalid_inputs():
+    assert not check_maze([[1, 2], [4, 8]])
+    assert not check_maze(np.ones((2, 2, 2), dtype=int))
+    assert not check_maze(np.full((10, 10), 2), maze_size=(10, 12))
+    assert not check_maze(np.zeros((0, 3), dtype=int))
@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+
+from results_store import RECORD_DTYPE, ResultsStore
+
+
+def record(maze_id, layout_id, steps=100):
+    return (maze_id, layout_id, steps, 4, 0.5, 10, 3, 7)
+
+
+def chunk_names(directory):
+    return sorted(name for name in os.listdir(directory) if name.endswith(".npy"))
+
+
+def test_records_are_written_in_chunks(tmp_path):
+    store = ResultsStore(str(tmp_path), chunk_size=3)
+    store.extend(record(0, layout_id) for layout_id in range(7))
+    assert chunk_names(tmp_path) == ["results_000000.npy", "results_000001.npy"]
+    assert len(store.load()) == 7  # the last record is still buffered
+    store.flush()
+    assert len(chunk_names(tmp_path)) == 3
+    assert not any(name.endswith(".tmp") for name in os.listdir(tmp_path))
+
+
+def test_completed_episodes_after_reopening(tmp_path):
+    with ResultsStore(str(tmp_path), chunk_size=2) as store:
+        store.extend([record(1, 0), record(1, 1), record(0, 4)])
+    # the context manager flushed the buffered record
+    store = ResultsStore(str(tmp_path))
+    assert len(store) == 3
+    assert store.is_completed(1, 0)
+    assert store.is_completed(1, 1)
+    assert store.is_completed(0, 4)
+    assert not store.is_completed(0, 0)
+    assert not store.is_completed(4, 0)
+    records = store.load()
+    assert records.dtype == RECORD_DTYPE
+    assert list(zip(records["maze_id"], records["layout_id"])) == [
+        (0, 4),
+        (1, 0),
+        (1, 1),
+    ]
+
+
+def test_resuming_appends_after_the_highest_chunk(tmp_path):
+    with ResultsStore(str(tmp_path), chunk_size=1) as store:
+        store.extend([record(0, 0), record(0, 1), record(0, 2)])
+    # a chunk was lost, the numbering has a gap
+    os.remove(os.path.join(str(tmp_path), "results_000001.npy"))
+
+    store = ResultsStore(str(tmp_path), chunk_size=1)
+    assert store.next_chunk == 3
+    assert not store.is_completed(0, 1)
+    store.append(record(0, 1, steps=50))
+    assert chunk_names(tmp_path) == [
+        "results_000000.npy",
+        "results_000002.npy",
+        "results_000003.npy",
+    ]
+    assert ResultsStore(str(tmp_path)).load()["steps"].tolist() == [100, 50, 100]
+
+
+def test_chunks_of_an_older_record_format_are_converted(tmp_path):
+    # before the cache hits and misses were recorded
+    old_names = RECORD_DTYPE.names[:6]
+    old_dtype = np.dtype([(name, RECORD_DTYPE[name]) for name in old_names])
+    np.save(
+        os.path.join(str(tmp_path), "results_000000.npy"),
+        np.array([(2, 3, 80, 4, 0.25, 6)], dtype=old_dtype),
+    )
+    store = ResultsStore(str(tmp_path))
+    assert store.is_completed(2, 3)
+    store.append(record(2, 4))
+    records = store.load()
+    assert records.dtype == RECORD_DTYPE
+    assert records["steps"].tolist() == [80, 100]
+    assert records["cache_hits"].tolist() == [0, 3]
@@ -0,0 +1,68 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from solution.route_optimizer import RouteOptimizer
+
+
+def random_distances(rng, n_items, symmetric):
+    if symmetric:
+        # Manhattan distances between random cells, like the agent's mazes
+        points = rng.integers(0, 10, size=(n_items + 2, 2))
+        return np.abs(points[:, None, :] - points[None, :, :]).sum(axis=2)
+    return rng.integers(1, 30, size=(n_items + 2, n_items + 2))
+
+
+def brute_force_length(distances):
+    n_items = distances.shape[0] - 2
+    return min(
+        RouteOptimizer.route_length(distances, order)
+        for order in itertools.permutations(range(1, n_items + 1))
+    )
+
+
+def assert_is_ordering(order, n_items):
+    assert sorted(order) == list(range(1, n_items + 1))
+
+
+@pytest.mark.parametrize("symmetric", [True, False])
+@pytest.mark.parametrize("n_items", range(8))
+def test_held_karp_matches_brute_force(n_items, symmetric):
+    rng = np.random.default_rng(n_items)
+    optimizer = RouteOptimizer()
+    for _ in range(10):
+        distances = random_distances(rng, n_items, symmetric)
+        order = optimizer.solve(distances)
+        assert_is_ordering(order, n_items)
+        assert optimizer.route_length(distances, order) == brute_force_length(
+            distances
+        )
+
+
+@pytest.mark.parametrize("symmetric", [True, False])
+@pytest.mark.parametrize("n_items", [5, 7, 12])
+def test_fallback_above_max_exact_items(n_items, symmetric):
+    rng = np.random.default_rng(100 + n_items)
+    optimizer = RouteOptimizer(max_exact_items=4)
+    for _ in range(5):
+        distances = random_distances(rng, n_items, symmetric)
+        order = optimizer.solve(distances)
+        assert_is_ordering(order, n_items)
+        length = optimizer.route_length(distances, order)
+
+        greedy = optimizer.nearest_neighbor(distances)
+        assert_is_ordering(greedy, n_items)
+        assert length <= optimizer.route_length(distances, greedy)
+        if n_items <= 7:
+            assert length >= brute_force_length(distances)
+        # no single 2-opt or or-opt move shortens the result
+        assert optimizer.local_search(distances, order) == order
+
+
+def test_fallback_finds_the_order_of_points_on_a_line():
+    # start at 0 and end at 12, the items are scattered in between
+    positions = np.array([0, 7, 3, 11, 1, 9, 5, 2, 12])
+    distances = np.abs(positions[:, None] - positions[None, :])
+    order = RouteOptimizer(max_exact_items=2).solve(distances)
+    assert positions[order].tolist() == [1, 2, 3, 5, 7, 9, 11]
@@ -0,0 +1,115 @@
+from sessions import SessionManager
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_manager(max_steps=100, between_actions=30, game=900):
+    clock = FakeClock()
+    return SessionManager(max_steps, between_actions, game, clock=clock), clock
+
+
+def expired_ids(manager):
+    return sorted(session.agent_id for session in manager.expire())
+
+
+def test_idle_session_expires_after_the_idle_deadline():
+    manager, clock = make_manager()
+    manager.start("a")
+    clock.now = 30
+    assert expired_ids(manager) == []
+    clock.now = 30.5
+    assert expired_ids(manager) == ["a"]
+    assert "a" not in manager
+    assert manager.expire() == []
+
+
+def test_active_session_is_pushed_back_until_the_game_deadline():
+    manager, clock = make_manager(game=100)
+    manager.start("a")
+    for now in range(20, 101, 20):
+        clock.now = now
+        assert manager.use_step("a")
+        # its first deadline (30) is long past, the entry is pushed back
+        assert expired_ids(manager) == []
+    assert manager.deadline(manager.get("a")) == 100
+    clock.now = 100.5
+    assert expired_ids(manager) == ["a"]
+
+
+def test_only_the_sessions_past_their_deadline_expire():
+    manager, clock = make_manager()
+    for agent_id in ("a", "b", "c"):
+        manager.start(agent_id)
+    clock.now = 20
+    manager.use_step("b")
+    clock.now = 31
+    assert expired_ids(manager) == ["a", "c"]
+    assert "b" in manager
+    clock.now = 51
+    assert expired_ids(manager) == ["b"]
+
+
+def test_restarted_session_is_not_ended_by_the_old_entry():
+    manager, clock = make_manager()
+    first = manager.start("a")
+    clock.now = 20
+    second = manager.start("a")
+    clock.now = 31
+    # the entry of the first session comes up, the second one is still running
+    assert manager.expire() == []
+    assert manager.get("a") is second is not first
+    clock.now = 51
+    assert manager.expire() == [second]
+
+
+def test_ended_session_is_skipped():
+    manager, clock = make_manager()
+    manager.start("a")
+    assert manager.end("a") is not None
+    assert manager.end("a") is None
+    clock.now = 31
+    assert manager.expire() == []
+
+
+def test_expiry_does_not_use_steps():
+    manager, clock = make_manager(max_steps=10)
+    manager.start("a")
+    for now in range(1, 6):
+        clock.now = now * 10
+        manager.use_step("a")
+        manager.expire()
+    assert manager.steps_taken("a") == 5
+    assert manager.get("a").steps_remaining == 5
+
+
+def test_session_out_of_steps_is_left_to_the_next_request():
+    manager, clock = make_manager(max_steps=2)
+    manager.start("a")
+    assert manager.use_step("a")
+    assert manager.use_step("a")
+    clock.now = 1
+    # the request that used the last step may still be running
+    assert manager.expire() == []
+    assert not manager.use_step("a")
+    assert manager.end("a") is not None
+    # and ended by the time limits if no request comes
+    manager.start("b")
+    manager.sessions["b"].steps_remaining = 0
+    clock.now = 32
+    assert expired_ids(manager) == ["b"]
+
+
+def test_status_of_an_ended_session():
+    manager, clock = make_manager()
+    manager.start("a")
+    assert manager.steps_taken("a") == 0
+    assert manager.last_action_time("a") is not None
+    manager.end("a")
+    assert manager.steps_taken("a") is None
+    assert manager.last_action_time("a") is None
@@ -0,0 +1,126 @@
+import random
+
+import numpy as np
+import pytest
+
+from conftest import open_maze
+from gym_maze.envs.maze_manager import MazeManager
+from step_log import STEP_DTYPE, StepLog, StepLogWriter, decode_steps
+
+
+ACTIONS = ["N", "S", "E", "W"]
+
+
+class BatchCollector:
+    def __init__(self):
+        self.batches = dict()
+
+    def __call__(self, session_id, batch_index, data):
+        self.batches.setdefault(session_id, dict())[batch_index] = data
+
+    def get(self, session_id):
+        batches = self.batches.get(session_id, dict())
+        return [batches[batch_index] for batch_index in sorted(batches)]
+
+
+@pytest.mark.parametrize("batch_size", [1, 7, 256])
+def test_decoded_steps_match_the_old_actions_format(in_root, batch_size):
+    random.seed(batch_size)
+    manager = MazeManager(headless=True)
+    manager.rescue_items_dict = {
+        (1, 0): "cipher",
+        (0, 1): "server",
+        (1, 1): "pcap",
+        (2, 2): "captcha",
+    }
+    manager.init_maze("agent", maze_cells=open_maze())
+    collector = BatchCollector()
+    steps = StepLog("session", collector, batch_size=batch_size)
+
+    # what app.py stored in the "actions" of an attempt before the step logs
+    actions = []
+    for _ in range(40):
+        action = random.choice(ACTIONS)
+        obv, _, _, _, info = manager.step("agent", action)
+        actions.append(
+            {
+                str(len(actions)): [
+                    obv[0].tolist(),
+                    ACTIONS.index(action),
+                    str(manager.get_rescue_items_status("agent")),
+                ]
+            }
+        )
+        steps.append(
+            obv[0], ACTIONS.index(action), manager.get_rescue_items_status_bits("agent")
+        )
+        if info["riddle_type"] is not None:
+            manager.solve_riddle(info["riddle_type"], "agent", "wrong")
+    steps.flush()
+
+    assert len(steps) == 40
+    assert steps.num_batches == -(-40 // batch_size)
+    decoded = decode_steps(collector.get("session"), list(manager.rescue_items_dict))
+    assert decoded == actions
+    # the walk attempted some riddles, so the statuses are not all 0
+    assert any("2" in list(step.values())[0][2] for step in decoded)
+
+
+def test_step_records_are_packed():
+    collector = BatchCollector()
+    steps = StepLog("session", collector, batch_size=4)
+    for index in range(6):
+        steps.append((index, 9 - index), index % 4, 0xFFFF)
+    assert steps.num_batches == 1
+    steps.flush()
+    steps.flush()  # nothing buffered, no empty batch
+    batches = collector.get("session")
+    assert [len(batch) // STEP_DTYPE.itemsize for batch in batches] == [4, 2]
+    records = np.frombuffer(b"".join(batches), dtype=STEP_DTYPE)
+    assert records["x"].tolist() == list(range(6))
+    assert records["items"].tolist() == [0xFFFF] * 6
+
+
+def test_writer_retries_and_reports_failures():
+    attempts = []
+
+    def write(session_id, batch_index, data):
+        attempts.append(session_id)
+        if session_id == "broken" or len(attempts) == 1:
+            raise IOError("database down")
+
+    failures = []
+    writer = StepLogWriter(
+        write, retries=2, retry_delay=0.001, on_failure=failures.append
+    )
+    writer.put("flaky", 0, b"")
+    writer.put("broken", 0, b"")
+    writer.close()
+    assert attempts == ["flaky", "flaky", "broken", "broken", "broken"]
+    assert not writer.has_failed("flaky")
+    assert writer.has_failed("broken")
+    assert failures == ["broken"]
+
+
+def test_writer_discards_after_the_queued_batches():
+    collector = BatchCollector()
+
+    def delete(session_id):
+        collector.batches.pop(session_id, None)
+
+    writer = StepLogWriter(collector, delete=delete)
+    writer.put("dropped", 0, b"a")
+    writer.put("dropped", 1, b"b")
+    writer.put("kept", 0, b"c")
+    writer.discard("dropped")
+    writer.close()
+    assert collector.get("dropped") == []
+    assert collector.get("kept") == [b"c"]
+
+
+def test_too_many_rescue_items_for_a_step(in_root):
+    manager = MazeManager(headless=True)
+    manager.rescue_items_dict = {(index, 0): "cipher" for index in range(9)}
+    manager.init_maze("agent", maze_cells=open_maze())
+    with pytest.raises(ValueError):
+        manager.get_rescue_items_status_bits("agent")